@@ -0,0 +1,98 @@
+"""
+Admin endpoints for profiling live workers.
+All endpoints require the admin token in an "Authorization: Bearer <token>" header,
+and are hidden unless ADMIN_TOKEN is set.
+"""
+
+import asyncio
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import ADMIN_TOKEN, PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL, PROFILE_STORE_SIZE
+from app.core.log import get_logger
+from app.core.profiling import ProfileStore, SamplingProfiler
+
+logger = get_logger(__name__)
+
+# cProfile profiles of single requests, see ProfilingMiddleware
+profiles = ProfileStore(PROFILE_STORE_SIZE)
+
+# Only one sampling profiler runs at a time, so that concurrent calls do not skew each other
+_sampling = asyncio.Lock()
+
+def is_admin(authorization: Optional[str]) -> bool:
+    """Whether an Authorization header carries the admin token."""
+    if not ADMIN_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), ADMIN_TOKEN)
+
+async def require_admin(authorization: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(authorization):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+@router.post("/profile", response_class=PlainTextResponse)
+async def sample_profile(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval: float = Query(PROFILE_SAMPLE_INTERVAL, ge=0.001, le=1),
+    idle: bool = Query(False),
+):
+    """
+    Sample the stacks of all threads for a number of seconds.
+
+    Returns collapsed stacks, which flamegraph.pl and speedscope turn into a flame graph.
+    Threads waiting for work, including the event loop waiting for I/O, are left out
+    unless idle is set.
+    """
+    if _sampling.locked():
+        raise HTTPException(status_code=409, detail="A profile is already being sampled")
+
+    async with _sampling:
+        profiler = SamplingProfiler(interval=interval, include_idle=idle)
+        logger.info("Sampling profile", extra={"seconds": seconds, "interval": interval})
+        collapsed = await profiler.run(seconds)
+
+    return PlainTextResponse(collapsed, headers={"X-Profile-Samples": str(profiler.samples)})
+
+@router.get("/profiles")
+async def list_profiles():
+    """List the stored profiles of single requests, newest first."""
+    return profiles.list()
+
+@router.get("/profiles/{profile_id}")
+async def get_profile(
+    profile_id: str,
+    format: str = Query("text", pattern="^(text|pstats)$"),
+    sort: str = Query("cumulative"),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """
+    Get the profile of a single request.
+
+    The text format is the table printed by pstats; the pstats format can be opened with
+    pstats.Stats or snakeviz.
+    """
+    if format == "pstats":
+        data = profiles.dump(profile_id)
+        if data is None:
+            raise HTTPException(status_code=404, detail="Profile not found")
+        return Response(
+            content=data,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+        )
+
+    try:
+        text = profiles.text(profile_id, sort=sort, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    if text is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(text)
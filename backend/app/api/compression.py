@@ -0,0 +1,212 @@
+"""
+Negotiated compression of responses.
+Responses are compressed with brotli or gzip, whichever the client prefers in its
+Accept-Encoding header; brotli is only offered when the brotli package is installed.
+Embeddings sent as decimal text compress to less than half their size.
+"""
+
+import zlib
+from typing import List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content types worth compressing; anything else, such as images, is sent as is
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/msgpack",
+    "text/",
+)
+
+# Streamed responses of these types must reach the client as soon as each chunk is
+# written, so they are never compressed
+STREAMING_TYPES = ("text/event-stream",)
+
+def coded_etag(etag: str, encoding: str) -> str:
+    """
+    Get the ETag of a representation compressed with a content coding.
+
+    The compressed bytes differ from the uncompressed ones, so a strong ETag gets the
+    coding appended to stay strong and unique, e.g. "abc.v1" becomes "abc.v1-gzip".
+    Weak ETags already allow for such differences and are kept.
+    """
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return f'{etag[:-1]}-{encoding}"'
+
+def strip_coding(etag: str) -> str:
+    """Get the ETag of the uncompressed representation from the ETag of a compressed one."""
+    for encoding in ("br", "gzip"):
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+def supported_encodings() -> List[str]:
+    """Get the supported content codings, preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Choose the content coding for a response from an Accept-Encoding header.
+
+    Returns:
+        The coding with the highest quality value the client accepts, preferring
+        brotli on ties, or None to send the response uncompressed.
+    """
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, *params = [piece.strip() for piece in part.split(";")]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in supported_encodings():
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class _Compressor:
+    """Incremental compressor for one content coding."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits 31 selects the gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, finish: bool) -> bytes:
+        """Compress a chunk; unless it is the last one, flush it so the client can decode it right away."""
+        if self.encoding == "br":
+            output = self._compressor.process(data)
+            return output + (self._compressor.finish() if finish else self._compressor.flush())
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_FINISH if finish else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    Compress responses with the content coding the client prefers.
+
+    Small responses, responses that are already encoded, event streams and content
+    types that do not compress are sent unchanged. Streamed responses are compressed
+    chunk by chunk.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+        # The start of the body is held back until it reaches the minimum size, since
+        # responses passed through BaseHTTPMiddleware arrive in several chunks
+        pending = bytearray()
+
+        async def compressing_send(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] == 304:
+                    self._tag_not_modified(message, encoding, request_headers.get("if-none-match", ""))
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                if not self._is_compressible(headers):
+                    passthrough = True
+                    await send(start_message)
+                    await send(message)
+                    return
+
+                pending.extend(body)
+                if more_body and len(pending) < self.minimum_size:
+                    return
+                if not more_body and len(pending) < self.minimum_size:
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": bytes(pending)})
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                headers.add_vary_header("Accept-Encoding")
+                etag = headers.get("etag")
+                if etag:
+                    headers["ETag"] = coded_etag(etag, encoding)
+                body = bytes(pending)
+                if more_body:
+                    del headers["Content-Length"]
+                else:
+                    body = compressor.compress(body, finish=True)
+                    headers["Content-Length"] = str(len(body))
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                await send(start_message)
+
+            await send({
+                "type": "http.response.body",
+                "body": compressor.compress(body, finish=not more_body),
+                "more_body": more_body,
+            })
+
+        await self.app(scope, receive, compressing_send)
+
+    def _tag_not_modified(self, message, encoding: str, if_none_match: str) -> None:
+        """
+        Give a 304 the ETag of the compressed copy the client holds.
+
+        A 304 has no body to compress, so whether the full response would have been
+        compressed is only known from the ETag the client sent back.
+        """
+        headers = MutableHeaders(scope=message)
+        etag = headers.get("etag")
+        if not etag:
+            return
+        # Caches must match the 304 to the stored response, which varies on the coding
+        headers.add_vary_header("Accept-Encoding")
+        coded = coded_etag(etag, encoding)
+        if coded != etag and coded in [candidate.strip() for candidate in if_none_match.split(",")]:
+            headers["ETag"] = coded
+
+    def _is_compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES) and not content_type.startswith(STREAMING_TYPES)
@@ -0,0 +1,54 @@
+"""
+Service dependencies of the API routes.
+The service modules import the Google Cloud client libraries, which is slow, so they
+are only imported when the services are created by the registry.
+"""
+
+from fastapi import HTTPException
+
+from app.core.service_registry import ServiceRegistry, ServiceUnavailableError
+
+def _create_document_service():
+    from app.services.document_service import DocumentService
+    return DocumentService()
+
+def _create_embedding_service():
+    from app.services.embedding_service import EmbeddingService
+    return EmbeddingService()
+
+def _create_summarization_service():
+    from app.services.summarization_service import SummarizationService
+    return SummarizationService()
+
+def _create_web_service():
+    from app.services.web_service import WebService
+    return WebService()
+
+services = ServiceRegistry({
+    "document": _create_document_service,
+    "embedding": _create_embedding_service,
+    "summarization": _create_summarization_service,
+    "web": _create_web_service,
+})
+
+async def _get_service(name: str):
+    try:
+        return await services.get(name)
+    except ServiceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def get_document_service():
+    """Get the document service."""
+    return await _get_service("document")
+
+async def get_embedding_service():
+    """Get the embedding service."""
+    return await _get_service("embedding")
+
+async def get_summarization_service():
+    """Get the summarization service."""
+    return await _get_service("summarization")
+
+async def get_web_service():
+    """Get the web service."""
+    return await _get_service("web")
@@ -0,0 +1,18 @@
+"""
+Exception handlers shared by the real and mock applications.
+"""
+
+import math
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from app.core.scheduler import QuotaExceededError
+
+async def quota_exceeded_handler(request: Request, exc: QuotaExceededError) -> JSONResponse:
+    """Tell callers whose work was shed when the quota allows it again."""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(math.ceil(exc.retry_after), 1))},
+    )
@@ -0,0 +1,352 @@
+"""
+Middleware shared by the real and mock applications.
+"""
+
+import cProfile
+import hashlib
+import json
+import time
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.routing import Match
+
+from app.api.admin import is_admin, profiles
+from app.core import metrics
+from app.core.config import (
+    CORS_ORIGINS, LOG_SLOW_REQUEST_SECONDS, PRIORITY_HEADER, PROFILE_HEADER, TRACE_DEBUG_ENABLED,
+    TRACE_QUERY_PARAM
+)
+from app.core.log import get_logger
+from app.core.scheduler import INTERACTIVE, PRIORITIES, priority
+from app.core.tracing import Trace, trace_request
+from app.core.traffic import TrafficRecorder
+
+logger = get_logger(__name__)
+
+def route_template(request: Request) -> str:
+    """
+    Get the path template of the route handling a request, such as
+    /api/documents/{document_id}, so that metrics and logs are not split per document.
+    """
+    for route in request.app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+class RequestLoggingMiddleware:
+    """
+    Log one structured line per request.
+
+    Requests to high-volume routes are sampled, see LOG_SAMPLE_RATES. Slow and
+    failed requests are logged as warnings and are never sampled out.
+
+    This is a plain ASGI middleware, so the logged duration runs until the last chunk
+    of the response is sent, which for streamed responses is long after the headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        route = route_template(request)
+        logger.debug("Request received", extra={"method": request.method, "path": request.url.path})
+
+        start_time = time.perf_counter()
+        end_time = None
+        status = 500
+
+        async def logging_send(message):
+            nonlocal status, end_time
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                end_time = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, logging_send)
+        finally:
+            duration = (end_time or time.perf_counter()) - start_time
+            fields = {
+                "method": request.method,
+                "path": request.url.path,
+                "route": route,
+                "status": status,
+                "duration_ms": round(duration * 1000, 1),
+                "sample_key": route,
+            }
+            if status >= 500 or duration >= LOG_SLOW_REQUEST_SECONDS:
+                logger.warning("Request completed", extra=fields)
+            else:
+                logger.info("Request completed", extra=fields)
+
+class MetricsMiddleware:
+    """
+    Record the latency and the number of in-flight requests per route.
+
+    This is a plain ASGI middleware, so the latency runs until the last chunk of the
+    response is sent rather than until its headers are, which matters for streams.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(Request(scope))
+        start_time = time.perf_counter()
+        end_time = None
+        status = "500"
+
+        async def metered_send(message):
+            nonlocal status, end_time
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                end_time = time.perf_counter()
+
+        metrics.REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, metered_send)
+        finally:
+            metrics.REQUESTS_IN_FLIGHT.dec()
+            metrics.REQUEST_DURATION.observe(
+                (end_time or time.perf_counter()) - start_time, method=method, route=route, status=status
+            )
+
+class PriorityMiddleware:
+    """
+    Run each request at the priority given in its priority header.
+
+    Bulk clients, such as ingest scripts, send "background" so that their calls to
+    rate-limited providers yield to interactive requests from the extension popup.
+    Requests without the header, or with an unknown value, are interactive.
+
+    This only sets a context variable, so it is a plain ASGI middleware rather than a
+    BaseHTTPMiddleware, which would run every request in an extra task.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = Headers(scope=scope).get(PRIORITY_HEADER, INTERACTIVE).strip().lower()
+        if value not in PRIORITIES:
+            logger.debug(f"Unknown request priority {value!r}, using {INTERACTIVE}")
+            value = INTERACTIVE
+
+        with priority(value):
+            await self.app(scope, receive, send)
+
+class ProfilingMiddleware:
+    """
+    Profile single requests with cProfile when they carry the profile header.
+
+    Only admin requests are profiled, see app.api.admin. The profile is kept in memory
+    and its ID returned in the X-Profile-Id header, for GET /admin/profiles/{id}.
+
+    cProfile traces the whole event loop thread, so requests running at the same time
+    show up in the profile too. Profile on a quiet worker.
+
+    This is a plain ASGI middleware, so requests without the header, which are nearly
+    all of them, pass straight through without the task a BaseHTTPMiddleware adds.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.header = PROFILE_HEADER.lower().encode("latin-1")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(name == self.header for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        if not is_admin(request.headers.get("authorization")):
+            await self.app(scope, receive, send)
+            return
+
+        if not profiles.active.acquire(blocking=False):
+            logger.warning("Another request is being profiled", extra={"path": request.url.path})
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = profiles.new_id()
+
+        async def tagging_send(message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        profile = cProfile.Profile()
+        start_time = time.perf_counter()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, tagging_send)
+            finally:
+                profile.disable()
+        finally:
+            profiles.active.release()
+            profiles.add(
+                profile, f"{request.method} {request.url.path}", time.perf_counter() - start_time, profile_id
+            )
+
+class TracingMiddleware:
+    """
+    Trace each request and report the time spent in each stage.
+
+    The stage durations are sent in the Server-Timing header, which browser devtools
+    show in the network panel. When TRACE_DEBUG_ENABLED is set, adding ?trace=true to a
+    request replaces the response with a JSON document holding the original body and
+    the full list of spans.
+
+    Streaming responses only report the stages that ran before the first byte was sent.
+
+    This is a plain ASGI middleware, so responses are passed on as they are sent,
+    without the task a BaseHTTPMiddleware adds; only traced responses are buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        wants_trace = self._wants_trace(scope)
+        with trace_request() as trace:
+            start_message = None
+            body = bytearray()
+
+            async def timing_send(message):
+                nonlocal start_message
+                if message["type"] == "http.response.start":
+                    headers = MutableHeaders(scope=message)
+                    if wants_trace and not self._is_streaming(headers):
+                        start_message = message
+                        return
+                    headers["Server-Timing"] = trace.server_timing()
+                    # Cross-origin callers, such as the browser extension, only see the
+                    # timings if the server allows it
+                    headers["Timing-Allow-Origin"] = ", ".join(CORS_ORIGINS)
+                    await send(message)
+                    return
+
+                if start_message is not None and message["type"] == "http.response.body":
+                    body.extend(message.get("body", b""))
+                    if not message.get("more_body", False):
+                        response = self._trace_response(start_message, bytes(body), trace)
+                        await response(scope, receive, send)
+                    return
+                await send(message)
+
+            await self.app(scope, receive, timing_send)
+
+    def _wants_trace(self, scope) -> bool:
+        if not TRACE_DEBUG_ENABLED:
+            return False
+        return QueryParams(scope["query_string"]).get(TRACE_QUERY_PARAM, "").lower() in ("true", "1", "t")
+
+    def _is_streaming(self, headers: MutableHeaders) -> bool:
+        return headers.get("content-type", "").startswith("text/event-stream")
+
+    def _trace_response(self, start_message, body: bytes, trace: Trace) -> JSONResponse:
+        """Wrap the body of a response in a JSON document together with its trace."""
+        status_code = start_message["status"]
+        content_type = MutableHeaders(raw=start_message["headers"]).get("content-type", "")
+
+        content = body.decode("utf-8", errors="replace")
+        if content_type.startswith("application/json"):
+            try:
+                content = json.loads(body) if body else None
+            except ValueError:
+                pass
+
+        return JSONResponse(
+            content={
+                "status_code": status_code,
+                "body": content,
+                "trace": trace.to_dict(),
+            },
+            status_code=status_code if status_code not in (204, 304) else 200,
+            headers={"Server-Timing": trace.server_timing()},
+        )
+
+class TrafficCaptureMiddleware:
+    """
+    Record sanitised requests for replay_traffic.py, see app.core.traffic.
+
+    This is a plain ASGI middleware rather than a BaseHTTPMiddleware, so that it can
+    see the request body as the application reads it, without buffering it a second
+    time, and the duration includes streamed responses up to their last chunk.
+    """
+
+    def __init__(self, app, recorder: TrafficRecorder):
+        self.app = app
+        self.recorder = recorder
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.recorder.should_capture():
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+        started_at = time.time()
+        start_time = time.perf_counter()
+        digest = hashlib.sha256()
+        body = bytearray()
+        body_length = 0
+        status = 500
+
+        async def capture_receive():
+            nonlocal body_length
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                digest.update(chunk)
+                body_length += len(chunk)
+                # Stop keeping the body once it is too long to be captured anyway
+                if self.recorder.capture_bodies and body_length <= self.recorder.max_body_bytes:
+                    body.extend(chunk)
+            return message
+
+        async def capture_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            entry = {
+                "ts": round(started_at, 6),
+                "m": request.method,
+                "p": request.url.path,
+                "r": route_template(request),
+                **self.recorder.query_fields(request.query_params.multi_items()),
+                "h": self.recorder.select_headers(request.headers),
+                **self.recorder.body_fields(bytes(body), body_length, digest.hexdigest()),
+                "s": status,
+                "d": round(time.perf_counter() - start_time, 6),
+            }
+            self.recorder.record(entry)
@@ -0,0 +1,268 @@
+"""
+Responses for documents, shared by the real and mock routes.
+Routes that return a model are validated against their response model by FastAPI and
+then serialized with the standard json module, which for documents means checking
+each embedding value again. Documents returned by the services are already valid, so
+these helpers dump them with the compiled Pydantic serializer and encode them with
+orjson instead. The routes keep their response_model for the OpenAPI schema.
+
+Clients can ask for compact embeddings with the embedding_encoding query parameter,
+and for list responses as newline-delimited JSON or MessagePack with the Accept
+header, see get_response_format(). MessagePack needs the msgpack package.
+
+Many documents can be fetched by ID in one call, optionally only some of their
+fields, see batch_response().
+
+Single documents carry an ETag derived from their ID and version, so that clients
+can revalidate them with If-None-Match instead of downloading them again.
+"""
+
+import base64
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import ORJSONResponse, Response
+
+from app.api.compression import strip_coding
+from app.core.config import BATCH_GET_MAX_IDS
+from app.models.document import Document, DocumentBatchGet
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+MSGPACK = "application/msgpack"
+
+# Media types clients may send for MessagePack
+MSGPACK_ALIASES = (MSGPACK, "application/x-msgpack")
+
+# Documents may be cached by the client but must be revalidated, since they can be
+# edited at any time; they belong to one user, so shared caches must not keep them
+DOCUMENT_CACHE_CONTROL = "private, no-cache"
+
+# The format of responses is negotiated on the Accept header, so caches must keep a
+# separate copy for each value of it
+NEGOTIATED_VARY = "Accept"
+
+# Embedding encodings: decimal floats, or base64 of the little-endian floats
+FLOAT = "float"
+EMBEDDING_DTYPES = {
+    "base64-float32": "<f4",
+    "base64-float16": "<f2",
+}
+
+class ResponseFormat:
+    """The media type and embedding encoding a client asked for."""
+
+    def __init__(self, media_type: str = JSON, embedding_encoding: str = FLOAT):
+        self.media_type = media_type
+        self.embedding_encoding = embedding_encoding
+
+def negotiate_media_type(accept: str) -> Optional[str]:
+    """
+    Choose the media type of a response from an Accept header.
+
+    Returns:
+        The supported media type with the highest quality value, JSON if the client
+        accepts anything, or None if it accepts nothing this API can send.
+    """
+    if not accept.strip():
+        return JSON
+
+    ranges = []
+    for position, part in enumerate(accept.split(",")):
+        media_range, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            # Ties keep the order of the header
+            ranges.append((-quality, position, media_range.lower()))
+
+    for _, _, media_range in sorted(ranges):
+        if media_range in (JSON, "application/*", "*/*"):
+            return JSON
+        if media_range == NDJSON:
+            return NDJSON
+        if media_range in MSGPACK_ALIASES and msgpack is not None:
+            return MSGPACK
+    return None
+
+async def get_response_format(
+    request: Request,
+    embedding_encoding: str = Query(
+        FLOAT,
+        pattern="^(float|base64-float32|base64-float16)$",
+        description="Send embeddings as decimal floats, or as base64 of little-endian float32 or float16 values",
+    ),
+) -> ResponseFormat:
+    """Get the response format of a request, or answer 406 if no supported format is acceptable."""
+    media_type = negotiate_media_type(request.headers.get("accept", ""))
+    if media_type is None:
+        available = ", ".join([JSON, NDJSON] + ([MSGPACK] if msgpack is not None else []))
+        raise HTTPException(status_code=406, detail=f"Not acceptable; available media types: {available}")
+    return ResponseFormat(media_type, embedding_encoding)
+
+def encode_embedding(values: List[float], encoding: str, binary: bool = False) -> Any:
+    """
+    Encode an embedding.
+
+    Args:
+        values: The embedding.
+        encoding: FLOAT, or one of EMBEDDING_DTYPES.
+        binary: Whether the response format carries bytes, as MessagePack does, so the
+            packed floats need no base64.
+
+    Returns:
+        The values unchanged, or the packed floats as base64 text or bytes.
+    """
+    if encoding == FLOAT:
+        return values
+    packed = np.asarray(values, dtype=EMBEDDING_DTYPES[encoding]).tobytes()
+    return packed if binary else base64.b64encode(packed).decode("ascii")
+
+def document_etag(document_id: str, version: int, response_format: Optional[ResponseFormat] = None) -> str:
+    """
+    Get the strong ETag of a document version.
+
+    Each representation of a document, such as MessagePack or float16 embeddings, is a
+    different sequence of bytes and so gets its own ETag.
+    """
+    response_format = response_format or ResponseFormat()
+    variant = ""
+    if response_format.media_type != JSON:
+        variant += "." + response_format.media_type.rpartition("/")[2]
+    if response_format.embedding_encoding != FLOAT:
+        variant += "." + response_format.embedding_encoding
+    return f'"{document_id}.v{version}{variant}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag, using the weak comparison it calls for.
+
+    ETags of compressed copies, which CompressionMiddleware tags with their content
+    coding, match the ETag of the uncompressed representation.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        strip_coding(candidate.strip().removeprefix("W/")) == opaque for candidate in if_none_match.split(",")
+    )
+
+def not_modified_response(etag: str) -> Response:
+    """Tell the client its cached copy of a document is still current."""
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": DOCUMENT_CACHE_CONTROL, "Vary": NEGOTIATED_VARY},
+    )
+
+def _dump(document: Document, response_format: ResponseFormat) -> Dict[str, Any]:
+    data = document.model_dump()
+    if response_format.embedding_encoding != FLOAT:
+        data["embedding"] = encode_embedding(
+            data["embedding"], response_format.embedding_encoding, binary=response_format.media_type == MSGPACK
+        )
+        data["embedding_encoding"] = response_format.embedding_encoding
+    return data
+
+def _project(document_id: str, data: Dict[str, Any], fields: List[str], response_format: ResponseFormat) -> Dict[str, Any]:
+    projected = {"id": document_id}
+    projected.update((field, data[field]) for field in fields if field in data)
+    if "embedding" in projected and response_format.embedding_encoding != FLOAT:
+        projected["embedding"] = encode_embedding(
+            projected["embedding"], response_format.embedding_encoding, binary=response_format.media_type == MSGPACK
+        )
+        projected["embedding_encoding"] = response_format.embedding_encoding
+    return projected
+
+def _render(
+    content: Any, response_format: ResponseFormat, status_code: int, headers: Optional[Dict[str, str]] = None
+) -> Response:
+    headers = {**(headers or {}), "Vary": NEGOTIATED_VARY}
+    if response_format.media_type == MSGPACK:
+        return Response(msgpack.packb(content), status_code=status_code, headers=headers, media_type=MSGPACK)
+    if response_format.media_type == NDJSON:
+        items = content if isinstance(content, list) else [content]
+        body = b"".join(orjson.dumps(item) + b"\n" for item in items)
+        return Response(body, status_code=status_code, headers=headers, media_type=NDJSON)
+    return ORJSONResponse(content=content, status_code=status_code, headers=headers)
+
+def document_response(
+    document: Document,
+    response_format: Optional[ResponseFormat] = None,
+    status_code: int = 200,
+    cache_control: Optional[str] = None,
+) -> Response:
+    """Respond with a single document, tagged with the ETag of its version if it is stored."""
+    response_format = response_format or ResponseFormat()
+    headers = {}
+    if document.id:
+        headers["ETag"] = document_etag(document.id, document.version, response_format)
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return _render(_dump(document, response_format), response_format, status_code, headers)
+
+def documents_response(documents: List[Document], response_format: Optional[ResponseFormat] = None) -> Response:
+    """Respond with a list of documents; as NDJSON, one document per line."""
+    response_format = response_format or ResponseFormat()
+    return _render([_dump(document, response_format) for document in documents], response_format, 200)
+
+def validate_batch_get(batch: DocumentBatchGet) -> None:
+    """Answer 400 if a batch get asks for no documents, too many, or fields documents do not have."""
+    if not batch.ids:
+        raise HTTPException(status_code=400, detail="No document IDs given")
+    if len(batch.ids) > BATCH_GET_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_GET_MAX_IDS} document IDs can be fetched at once")
+    if batch.fields is not None:
+        unknown = [field for field in batch.fields if field not in Document.model_fields]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+
+def batch_response(
+    document_ids: List[str],
+    found: Dict[str, Dict[str, Any]],
+    fields: Optional[List[str]] = None,
+    response_format: Optional[ResponseFormat] = None,
+) -> Response:
+    """
+    Respond to a batch get with the found documents in the order they were asked for.
+
+    Args:
+        document_ids: The requested IDs; each document is sent once.
+        found: The stored data of the documents that exist, keyed by ID.
+        fields: The fields to send, besides the ID, or None to send whole documents.
+        response_format: The format the client asked for.
+    """
+    response_format = response_format or ResponseFormat()
+    documents, missing = [], []
+    for document_id in dict.fromkeys(document_ids):
+        data = found.get(document_id)
+        if data is None:
+            missing.append(document_id)
+        elif fields is None:
+            documents.append(_dump(Document.from_storage(data), response_format))
+        else:
+            documents.append(_project(document_id, data, fields, response_format))
+    return _render({"documents": documents, "missing": missing}, response_format, 200)
+
+def embedding_response(embedding: List[float], response_format: Optional[ResponseFormat] = None) -> Response:
+    """Respond with an embedding: a list of floats, or a string or bytes when it is encoded."""
+    response_format = response_format or ResponseFormat()
+    content = encode_embedding(
+        list(embedding), response_format.embedding_encoding, binary=response_format.media_type == MSGPACK
+    )
+    # An embedding is a single value, so NDJSON has nothing to split it into
+    if response_format.media_type == NDJSON:
+        response_format = ResponseFormat(JSON, response_format.embedding_encoding)
+    return _render(content, response_format, 200)
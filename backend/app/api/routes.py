@@ -1,96 +1,208 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
-from app.models.document import Document, DocumentCreate, DocumentUpdate
-from app.services.document_service import DocumentService
-from app.services.embedding_service import EmbeddingService
-from app.services.summarization_service import SummarizationService
-from app.services.web_service import WebService
+from app.api.dependencies import (
+    services, get_document_service, get_embedding_service,
+    get_summarization_service, get_web_service
+)
+from app.api.responses import (
+    DOCUMENT_CACHE_CONTROL, ResponseFormat, batch_response, document_etag, document_response,
+    documents_response, embedding_response, etag_matches, get_response_format, not_modified_response,
+    validate_batch_get
+)
+from app.api.sse import format_sse_event, sse_response
+from app.core import metrics
+from app.core.config import SUGGEST_MAX_RESULTS, VECTOR_INDEX_EMBEDDING_PROVIDER
+from app.core.log import get_logger
+from app.core.scheduler import PRIORITIES, QuotaExceededError
+from app.models.document import Document, DocumentBatch, DocumentBatchGet, DocumentCreate, DocumentUpdate
+from app.models.embedding import Embedding, EmbeddingSpaceMismatchError, EmbeddingUnavailableError
+from app.models.suggestion import SuggestionList
 
 router = APIRouter()
-document_service = DocumentService()
-embedding_service = EmbeddingService()
-summarization_service = SummarizationService()
-web_service = WebService()
+logger = get_logger(__name__)
+
+SUMMARIZATION_QUEUE_DEPTH = metrics.registry.gauge(
+    "marchiver_summarization_queue_depth",
+    "Summarization requests waiting for a free Gemini slot.",
+)
+SUMMARIZATION_IN_FLIGHT = metrics.registry.gauge(
+    "marchiver_summarization_in_flight",
+    "Gemini summarization requests currently running.",
+)
+
+EMBEDDING_PROVIDER_STATE = metrics.registry.gauge(
+    "marchiver_embedding_provider_circuit_state",
+    "Circuit breaker state of each embedding provider (0 closed, 1 half-open, 2 open).",
+    ["provider"],
+)
+EMBEDDING_PROVIDER_LATENCY = metrics.registry.gauge(
+    "marchiver_embedding_provider_latency_seconds",
+    "Moving average of the embedding latency of each provider.",
+    ["provider"],
+)
+BREAKER_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+QUOTA_TOKENS = metrics.registry.gauge(
+    "marchiver_quota_tokens",
+    "Requests each provider quota currently allows at once.",
+    ["quota"],
+)
+QUOTA_WAITING = metrics.registry.gauge(
+    "marchiver_quota_waiting",
+    "Requests waiting for a provider quota, per priority.",
+    ["quota", "priority"],
+)
+QUOTA_SHED = metrics.registry.counter(
+    "marchiver_quota_shed_requests_total",
+    "Requests shed since startup because a provider quota was exhausted, per priority.",
+    ["quota", "priority"],
+)
+
+def _record_quota_stats(quota: str, stats: dict) -> None:
+    QUOTA_TOKENS.set(stats["tokens"], quota=quota)
+    for priority in PRIORITIES:
+        QUOTA_WAITING.set(stats["waiting"][priority], quota=quota, priority=priority)
+        QUOTA_SHED.set_total(stats["shed"][priority], quota=quota, priority=priority)
+
+def collect_service_metrics():
+    """Publish cache and queue statistics of the services before metrics are rendered."""
+    # Services that have not been created yet have nothing to report
+    summarization_service = services.peek("summarization")
+    if summarization_service is not None:
+        summarization_metrics = summarization_service.get_metrics()
+        SUMMARIZATION_QUEUE_DEPTH.set(summarization_metrics["waiting"])
+        SUMMARIZATION_IN_FLIGHT.set(summarization_metrics["in_flight"])
+        _record_quota_stats(summarization_service.scheduler.name, summarization_metrics["quota"])
+        
+        if summarization_service.cache is not None:
+            stats = summarization_service.cache.stats()
+            metrics.record_cache_stats(
+                "summary", stats["memory_hits"] + stats["disk_hits"], stats["misses"], stats["disk_bytes"]
+            )
+    
+    embedding_service = services.peek("embedding")
+    if embedding_service is not None:
+        for provider, stats in embedding_service.get_provider_stats().items():
+            EMBEDDING_PROVIDER_STATE.set(BREAKER_STATE_VALUES[stats["state"]], provider=provider)
+            if stats["latency_seconds"] is not None:
+                EMBEDDING_PROVIDER_LATENCY.set(stats["latency_seconds"], provider=provider)
+            if "quota" in stats:
+                _record_quota_stats(provider, stats["quota"])
+    
+    web_service = services.peek("web")
+    if web_service is not None and web_service.cache is not None:
+        stats = web_service.cache.stats()
+        metrics.record_cache_stats("http", stats["hits"], stats["misses"], stats["bytes"])
+
+metrics.registry.add_collector(collect_service_metrics)
 
 @router.post("/documents", response_model=Document, status_code=201)
-async def create_document(document: DocumentCreate):
+async def create_document(
+    document: DocumentCreate,
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
+    embedding_service=Depends(get_embedding_service),
+):
     """Create a new document in the archive."""
     try:
-        print(f"Creating new document: '{document.title}'")
-        print(f"Content length: {len(document.content)} bytes")
-        
         # Generate embedding for the document
-        print(f"Generating embedding...")
         embedding = await embedding_service.generate_embedding(document.content)
-        print(f"Embedding generated ({len(embedding)} dimensions)")
         
         # Create the document with the embedding
-        print(f"Saving document to database...")
         result = await document_service.create_document(document, embedding)
-        print(f"Document created successfully with ID: {result.id}")
-        return result
+        logger.info("Created document", extra={"document_id": result.id, "content_length": len(document.content)})
+        return document_response(result, response_format, status_code=201)
+    except QuotaExceededError:
+        # Answered with 429 and Retry-After, see app.api.errors
+        raise
     except Exception as e:
-        print(f"Error creating document: {str(e)}")
+        logger.exception("Failed to create document")
         raise HTTPException(status_code=500, detail=f"Failed to create document: {str(e)}")
 
+@router.post("/documents:batchGet", response_model=DocumentBatch)
+async def batch_get_documents(
+    batch: DocumentBatchGet,
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
+):
+    """
+    Get many documents by ID in one call.
+    
+    The documents are read from Firestore in a single request and returned in the
+    order of the IDs; the IDs of documents that do not exist are listed in missing.
+    With fields set, only those fields and the ID are read and returned, so that
+    clients can leave out the content or embedding of documents they only list.
+    """
+    validate_batch_get(batch)
+    found = await document_service.get_documents(batch.ids, batch.fields)
+    logger.debug("Batch get", extra={"requested": len(batch.ids), "found": len(found)})
+    return batch_response(batch.ids, found, batch.fields, response_format)
+
 @router.get("/documents/{document_id}", response_model=Document)
-async def get_document(document_id: str):
-    """Get a document by ID."""
-    print(f"Retrieving document with ID: {document_id}")
+async def get_document(
+    document_id: str,
+    if_none_match: Optional[str] = Header(None),
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
+):
+    """
+    Get a document by ID.
+    
+    Clients that send the ETag of their copy in If-None-Match get 304 Not Modified
+    while the document is unchanged, which only needs its version to be read.
+    """
+    if if_none_match:
+        version = await document_service.get_document_version(document_id)
+        if version is not None:
+            etag = document_etag(document_id, version, response_format)
+            if etag_matches(if_none_match, etag):
+                logger.debug("Document not modified", extra={"document_id": document_id, "version": version})
+                return not_modified_response(etag)
     
     document = await document_service.get_document(document_id)
     if not document:
-        print(f"Document with ID {document_id} not found")
         raise HTTPException(status_code=404, detail="Document not found")
     
-    print(f"Found document: '{document.title}'")
-    return document
+    return document_response(document, response_format, cache_control=DOCUMENT_CACHE_CONTROL)
 
 @router.put("/documents/{document_id}", response_model=Document)
-async def update_document(document_id: str, document_update: DocumentUpdate):
+async def update_document(
+    document_id: str,
+    document_update: DocumentUpdate,
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
+    embedding_service=Depends(get_embedding_service),
+):
     """Update a document."""
-    print(f"Updating document with ID: {document_id}")
-    
     document = await document_service.get_document(document_id)
     if not document:
-        print(f"Document with ID {document_id} not found")
         raise HTTPException(status_code=404, detail="Document not found")
     
-    print(f"Found document: '{document.title}'")
-    
     # If content is updated, regenerate the embedding
     if document_update.content:
-        print(f"Content updated. Generating new embedding...")
-        print(f"New content length: {len(document_update.content)} bytes")
         embedding = await embedding_service.generate_embedding(document_update.content)
-        print(f"Embedding generated ({len(embedding)} dimensions)")
-        
-        print(f"Updating document with new content and embedding...")
         result = await document_service.update_document(document_id, document_update, embedding)
-        print(f"Document updated successfully")
-        return result
+        logger.info("Updated document", extra={"document_id": document_id, "content_changed": True})
+        return document_response(result, response_format)
     
-    print(f"Updating document metadata only (no content change)...")
     result = await document_service.update_document(document_id, document_update)
-    print(f"Document updated successfully")
-    return result
+    logger.info("Updated document", extra={"document_id": document_id, "content_changed": False})
+    return document_response(result, response_format)
 
 @router.delete("/documents/{document_id}", status_code=204)
-async def delete_document(document_id: str):
+async def delete_document(
+    document_id: str,
+    document_service=Depends(get_document_service),
+):
     """Delete a document."""
-    print(f"Deleting document with ID: {document_id}")
-    
     document = await document_service.get_document(document_id)
     if not document:
-        print(f"Document with ID {document_id} not found")
         raise HTTPException(status_code=404, detail="Document not found")
     
-    print(f"Found document: '{document.title}'")
-    print(f"Deleting document from database and vector search...")
-    
     await document_service.delete_document(document_id)
-    print(f"Document deleted successfully")
+    logger.info("Deleted document", extra={"document_id": document_id})
     return None
 
 @router.get("/documents", response_model=List[Document])
@@ -99,6 +211,8 @@ async def search_documents(
     semantic: bool = False,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
 ):
     """
     Search for documents.
@@ -108,86 +222,108 @@ async def search_documents(
     - If query is not provided, return the most recent documents.
     """
     if query and semantic:
-        print(f"Performing semantic search for query: '{query}'")
-        print(f"Parameters: limit={limit}, offset={offset}")
+        # Only semantic search needs the embedding service
+        embedding_service = await get_embedding_service()
         
-        # Generate embedding for the query
-        print(f"Generating embedding for query...")
-        query_embedding = await embedding_service.generate_embedding(query)
-        print(f"Embedding generated ({len(query_embedding)} dimensions)")
+        # The query must be embedded by the provider whose vectors the index holds;
+        # fail fast instead of comparing vectors from different spaces
+        try:
+            query_embedding = await embedding_service.generate_embedding(
+                query, provider=VECTOR_INDEX_EMBEDDING_PROVIDER
+            )
+            results = await document_service.semantic_search(query_embedding, limit, offset)
+        except (EmbeddingUnavailableError, EmbeddingSpaceMismatchError) as e:
+            raise HTTPException(status_code=503, detail=f"Semantic search is unavailable: {str(e)}")
         
-        # Perform semantic search
-        print(f"Executing semantic search...")
-        results = await document_service.semantic_search(query_embedding, limit, offset)
-        print(f"Search completed. Found {len(results)} results.")
-        return results
+        logger.debug("Semantic search", extra={"query": query, "limit": limit, "offset": offset, "results": len(results)})
+        return documents_response(results, response_format)
     
     if query:
-        print(f"Performing full-text search for query: '{query}'")
-        print(f"Parameters: limit={limit}, offset={offset}")
-        
         # Perform full-text search
-        print(f"Executing full-text search...")
         results = await document_service.full_text_search(query, limit, offset)
-        print(f"Search completed. Found {len(results)} results.")
-        return results
+        logger.debug("Full-text search", extra={"query": query, "limit": limit, "offset": offset, "results": len(results)})
+        return documents_response(results, response_format)
     
     # Return the most recent documents
-    print(f"Retrieving most recent documents")
-    print(f"Parameters: limit={limit}, offset={offset}")
-    
     results = await document_service.get_recent_documents(limit, offset)
-    print(f"Retrieved {len(results)} recent documents.")
-    return results
+    logger.debug("Recent documents", extra={"limit": limit, "offset": offset, "results": len(results)})
+    return documents_response(results, response_format)
+
+@router.get("/suggest", response_model=SuggestionList)
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(8, ge=1, le=SUGGEST_MAX_RESULTS),
+    document_service=Depends(get_document_service),
+):
+    """
+    Suggest document titles, tags and categories for what a user has typed so far.
+    
+    Suggestions come from an in-memory index of the archive, so search as you type
+    reads neither Firestore nor the embedding model. Titles match at the start of any
+    of their words and carry the ID of their document.
+
+    Each worker keeps its own index of the newest SUGGEST_LOAD_LIMIT documents and
+    updates it on the writes it handles. Documents created, changed or deleted through
+    other workers are only reflected after its next reload, every
+    SUGGEST_REFRESH_SECONDS.
+    """
+    suggestions = document_service.suggestions.lookup(prefix, limit)
+    return ORJSONResponse({"prefix": prefix, "suggestions": suggestions})
 
 @router.post("/web/fetch", response_model=Document)
-async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
+async def fetch_web_page(
+    url: str,
+    save: bool = True,
+    summarize: bool = True,
+    summary_mode: str = Query("auto", pattern="^(auto|local|llm)$"),
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
+    embedding_service=Depends(get_embedding_service),
+    summarization_service=Depends(get_summarization_service),
+    web_service=Depends(get_web_service),
+):
     """
     Fetch a web page, optionally summarize it, and optionally save it to the archive.
     If a document with the same URL already exists, it will be updated instead of creating a new one.
     """
     try:
-        print(f"Starting to fetch web page: {url}")
-        print(f"Options: save={save}, summarize={summarize}")
-        
         # Fetch the web page
-        print(f"Fetching content from {url}...")
-        content, title = await web_service.fetch_web_page(url)
-        print(f"Successfully fetched page: '{title}' ({len(content)} bytes)")
+        page = await web_service.fetch_page(url)
+        content, title = page.content, page.title
+        logger.debug("Fetched web page", extra={"url": url, "content_length": len(content)})
+        
+        metadata = {
+            "source": "web",
+            "url": url,
+        }
+        
+        # Mark pages that were cut off at the download size limit
+        if page.truncated:
+            metadata["truncated"] = True
+            metadata["bytes_read"] = page.bytes_read
         
         # Create a document
         document = DocumentCreate(
             content=content,
             title=title,
             url=url,
-            metadata={
-                "source": "web",
-                "url": url,
-            }
+            metadata=metadata
         )
         
         # Summarize the content if requested
         if summarize:
-            print(f"Generating summary...")
-            summary = await summarization_service.summarize(content)
+            summary = await summarization_service.summarize(content, mode=summary_mode)
             document.summary = summary
-            print(f"Summary generated ({len(summary)} characters)")
         
         # Save the document if requested
         if save:
             # Generate embedding for the document
-            print(f"Generating embedding...")
             embedding = await embedding_service.generate_embedding(content)
-            print(f"Embedding generated ({len(embedding)} dimensions)")
             
             # Check if a document with the same URL already exists
-            print(f"Checking if document with URL {url} already exists...")
             existing_document = await document_service.find_document_by_url(url)
             
             if existing_document:
-                print(f"Document with URL {url} already exists with ID: {existing_document.id}")
-                print(f"Updating existing document...")
-                
                 # Update the existing document
                 document_update = DocumentUpdate(
                     content=content,
@@ -196,20 +332,16 @@ async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
                     metadata=document.metadata
                 )
                 result = await document_service.update_document(existing_document.id, document_update, embedding)
-                print(f"Successfully updated document with ID: {result.id}")
-                return result
+                logger.info("Updated document from web page", extra={"document_id": result.id, "url": url})
+                return document_response(result, response_format)
             else:
-                print(f"Document with URL {url} does not exist. Creating new document...")
-                
                 # Create a new document
                 result = await document_service.create_document(document, embedding)
-                print(f"Successfully created document with ID: {result.id}")
-                return result
-        
-        print(f"Document processed but not saved (save={save})")
+                logger.info("Created document from web page", extra={"document_id": result.id, "url": url})
+                return document_response(result, response_format)
         
         # Return the document without saving
-        return Document(
+        return document_response(Document(
             id="",
             content=content,
             title=title,
@@ -218,51 +350,124 @@ async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
             metadata=document.metadata,
             embedding=[],
             version=1,
-        )
+        ), response_format)
+    except QuotaExceededError:
+        raise
     except Exception as e:
+        logger.exception("Failed to process web page", extra={"url": url})
         raise HTTPException(status_code=500, detail=f"Failed to fetch web page: {str(e)}")
 
 @router.get("/documents/{document_id}/similar", response_model=List[Document])
 async def get_similar_documents(
     document_id: str,
     limit: int = Query(10, ge=1, le=100),
+    response_format: ResponseFormat = Depends(get_response_format),
+    document_service=Depends(get_document_service),
 ):
     """Get documents similar to the given document."""
-    print(f"Finding documents similar to document with ID: {document_id}")
-    print(f"Parameters: limit={limit}")
-    
     document = await document_service.get_document(document_id)
     if not document:
-        print(f"Document with ID {document_id} not found")
         raise HTTPException(status_code=404, detail="Document not found")
     
-    print(f"Found document: '{document.title}'")
-    print(f"Searching for similar documents...")
-    
-    results = await document_service.find_similar_documents(document.embedding, limit, exclude_ids=[document_id])
-    print(f"Found {len(results)} similar documents")
-    return results
+    # Documents stored before embeddings were tagged are assumed to be in the index space
+    embedding = Embedding(
+        document.embedding,
+        provider=document.metadata.get("embedding_provider", VECTOR_INDEX_EMBEDDING_PROVIDER),
+        model=document.metadata.get("embedding_model"),
+    )
+    try:
+        results = await document_service.find_similar_documents(embedding, limit, exclude_ids=[document_id])
+    except EmbeddingSpaceMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    logger.debug("Similar documents", extra={"document_id": document_id, "limit": limit, "results": len(results)})
+    return documents_response(results, response_format)
 
 @router.post("/embeddings", response_model=List[float])
-async def generate_embedding(text: str):
+async def generate_embedding(
+    text: str,
+    response_format: ResponseFormat = Depends(get_response_format),
+    embedding_service=Depends(get_embedding_service),
+):
     """Generate an embedding for the given text."""
     try:
-        print(f"Generating embedding for text ({len(text)} bytes)...")
         embedding = await embedding_service.generate_embedding(text)
-        print(f"Embedding generated successfully ({len(embedding)} dimensions)")
-        return embedding
+        return embedding_response(embedding, response_format)
+    except QuotaExceededError:
+        raise
     except Exception as e:
-        print(f"Error generating embedding: {str(e)}")
+        logger.exception("Failed to generate embedding")
         raise HTTPException(status_code=500, detail=f"Failed to generate embedding: {str(e)}")
 
 @router.post("/summarize", response_model=str)
-async def summarize_text(text: str):
-    """Summarize the given text."""
+async def summarize_text(
+    text: str,
+    mode: str = Query("auto", pattern="^(auto|local|llm)$"),
+    latency_budget_ms: Optional[int] = Query(None, ge=0),
+    summarization_service=Depends(get_summarization_service),
+):
+    """
+    Summarize the given text.
+    
+    - If mode is "local", use the fast local extractive summarizer.
+    - If mode is "llm", use Gemini.
+    - If mode is "auto", use the local summarizer for short texts, or when the
+      latency budget is below the expected Gemini latency, and Gemini otherwise.
+    """
     try:
-        print(f"Summarizing text ({len(text)} bytes)...")
-        summary = await summarization_service.summarize(text)
-        print(f"Summary generated successfully ({len(summary)} characters)")
-        return summary
+        latency_budget = latency_budget_ms / 1000 if latency_budget_ms is not None else None
+        return await summarization_service.summarize(text, mode=mode, latency_budget=latency_budget)
     except Exception as e:
-        print(f"Error summarizing text: {str(e)}")
+        logger.exception("Failed to summarize text")
         raise HTTPException(status_code=500, detail=f"Failed to summarize text: {str(e)}")
+
+@router.api_route("/summarize/stream", methods=["GET", "POST"])
+async def summarize_text_stream(
+    text: Optional[str] = None,
+    url: Optional[str] = None,
+    mode: str = Query("auto", pattern="^(auto|local|llm)$"),
+    summarization_service=Depends(get_summarization_service),
+    web_service=Depends(get_web_service),
+):
+    """
+    Stream a summary as Server-Sent Events while it is being generated.
+    
+    Summarizes the given text, or fetches and summarizes the web page at the given URL.
+    Sends a "page" event with the fetched page details (URL only), "chunk" events with
+    consecutive pieces of the summary, then a "done" event. If the page cannot be
+    fetched, or generation fails part way, an "error" event is sent instead of "done".
+    """
+    if not text and not url:
+        raise HTTPException(status_code=400, detail="Either text or url is required")
+    
+    page = None
+    if url:
+        page = await web_service.fetch_page(url)
+        text = page.content
+    
+    async def events():
+        if page is not None:
+            yield format_sse_event("page", {
+                "url": page.url,
+                "title": page.title,
+                "truncated": page.truncated,
+                "error": page.error,
+            })
+            if page.error:
+                # The content of a failed page is the error message, not worth summarizing
+                yield format_sse_event("error", {"detail": page.error})
+                return
+        
+        length = 0
+        try:
+            async for piece in summarization_service.summarize_stream(text, mode=mode):
+                length += len(piece)
+                yield format_sse_event("chunk", {"text": piece})
+        except Exception as e:
+            logger.exception("Summary stream failed", extra={"summary_length": length})
+            yield format_sse_event("error", {"detail": f"Failed to summarize text: {str(e)}", "length": length})
+            return
+        
+        logger.debug("Streamed summary", extra={"text_length": len(text), "summary_length": length})
+        yield format_sse_event("done", {"length": length})
+    
+    return sse_response(events())
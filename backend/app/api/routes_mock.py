@@ -3,10 +3,21 @@ Mock API routes for testing purposes.
 Uses mock services instead of real ones.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import ORJSONResponse
 from typing import List, Optional
 
-from app.models.document import Document, DocumentCreate, DocumentUpdate
+from app.api.responses import (
+    DOCUMENT_CACHE_CONTROL, ResponseFormat, batch_response, document_etag, document_response,
+    documents_response, embedding_response, etag_matches, get_response_format, not_modified_response,
+    validate_batch_get
+)
+from app.api.sse import format_sse_event, sse_response
+from app.core.config import SUGGEST_MAX_RESULTS
+from app.core.scheduler import QuotaExceededError
+from app.models.document import Document, DocumentBatch, DocumentBatchGet, DocumentCreate, DocumentUpdate
+from app.models.embedding import EmbeddingUnavailableError
+from app.models.suggestion import SuggestionList
 from app.services.document_service_mock import DocumentServiceMock
 from app.services.embedding_service_mock import EmbeddingServiceMock
 from app.services.summarization_service_mock import SummarizationServiceMock
@@ -19,27 +30,56 @@ summarization_service = SummarizationServiceMock()
 web_service = WebServiceMock()
 
 @router.post("/documents", response_model=Document, status_code=201)
-async def create_document(document: DocumentCreate):
+async def create_document(
+    document: DocumentCreate, response_format: ResponseFormat = Depends(get_response_format)
+):
     """Create a new document in the archive."""
     try:
         # Generate embedding for the document
         embedding = await embedding_service.generate_embedding(document.content)
         
         # Create the document with the embedding
-        return await document_service.create_document(document, embedding)
+        result = await document_service.create_document(document, embedding)
+        return document_response(result, response_format, status_code=201)
+    except QuotaExceededError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to create document: {str(e)}")
 
+@router.post("/documents:batchGet", response_model=DocumentBatch)
+async def batch_get_documents(
+    batch: DocumentBatchGet, response_format: ResponseFormat = Depends(get_response_format)
+):
+    """Get many documents by ID in one call, as in the real API."""
+    validate_batch_get(batch)
+    found = await document_service.get_documents(batch.ids, batch.fields)
+    return batch_response(batch.ids, found, batch.fields, response_format)
+
 @router.get("/documents/{document_id}", response_model=Document)
-async def get_document(document_id: str):
-    """Get a document by ID."""
+async def get_document(
+    document_id: str,
+    if_none_match: Optional[str] = Header(None),
+    response_format: ResponseFormat = Depends(get_response_format),
+):
+    """Get a document by ID, or 304 if the client's copy is current, as in the real API."""
+    if if_none_match:
+        version = await document_service.get_document_version(document_id)
+        if version is not None:
+            etag = document_etag(document_id, version, response_format)
+            if etag_matches(if_none_match, etag):
+                return not_modified_response(etag)
+    
     document = await document_service.get_document(document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
-    return document
+    return document_response(document, response_format, cache_control=DOCUMENT_CACHE_CONTROL)
 
 @router.put("/documents/{document_id}", response_model=Document)
-async def update_document(document_id: str, document_update: DocumentUpdate):
+async def update_document(
+    document_id: str,
+    document_update: DocumentUpdate,
+    response_format: ResponseFormat = Depends(get_response_format),
+):
     """Update a document."""
     document = await document_service.get_document(document_id)
     if not document:
@@ -48,9 +88,10 @@ async def update_document(document_id: str, document_update: DocumentUpdate):
     # If content is updated, regenerate the embedding
     if document_update.content:
         embedding = await embedding_service.generate_embedding(document_update.content)
-        return await document_service.update_document(document_id, document_update, embedding)
+        result = await document_service.update_document(document_id, document_update, embedding)
+        return document_response(result, response_format)
     
-    return await document_service.update_document(document_id, document_update)
+    return document_response(await document_service.update_document(document_id, document_update), response_format)
 
 @router.delete("/documents/{document_id}", status_code=204)
 async def delete_document(document_id: str):
@@ -68,6 +109,7 @@ async def search_documents(
     semantic: bool = False,
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    response_format: ResponseFormat = Depends(get_response_format),
 ):
     """
     Search for documents.
@@ -78,41 +120,66 @@ async def search_documents(
     """
     if query and semantic:
         # Generate embedding for the query
-        query_embedding = await embedding_service.generate_embedding(query)
+        try:
+            query_embedding = await embedding_service.generate_embedding(query)
+        except EmbeddingUnavailableError as e:
+            raise HTTPException(status_code=503, detail=f"Semantic search is unavailable: {str(e)}")
         
         # Perform semantic search
-        return await document_service.semantic_search(query_embedding, limit, offset)
+        return documents_response(await document_service.semantic_search(query_embedding, limit, offset), response_format)
     
     if query:
         # Perform full-text search
-        return await document_service.full_text_search(query, limit, offset)
+        return documents_response(await document_service.full_text_search(query, limit, offset), response_format)
     
     # Return the most recent documents
-    return await document_service.get_recent_documents(limit, offset)
+    return documents_response(await document_service.get_recent_documents(limit, offset), response_format)
+
+@router.get("/suggest", response_model=SuggestionList)
+async def suggest(
+    prefix: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(8, ge=1, le=SUGGEST_MAX_RESULTS),
+):
+    """Suggest document titles, tags and categories for a prefix, as in the real API."""
+    return ORJSONResponse({"prefix": prefix, "suggestions": document_service.suggestions.lookup(prefix, limit)})
 
 @router.post("/web/fetch", response_model=Document)
-async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
+async def fetch_web_page(
+    url: str,
+    save: bool = True,
+    summarize: bool = True,
+    summary_mode: str = Query("auto", pattern="^(auto|local|llm)$"),
+    response_format: ResponseFormat = Depends(get_response_format),
+):
     """
     Fetch a web page, optionally summarize it, and optionally save it to the archive.
     """
     try:
         # Fetch the web page
-        content, title = await web_service.fetch_web_page(url)
+        page = await web_service.fetch_page(url)
+        content, title = page.content, page.title
+        
+        metadata = {
+            "source": "web",
+            "url": url,
+        }
+        
+        # Mark pages that were cut off at the download size limit
+        if page.truncated:
+            metadata["truncated"] = True
+            metadata["bytes_read"] = page.bytes_read
         
         # Create a document
         document = DocumentCreate(
             content=content,
             title=title,
             url=url,
-            metadata={
-                "source": "web",
-                "url": url,
-            }
+            metadata=metadata
         )
         
         # Summarize the content if requested
         if summarize:
-            summary = await summarization_service.summarize(content)
+            summary = await summarization_service.summarize(content, mode=summary_mode)
             document.summary = summary
         
         # Save the document if requested
@@ -121,10 +188,10 @@ async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
             embedding = await embedding_service.generate_embedding(content)
             
             # Create the document with the embedding
-            return await document_service.create_document(document, embedding)
+            return document_response(await document_service.create_document(document, embedding), response_format)
         
         # Return the document without saving
-        return Document(
+        return document_response(Document(
             id="",
             content=content,
             title=title,
@@ -133,7 +200,9 @@ async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
             metadata=document.metadata,
             embedding=[],
             version=1,
-        )
+        ), response_format)
+    except QuotaExceededError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch web page: {str(e)}")
 
@@ -141,26 +210,78 @@ async def fetch_web_page(url: str, save: bool = True, summarize: bool = True):
 async def get_similar_documents(
     document_id: str,
     limit: int = Query(10, ge=1, le=100),
+    response_format: ResponseFormat = Depends(get_response_format),
 ):
     """Get documents similar to the given document."""
     document = await document_service.get_document(document_id)
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    return await document_service.find_similar_documents(document.embedding, limit, exclude_ids=[document_id])
+    return documents_response(
+        await document_service.find_similar_documents(document.embedding, limit, exclude_ids=[document_id]),
+        response_format,
+    )
 
 @router.post("/embeddings", response_model=List[float])
-async def generate_embedding(text: str):
+async def generate_embedding(text: str, response_format: ResponseFormat = Depends(get_response_format)):
     """Generate an embedding for the given text."""
     try:
-        return await embedding_service.generate_embedding(text)
+        embedding = await embedding_service.generate_embedding(text)
+        return embedding_response(embedding, response_format)
+    except QuotaExceededError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate embedding: {str(e)}")
 
 @router.post("/summarize", response_model=str)
-async def summarize_text(text: str):
+async def summarize_text(
+    text: str,
+    mode: str = Query("auto", pattern="^(auto|local|llm)$"),
+    latency_budget_ms: Optional[int] = Query(None, ge=0),
+):
     """Summarize the given text."""
     try:
-        return await summarization_service.summarize(text)
+        latency_budget = latency_budget_ms / 1000 if latency_budget_ms is not None else None
+        return await summarization_service.summarize(text, mode=mode, latency_budget=latency_budget)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to summarize text: {str(e)}")
+
+@router.api_route("/summarize/stream", methods=["GET", "POST"])
+async def summarize_text_stream(
+    text: Optional[str] = None,
+    url: Optional[str] = None,
+    mode: str = Query("auto", pattern="^(auto|local|llm)$"),
+):
+    """Stream a summary as Server-Sent Events while it is being generated."""
+    if not text and not url:
+        raise HTTPException(status_code=400, detail="Either text or url is required")
+    
+    page = None
+    if url:
+        page = await web_service.fetch_page(url)
+        text = page.content
+    
+    async def events():
+        if page is not None:
+            yield format_sse_event("page", {
+                "url": page.url,
+                "title": page.title,
+                "truncated": page.truncated,
+                "error": page.error,
+            })
+            if page.error:
+                yield format_sse_event("error", {"detail": page.error})
+                return
+        
+        length = 0
+        try:
+            async for piece in summarization_service.summarize_stream(text, mode=mode):
+                length += len(piece)
+                yield format_sse_event("chunk", {"text": piece})
+        except Exception as e:
+            yield format_sse_event("error", {"detail": f"Failed to summarize text: {str(e)}", "length": length})
+            return
+        
+        yield format_sse_event("done", {"length": length})
+    
+    return sse_response(events())
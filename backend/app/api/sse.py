@@ -0,0 +1,36 @@
+"""
+Helpers for Server-Sent Events responses.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict
+
+from fastapi.responses import StreamingResponse
+
+def format_sse_event(event: str, data: Dict[str, Any]) -> str:
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event: The event name.
+        data: The event payload, sent as JSON.
+
+    Returns:
+        The event in the text/event-stream wire format.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Wrap formatted events in a streaming response.
+
+    Buffering is disabled so that each event reaches the client as soon as it is sent.
+    """
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
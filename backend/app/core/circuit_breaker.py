@@ -0,0 +1,119 @@
+"""
+Circuit breaker and latency tracking for calls to external providers.
+A breaker opens after repeated failures so callers skip the provider instead of paying
+for another failure, and lets a single probe call through once the reset timeout has
+passed to find out whether the provider has recovered.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitBreaker:
+    """Tracks the failures of a provider and decides whether it may be called."""
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: The name of the protected provider.
+            failure_threshold: Consecutive failures after which the breaker opens.
+            reset_timeout: How long the breaker stays open before a probe call is
+                allowed, in seconds.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+        self.total_failures = 0
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    def allow_request(self) -> bool:
+        """
+        Check whether the provider may be called now.
+
+        While open, calls are rejected until the reset timeout has passed; then the
+        breaker turns half-open and lets exactly one probe call through.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probe_in_flight = False
+
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call, which closes the breaker."""
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Record a failed call, which opens the breaker after enough failures or a failed probe."""
+        with self._lock:
+            self.consecutive_failures += 1
+            self.total_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self.times_opened += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probe_in_flight = False
+
+    def release(self) -> None:
+        """Record that an allowed call was not made after all, so another probe may go through."""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the state and counters of the breaker."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "total_failures": self.total_failures,
+                "times_opened": self.times_opened,
+            }
+
+class LatencyTracker:
+    """Exponentially weighted moving average of call latencies."""
+
+    def __init__(self, alpha: float = 0.2, initial: Optional[float] = None):
+        """
+        Initialize the latency tracker.
+
+        Args:
+            alpha: The weight of the newest observation.
+            initial: The estimate before the first observation, in seconds.
+        """
+        self.alpha = alpha
+        self.value = initial
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, latency: float) -> None:
+        """Add a latency observation, in seconds."""
+        with self._lock:
+            self.count += 1
+            if self.value is None:
+                self.value = latency
+            else:
+                self.value = self.alpha * latency + (1 - self.alpha) * self.value
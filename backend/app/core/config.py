@@ -23,6 +23,23 @@ HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", "8000"))
 DEBUG = os.getenv("DEBUG", "false").lower() in ("true", "1", "t")
 
+# Logging Configuration
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of request logs kept per route, as "route=rate" pairs
+LOG_SAMPLE_RATES = {
+    route.strip(): float(rate)
+    for route, _, rate in (
+        pair.partition("=") for pair in os.getenv(
+            "LOG_SAMPLE_RATES",
+            "/health=0.01,/api/health=0.01,/metrics=0.01,/api/documents=0.1",
+        ).split(",")
+    )
+    if route.strip() and rate
+}
+LOG_SLOW_REQUEST_SECONDS = float(os.getenv("LOG_SLOW_REQUEST_SECONDS", "2"))
+
 # Google Cloud Configuration
 GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 GOOGLE_CLOUD_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
@@ -33,15 +50,146 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 VERTEX_AI_INDEX_ENDPOINT = os.getenv("VERTEX_AI_INDEX_ENDPOINT")
 VERTEX_AI_INDEX = os.getenv("VERTEX_AI_INDEX")
 VERTEX_AI_EMBEDDING_ENDPOINT = os.getenv("VERTEX_AI_EMBEDDING_ENDPOINT")
+# Where the index resource name resolved from the endpoint is kept between restarts
+VERTEX_AI_INDEX_CACHE_FILE = os.path.expanduser(os.getenv(
+    "VERTEX_AI_INDEX_CACHE_FILE", str(Path.home() / ".cache" / "marchiver" / "vertex_index.json")
+))
 
 # Embedding Model Configuration
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "models/embedding-001")
 SUMMARIZATION_MODEL = os.getenv("SUMMARIZATION_MODEL", "gemini-pro-2.5")
 
+# Embedding Provider Routing Configuration
+EMBEDDING_BREAKER_FAILURE_THRESHOLD = int(os.getenv("EMBEDDING_BREAKER_FAILURE_THRESHOLD", "3"))
+EMBEDDING_BREAKER_RESET_TIMEOUT = float(os.getenv("EMBEDDING_BREAKER_RESET_TIMEOUT", "30"))
+EMBEDDING_SLOW_THRESHOLD = float(os.getenv("EMBEDDING_SLOW_THRESHOLD", "5"))
+# The provider whose vectors the Vector Search index holds
+VECTOR_INDEX_EMBEDDING_PROVIDER = os.getenv("VECTOR_INDEX_EMBEDDING_PROVIDER", "vertex")
+
+# Provider Quota Configuration
+EMBEDDING_QUOTA_PER_MINUTE = float(os.getenv("EMBEDDING_QUOTA_PER_MINUTE", "600"))
+EMBEDDING_QUOTA_BURST = float(os.getenv("EMBEDDING_QUOTA_BURST", "20"))
+SUMMARIZATION_QUOTA_PER_MINUTE = float(os.getenv("SUMMARIZATION_QUOTA_PER_MINUTE", "60"))
+SUMMARIZATION_QUOTA_BURST = float(os.getenv("SUMMARIZATION_QUOTA_BURST", "5"))
+# Fraction of each burst that background work may not use
+QUOTA_BACKGROUND_RESERVE = float(os.getenv("QUOTA_BACKGROUND_RESERVE", "0.2"))
+QUOTA_INTERACTIVE_MAX_WAIT = float(os.getenv("QUOTA_INTERACTIVE_MAX_WAIT", "10"))
+QUOTA_BACKGROUND_MAX_WAIT = float(os.getenv("QUOTA_BACKGROUND_MAX_WAIT", "60"))
+QUOTA_BACKGROUND_MAX_QUEUE = int(os.getenv("QUOTA_BACKGROUND_MAX_QUEUE", "100"))
+# Request header that marks a request as interactive or background work
+PRIORITY_HEADER = os.getenv("PRIORITY_HEADER", "X-Request-Priority")
+
+# Summarization Configuration
+SUMMARIZATION_TIMEOUT = float(os.getenv("SUMMARIZATION_TIMEOUT", "30"))
+SUMMARIZATION_MAX_CONCURRENCY = int(os.getenv("SUMMARIZATION_MAX_CONCURRENCY", "4"))
+SUMMARIZATION_CHUNK_CHARS = int(os.getenv("SUMMARIZATION_CHUNK_CHARS", "12000"))
+SUMMARIZATION_CHUNK_OVERLAP = int(os.getenv("SUMMARIZATION_CHUNK_OVERLAP", "200"))
+SUMMARIZATION_MAX_CHUNKS = int(os.getenv("SUMMARIZATION_MAX_CHUNKS", "32"))
+SUMMARIZATION_MAP_CONCURRENCY = int(os.getenv("SUMMARIZATION_MAP_CONCURRENCY", "4"))
+SUMMARIZATION_LOCAL_MAX_CHARS = int(os.getenv("SUMMARIZATION_LOCAL_MAX_CHARS", "1500"))
+SUMMARIZATION_LOCAL_SENTENCES = int(os.getenv("SUMMARIZATION_LOCAL_SENTENCES", "3"))
+SUMMARIZATION_EXPECTED_LATENCY = float(os.getenv("SUMMARIZATION_EXPECTED_LATENCY", "3"))
+
+# Summary Cache Configuration
+SUMMARY_CACHE_ENABLED = os.getenv("SUMMARY_CACHE_ENABLED", "true").lower() in ("true", "1", "t")
+SUMMARY_CACHE_DIR = os.getenv("SUMMARY_CACHE_DIR", str(Path.home() / ".cache" / "marchiver" / "summaries"))
+SUMMARY_CACHE_MAX_BYTES = int(os.getenv("SUMMARY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+SUMMARY_CACHE_TTL = float(os.getenv("SUMMARY_CACHE_TTL", str(30 * 24 * 60 * 60)))
+SUMMARY_CACHE_MEMORY_ENTRIES = int(os.getenv("SUMMARY_CACHE_MEMORY_ENTRIES", "1024"))
+
 # Firestore Configuration
 FIRESTORE_COLLECTION = os.getenv("FIRESTORE_COLLECTION", "documents")
+# Most IDs a client may ask for in one POST /documents:batchGet
+BATCH_GET_MAX_IDS = int(os.getenv("BATCH_GET_MAX_IDS", "100"))
+
+# Typeahead Suggestion Configuration
+# A term used e times as often ranks like one seen SUGGEST_RECENCY_DAYS later; the
+# suggestion index loads the titles, tags and categories of the newest SUGGEST_LOAD_LIMIT
+# documents at startup. Each worker keeps its own index and only sees the writes it
+# handles, so it reloads every SUGGEST_REFRESH_SECONDS to pick up those of other
+# workers (0 disables this)
+SUGGEST_MAX_RESULTS = int(os.getenv("SUGGEST_MAX_RESULTS", "10"))
+SUGGEST_RECENCY_DAYS = float(os.getenv("SUGGEST_RECENCY_DAYS", "30"))
+SUGGEST_LOAD_LIMIT = int(os.getenv("SUGGEST_LOAD_LIMIT", "5000"))
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", "300"))
 
 # CORS Configuration
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
 CORS_METHODS = os.getenv("CORS_METHODS", "*").split(",")
 CORS_HEADERS = os.getenv("CORS_HEADERS", "*").split(",")
+
+# Response Compression Configuration
+# Brotli is used when the brotli package is installed and the client accepts it
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("true", "1", "t")
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+# Tracing Configuration
+# ?trace=true returns the internal spans of a request to any caller, so it is only for
+# development and stays off unless TRACE_DEBUG_ENABLED is set
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() in ("true", "1", "t")
+TRACE_DEBUG_ENABLED = os.getenv("TRACE_DEBUG_ENABLED", "false").lower() in ("true", "1", "t")
+TRACE_QUERY_PARAM = os.getenv("TRACE_QUERY_PARAM", "trace")
+
+# Admin and Profiling Configuration
+# Admin endpoints and per-request profiling are disabled unless a token is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.01"))
+PROFILE_STORE_SIZE = int(os.getenv("PROFILE_STORE_SIZE", "20"))
+LOOP_WATCHDOG_ENABLED = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() in ("true", "1", "t")
+LOOP_SLOW_CALLBACK_SECONDS = float(os.getenv("LOOP_SLOW_CALLBACK_SECONDS", "0.1"))
+
+# Traffic Capture Configuration
+# Capture is off unless a path is set. Captured files hold request paths and queries,
+# so treat them like access logs. Query parameters that carry content, such as the text
+# to summarize, the page to fetch or what was searched for, are recorded like bodies: only
+# their length and hash unless bodies are captured and they fit the size limit.
+TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "")
+TRAFFIC_CAPTURE_BODIES = os.getenv("TRAFFIC_CAPTURE_BODIES", "false").lower() in ("true", "1", "t")
+TRAFFIC_CAPTURE_MAX_BODY_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BODY_BYTES", "65536"))
+TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))
+TRAFFIC_CAPTURE_REDACT_PARAMS = os.getenv(
+    "TRAFFIC_CAPTURE_REDACT_PARAMS", "token,key,api_key,access_token,password,secret"
+).split(",")
+TRAFFIC_CAPTURE_CONTENT_PARAMS = os.getenv(
+    "TRAFFIC_CAPTURE_CONTENT_PARAMS", "text,url,query,prefix"
+).split(",")
+TRAFFIC_CAPTURE_HEADERS = os.getenv(
+    "TRAFFIC_CAPTURE_HEADERS", "content-type,accept,accept-encoding,x-request-priority"
+).split(",")
+
+# Mock Service Configuration
+# Latencies are the median in milliseconds, optionally followed by the 99th percentile,
+# e.g. "40,400"; rates are fractions of calls. Everything is off by default.
+MOCK_FAULT_SEED = int(os.getenv("MOCK_FAULT_SEED")) if os.getenv("MOCK_FAULT_SEED") else None
+MOCK_EMBEDDING_LATENCY_MS = os.getenv("MOCK_EMBEDDING_LATENCY_MS", "0")
+MOCK_EMBEDDING_ERROR_RATE = float(os.getenv("MOCK_EMBEDDING_ERROR_RATE", "0"))
+MOCK_EMBEDDING_QUOTA_RATE = float(os.getenv("MOCK_EMBEDDING_QUOTA_RATE", "0"))
+MOCK_VECTOR_SEARCH_LATENCY_MS = os.getenv("MOCK_VECTOR_SEARCH_LATENCY_MS", "0")
+MOCK_VECTOR_SEARCH_ERROR_RATE = float(os.getenv("MOCK_VECTOR_SEARCH_ERROR_RATE", "0"))
+MOCK_FIRESTORE_LATENCY_MS = os.getenv("MOCK_FIRESTORE_LATENCY_MS", "0")
+MOCK_FIRESTORE_ERROR_RATE = float(os.getenv("MOCK_FIRESTORE_ERROR_RATE", "0"))
+MOCK_SUMMARIZATION_LATENCY_MS = os.getenv("MOCK_SUMMARIZATION_LATENCY_MS", "0")
+MOCK_SUMMARIZATION_ERROR_RATE = float(os.getenv("MOCK_SUMMARIZATION_ERROR_RATE", "0"))
+MOCK_SUMMARIZATION_QUOTA_RATE = float(os.getenv("MOCK_SUMMARIZATION_QUOTA_RATE", "0"))
+MOCK_WEB_LATENCY_MS = os.getenv("MOCK_WEB_LATENCY_MS", "0")
+MOCK_WEB_ERROR_RATE = float(os.getenv("MOCK_WEB_ERROR_RATE", "0"))
+
+# Web Fetch Configuration
+WEB_FETCH_TIMEOUT = float(os.getenv("WEB_FETCH_TIMEOUT", "30"))
+WEB_FETCH_MAX_BYTES = int(os.getenv("WEB_FETCH_MAX_BYTES", str(5 * 1024 * 1024)))
+WEB_FETCH_CHUNK_SIZE = int(os.getenv("WEB_FETCH_CHUNK_SIZE", "65536"))
+WEB_FETCH_ALLOWED_CONTENT_TYPES = os.getenv(
+    "WEB_FETCH_ALLOWED_CONTENT_TYPES",
+    "text/html,application/xhtml+xml,application/xml,text/xml,text/plain",
+).split(",")
+WEB_EXTRACT_MAIN_CONTENT = os.getenv("WEB_EXTRACT_MAIN_CONTENT", "true").lower() in ("true", "1", "t")
+WEB_EXTRACT_MIN_CHARS = int(os.getenv("WEB_EXTRACT_MIN_CHARS", "250"))
+
+# Web Cache Configuration
+WEB_CACHE_ENABLED = os.getenv("WEB_CACHE_ENABLED", "true").lower() in ("true", "1", "t")
+WEB_CACHE_DIR = os.getenv("WEB_CACHE_DIR", str(Path.home() / ".cache" / "marchiver" / "http"))
+WEB_CACHE_MAX_BYTES = int(os.getenv("WEB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
@@ -0,0 +1,195 @@
+"""
+Size-bounded on-disk cache with least-recently-used eviction.
+Each entry is a single file holding a JSON metadata line followed by the raw value.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+ENTRY_SUFFIX = ".entry"
+
+class DiskCache:
+    """A key/value cache stored on disk, bounded in total size."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Initialize the cache and index any entries already on disk.
+
+        Args:
+            directory: The directory to store entries in. Created if missing.
+            max_bytes: The maximum total size of all entries.
+        """
+        self.directory = Path(directory).expanduser()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self._lock = threading.Lock()
+        # Maps entry file names to their sizes, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._load_index()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        """
+        Get an entry from the cache.
+
+        Args:
+            key: The key of the entry.
+
+        Returns:
+            A tuple of (metadata, value), or None if the key is not cached.
+        """
+        name = self._entry_name(key)
+        path = self.directory / name
+
+        try:
+            with open(path, "rb") as f:
+                meta = json.loads(f.readline())
+                value = f.read()
+        except (OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+                self._forget(name)
+            return None
+
+        # Guard against hash collisions and entries written by another layout
+        if meta.get("key") != key:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+            if name in self._entries:
+                self._entries.move_to_end(name)
+
+        # Persist the recency so that eviction order survives restarts
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return meta, value
+
+    def set(self, key: str, meta: Dict[str, Any], value: bytes) -> None:
+        """
+        Store an entry, evicting least recently used entries if the cache is full.
+
+        Args:
+            key: The key of the entry.
+            meta: JSON-serializable metadata stored alongside the value.
+            value: The value to store.
+        """
+        name = self._entry_name(key)
+        header = json.dumps(dict(meta, key=key), separators=(",", ":")).encode("utf-8") + b"\n"
+        size = len(header) + len(value)
+
+        # Entries larger than the whole cache are never stored
+        if size > self.max_bytes:
+            return
+
+        # Write to a temporary file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                f.write(value)
+            os.replace(tmp_path, self.directory / name)
+        except OSError:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        with self._lock:
+            self._forget(name)
+            self._entries[name] = size
+            self._total_bytes += size
+            self._evict()
+
+    def update_meta(self, key: str, meta: Dict[str, Any]) -> None:
+        """
+        Replace the metadata of an entry, keeping its value.
+
+        Args:
+            key: The key of the entry.
+            meta: The new metadata.
+        """
+        entry = self.get(key)
+        if entry is None:
+            return
+        self.set(key, meta, entry[1])
+
+    def delete(self, key: str) -> None:
+        """Remove an entry from the cache."""
+        name = self._entry_name(key)
+        try:
+            os.unlink(self.directory / name)
+        except OSError:
+            pass
+        with self._lock:
+            self._forget(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the size and hit/miss counters of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _entry_name(self, key: str) -> str:
+        """Map a key to the name of its entry file."""
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ENTRY_SUFFIX
+
+    def _load_index(self) -> None:
+        """Index existing entries, ordered by their last access time."""
+        entries = []
+        for path in self.directory.glob("*" + ENTRY_SUFFIX):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.name, stat.st_size))
+
+        for _, name, size in sorted(entries):
+            self._entries[name] = size
+            self._total_bytes += size
+
+        with self._lock:
+            self._evict()
+
+    def _forget(self, name: str) -> None:
+        """Drop an entry from the index. Must be called with the lock held."""
+        size = self._entries.pop(name, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until the cache fits. Must be called with the lock held."""
+        while self._total_bytes > self.max_bytes and self._entries:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(self.directory / name)
+            except OSError:
+                pass
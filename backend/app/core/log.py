@@ -0,0 +1,153 @@
+"""
+Structured logging for the application.
+Log records are handed to a queue on the calling thread and written to stdout by a
+background listener thread, so the event loop never blocks on console output.
+Records carry structured fields passed with extra={...}, rendered as key=value
+pairs or as JSON lines.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+from app.core.config import LOG_LEVEL, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_SAMPLE_RATES
+
+# Name of the logger all application loggers descend from
+ROOT_LOGGER_NAME = "marchiver"
+
+# Attributes every LogRecord has; anything else was passed with extra={...}.
+# The sampling key only steers the SamplingFilter and is not rendered either.
+_STANDARD_ATTRIBUTES = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "sample_key"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get a logger under the application logger.
+
+    Args:
+        name: The name of the logger, usually the module name.
+
+    Returns:
+        The logger.
+    """
+    configure_logging()
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+def configure_logging() -> None:
+    """Set up the queue-backed handler of the application logger. Safe to call repeatedly."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else KeyValueFormatter())
+
+    log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES))
+
+    logger = logging.getLogger(ROOT_LOGGER_NAME)
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def structured_fields(record: logging.LogRecord) -> Dict[str, object]:
+    """Get the fields that were passed to a log call with extra={...}."""
+    return {key: value for key, value in vars(record).items() if key not in _STANDARD_ATTRIBUTES}
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    A queue handler that drops records instead of blocking when the queue is full,
+    so a stalled stdout cannot stall request handling.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Make a record safe to hand to another thread: interpolate the message now and
+        render the traceback, but leave the structured fields to the formatter.
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of the records of high-volume events.
+
+    Records opt in with a "sample_key" field, such as the route of a request, which is
+    looked up in the configured rates. Warnings and errors are never dropped.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        rate = self.rates.get(key, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+class KeyValueFormatter(logging.Formatter):
+    """Format records as a line of text followed by key=value pairs."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created))
+        line = f"[{timestamp}] {record.levelname} {record.name}: {record.getMessage()}"
+
+        fields = structured_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={_format_field(value)}" for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """Format records as JSON lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(structured_fields(record))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def _format_field(value: object) -> str:
+    text = str(value)
+    if " " in text or not text:
+        return json.dumps(text)
+    return text
@@ -0,0 +1,293 @@
+"""
+Minimal Prometheus-compatible metrics.
+Counters, gauges and histograms with labels, rendered in the Prometheus text
+exposition format by the /metrics endpoint.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+class Metric:
+    """Base class for a metric family with a fixed set of label names."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, values))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        """Render the metric family in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(Metric):
+    """A monotonically increasing count."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_total(self, value: float, **labels: str) -> None:
+        """Set the counter to a total counted elsewhere, such as in the stats() of a service."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+class Gauge(Metric):
+    """A value that can go up and down."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge to a value."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the gauge."""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """Decrease the gauge."""
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_in_progress(self, **labels: str) -> Iterator[None]:
+        """Increase the gauge while the block runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _render_samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._format_labels(key)} {_format_value(value)}" for key, value in sorted(self._values.items())]
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets, with their sum and count."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Maps label values to (bucket counts, sum, count); the last bucket is +Inf
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation."""
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe how long the block takes, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else _format_value(bound)
+                    lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+                lines.append(f"{self.name}_sum{self._format_labels(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{self._format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    """A collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Add a metric to the registry, or return the one already registered under its name."""
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, label_names, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Add a callback that refreshes gauges right before the metrics are rendered,
+        for values that are cheaper to read on demand than to track continuously.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            collectors = list(self._collectors)
+            metrics = list(self._metrics.values())
+
+        for collector in collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+# Content type of the Prometheus text exposition format; Starlette appends the charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# The process-wide registry and the metrics shared across the application
+registry = MetricsRegistry()
+
+REQUEST_DURATION = registry.histogram(
+    "marchiver_http_request_duration_seconds",
+    "Time spent handling HTTP requests.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "marchiver_http_requests_in_flight",
+    "HTTP requests currently being handled.",
+)
+STAGE_DURATION = registry.histogram(
+    "marchiver_stage_duration_seconds",
+    "Time spent in each processing stage.",
+    ["stage"],
+)
+STAGE_ERRORS = registry.counter(
+    "marchiver_stage_errors_total",
+    "Processing stages that raised an exception.",
+    ["stage"],
+)
+STAGES_IN_FLIGHT = registry.gauge(
+    "marchiver_stages_in_flight",
+    "Processing stages currently running.",
+    ["stage"],
+)
+CACHE_LOOKUPS = registry.counter(
+    "marchiver_cache_lookups_total",
+    "Cache lookups since startup, by cache and result.",
+    ["cache", "result"],
+)
+CACHE_HIT_RATIO = registry.gauge(
+    "marchiver_cache_hit_ratio",
+    "Share of cache lookups that were hits since startup.",
+    ["cache"],
+)
+CACHE_SIZE_BYTES = registry.gauge(
+    "marchiver_cache_size_bytes",
+    "Size of the on-disk part of each cache.",
+    ["cache"],
+)
+
+def record_cache_stats(cache: str, hits: int, misses: int, size_bytes: int) -> None:
+    """Publish the counters of a cache, as reported by its stats()."""
+    lookups = hits + misses
+    CACHE_LOOKUPS.set_total(hits, cache=cache, result="hit")
+    CACHE_LOOKUPS.set_total(misses, cache=cache, result="miss")
+    CACHE_HIT_RATIO.set(hits / lookups if lookups else 0.0, cache=cache)
+    CACHE_SIZE_BYTES.set(size_bytes, cache=cache)
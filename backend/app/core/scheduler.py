@@ -0,0 +1,214 @@
+"""
+Priority-aware rate limiting for provider quotas.
+Each quota is a token bucket refilled at the configured rate. Interactive requests
+always go first; background requests only take tokens while no interactive request
+is waiting and a reserve is left for interactive bursts, and are shed when they
+would wait too long or too many are queued.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+_current_priority: ContextVar[str] = ContextVar("current_priority", default=INTERACTIVE)
+
+def current_priority() -> str:
+    """Get the priority of the work running in the current context."""
+    return _current_priority.get()
+
+@contextmanager
+def priority(value: str) -> Iterator[None]:
+    """
+    Run a block with the given priority.
+
+    Args:
+        value: INTERACTIVE or BACKGROUND.
+    """
+    if value not in PRIORITIES:
+        raise ValueError(f"Unknown priority: {value}")
+    token = _current_priority.set(value)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+class QuotaExceededError(Exception):
+    """Raised when work is shed because a provider quota is exhausted."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """A token bucket that refills continuously up to its capacity."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Initialize the token bucket. It starts full.
+
+        Args:
+            rate: The number of tokens added per second.
+            capacity: The maximum number of tokens, i.e. the largest burst.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_take(self, tokens: float = 1, keep: float = 0) -> bool:
+        """
+        Take tokens if enough are available.
+
+        Args:
+            tokens: The number of tokens to take.
+            keep: The number of tokens that must remain in the bucket afterwards.
+
+        Returns:
+            True if the tokens were taken.
+        """
+        self.refill()
+        if self.tokens - tokens >= keep:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def time_until(self, tokens: float = 1, keep: float = 0) -> float:
+        """Get how long until the tokens can be taken, in seconds."""
+        self.refill()
+        missing = tokens + keep - self.tokens
+        return max(missing / self.rate, 0.0) if self.rate > 0 else float("inf")
+
+class QuotaScheduler:
+    """Admits calls to a rate-limited provider in priority order."""
+
+    def __init__(
+        self,
+        name: str,
+        requests_per_minute: float,
+        burst: float,
+        background_reserve: float = 0.2,
+        interactive_max_wait: float = 10.0,
+        background_max_wait: float = 60.0,
+        background_max_queue: int = 100,
+    ):
+        """
+        Initialize the quota scheduler.
+
+        Args:
+            name: The name of the quota, used in errors and metrics.
+            requests_per_minute: The sustained request rate the quota allows.
+            burst: The number of requests that may be sent at once.
+            background_reserve: The fraction of the burst that background work may
+                not use, so interactive requests never find an empty bucket.
+            interactive_max_wait: How long an interactive request may wait, in seconds.
+            background_max_wait: How long a background request may wait, in seconds.
+            background_max_queue: How many background requests may wait at once;
+                further ones are shed immediately.
+        """
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60, max(burst, 1))
+        self.background_keep = self.bucket.capacity * background_reserve
+        self.max_wait = {INTERACTIVE: interactive_max_wait, BACKGROUND: background_max_wait}
+        self.background_max_queue = background_max_queue
+
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.admitted = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.shed = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.total_wait_time = {INTERACTIVE: 0.0, BACKGROUND: 0.0}
+        self._changed = asyncio.Event()
+
+    async def acquire(self, priority: str = None, tokens: float = 1) -> None:
+        """
+        Wait until a call may be sent to the provider.
+
+        Args:
+            priority: INTERACTIVE or BACKGROUND. Defaults to the priority of the
+                current context.
+            tokens: The cost of the call.
+
+        Raises:
+            QuotaExceededError: If the call would wait longer than allowed for its
+                priority, or too many background calls are already waiting.
+        """
+        priority = priority or current_priority()
+        start = time.monotonic()
+        deadline = start + self.max_wait[priority]
+
+        if priority == BACKGROUND and self.waiting[BACKGROUND] >= self.background_max_queue:
+            self._shed(priority, f"{self.background_max_queue} background requests already waiting")
+
+        self.waiting[priority] += 1
+        try:
+            while True:
+                if self._try_take(priority, tokens):
+                    break
+
+                now = time.monotonic()
+                if priority == BACKGROUND and self.waiting[INTERACTIVE] > 0:
+                    # Wait for the interactive requests to be served first
+                    timeout = deadline - now
+                else:
+                    timeout = self._time_until(priority, tokens)
+                    if now + timeout > deadline:
+                        timeout = 0
+                if timeout <= 0:
+                    self._shed(priority, f"quota would not allow it within {self.max_wait[priority]:g} seconds")
+
+                # Wake up when tokens are due, or earlier when another request leaves the
+                # queue, which may let background work through
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self.waiting[priority] -= 1
+            self._changed.set()
+
+        self.admitted[priority] += 1
+        self.total_wait_time[priority] += time.monotonic() - start
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the queue lengths and counters of the scheduler."""
+        self.bucket.refill()
+        return {
+            "tokens": self.bucket.tokens,
+            "capacity": self.bucket.capacity,
+            "requests_per_minute": self.bucket.rate * 60,
+            "waiting": dict(self.waiting),
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+            "average_wait_seconds": {
+                name: self.total_wait_time[name] / self.admitted[name] if self.admitted[name] else 0.0
+                for name in PRIORITIES
+            },
+        }
+
+    def _try_take(self, priority: str, tokens: float) -> bool:
+        if priority == INTERACTIVE:
+            return self.bucket.try_take(tokens)
+        # Background work yields to waiting interactive requests and leaves a reserve
+        if self.waiting[INTERACTIVE] > 0:
+            return False
+        return self.bucket.try_take(tokens, keep=self.background_keep)
+
+    def _time_until(self, priority: str, tokens: float) -> float:
+        if priority == INTERACTIVE:
+            return self.bucket.time_until(tokens)
+        return self.bucket.time_until(tokens, keep=self.background_keep)
+
+    def _shed(self, priority: str, reason: str) -> None:
+        self.shed[priority] += 1
+        retry_after = self.bucket.time_until(1, keep=self.background_keep if priority == BACKGROUND else 0)
+        raise QuotaExceededError(f"{self.name} quota exhausted for {priority} work: {reason}", retry_after)
@@ -0,0 +1,172 @@
+"""
+Lazy service registry.
+Services are created on first use, or all at once by a background warm-up started from
+the application lifespan, so that the server can bind its port before slow client
+libraries are imported and connected.
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+class ServiceUnavailableError(Exception):
+    """Raised when a service could not be created."""
+    pass
+
+class ServiceRegistry:
+    """Creates each registered service once, in a worker thread, when it is first needed."""
+
+    def __init__(self, factories: Dict[str, Callable[[], Any]]):
+        """
+        Initialize the service registry.
+
+        Args:
+            factories: Maps service names to functions that create the services. Factories
+                run in a worker thread and may block, e.g. on imports or network calls.
+        """
+        self.factories = factories
+        self._services: Dict[str, Any] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._errors: Dict[str, str] = {}
+        self._init_times: Dict[str, float] = {}
+        self._warm_up_task: Optional[asyncio.Task] = None
+        self.warmed_up = False
+
+    async def get(self, name: str) -> Any:
+        """
+        Get a service, creating it if needed.
+
+        Concurrent callers share a single creation. A failed creation is retried
+        by the next caller.
+
+        Args:
+            name: The name of the service.
+
+        Returns:
+            The service.
+
+        Raises:
+            ServiceUnavailableError: If the service could not be created.
+        """
+        service = self._services.get(name)
+        if service is not None:
+            return service
+
+        task = self._tasks.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._create(name))
+            self._tasks[name] = task
+
+        try:
+            # Shield the creation so that a cancelled request does not cancel it for everyone
+            return await asyncio.shield(task)
+        except Exception as e:
+            if self._tasks.get(name) is task:
+                del self._tasks[name]
+            raise ServiceUnavailableError(f"Service {name} is unavailable: {e}") from e
+
+    def peek(self, name: str) -> Optional[Any]:
+        """Get a service only if it has already been created."""
+        return self._services.get(name)
+
+    def start_warm_up(self) -> asyncio.Task:
+        """Start creating and warming up all services in the background."""
+        if self._warm_up_task is None:
+            self._warm_up_task = asyncio.ensure_future(self.warm_up())
+        return self._warm_up_task
+
+    async def warm_up(self) -> None:
+        """
+        Create all services concurrently, then let each warm itself up.
+
+        Services can define an async warm_up() method, e.g. to open connections or
+        load models, which is awaited after they are created. Failures are logged and
+        reported by status(), and the registry is not ready until they are created on a
+        later use or by retry_failed().
+        """
+        start = time.perf_counter()
+        await asyncio.gather(*(self._warm_up_service(name) for name in self.factories))
+        self.warmed_up = True
+        logger.info(
+            "Services warmed up",
+            extra={"duration_ms": round((time.perf_counter() - start) * 1000, 1), "failed": sorted(self._errors)},
+        )
+
+    @property
+    def ready(self) -> bool:
+        """Whether the warm-up has finished and every service was created."""
+        return self.warmed_up and not self._errors
+
+    def retry_failed(self) -> None:
+        """Start creating the services that failed again, in the background."""
+        for name in list(self._errors):
+            if name not in self._tasks:
+                asyncio.ensure_future(self._warm_up_service(name))
+
+    async def close(self) -> None:
+        """Stop the warm-up and close the services that hold resources."""
+        if self._warm_up_task is not None and not self._warm_up_task.done():
+            self._warm_up_task.cancel()
+
+        for name, service in self._services.items():
+            close = getattr(service, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if asyncio.iscoroutine(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Failed to close service {name}: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        """Get the initialization state of every service."""
+        services = {}
+        for name in self.factories:
+            if name in self._services:
+                state = {"status": "ready", "init_ms": round(self._init_times[name] * 1000, 1)}
+                # Services can describe what they are bound to, e.g. a model version
+                describe = getattr(self._services[name], "describe", None)
+                if describe is not None:
+                    state["info"] = describe()
+            elif name in self._errors:
+                state = {"status": "failed", "error": self._errors[name]}
+            elif name in self._tasks:
+                state = {"status": "initializing"}
+            else:
+                state = {"status": "pending"}
+            services[name] = state
+        return {"ready": self.ready, "services": services}
+
+    async def _create(self, name: str) -> Any:
+        start = time.perf_counter()
+        try:
+            service = await asyncio.to_thread(self.factories[name])
+        except Exception as e:
+            self._errors[name] = str(e)
+            logger.exception(f"Failed to initialize service {name}")
+            raise
+
+        self._init_times[name] = time.perf_counter() - start
+        self._errors.pop(name, None)
+        self._services[name] = service
+        logger.info(f"Initialized service {name}", extra={"duration_ms": round(self._init_times[name] * 1000, 1)})
+        return service
+
+    async def _warm_up_service(self, name: str) -> None:
+        try:
+            service = await self.get(name)
+        except ServiceUnavailableError:
+            return
+
+        warm_up = getattr(service, "warm_up", None)
+        if warm_up is None:
+            return
+        try:
+            await warm_up()
+        except Exception as e:
+            logger.warning(f"Failed to warm up service {name}: {e}")
@@ -0,0 +1,392 @@
+"""
+In-memory typeahead index over the titles, tags and categories of documents.
+Terms are kept in a radix trie whose nodes each hold the best terms below them, so a
+lookup only walks its prefix, and answers in microseconds however large the archive
+is. The index is updated as documents are written, and ranks terms by how many
+documents share them and by how recently those were written.
+"""
+
+import asyncio
+import datetime
+import heapq
+import math
+import re
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Titles are also suggested for prefixes of their later words, up to this many words in
+MAX_TITLE_WORDS = 12
+
+_WORD = re.compile(r"\w+")
+
+def normalize(text: str) -> str:
+    """Get the form of a text that is indexed and looked up: lowercase words separated by single spaces."""
+    return " ".join(_WORD.findall(text.casefold()))
+
+def word_suffixes(text: str, max_words: int = MAX_TITLE_WORDS) -> List[str]:
+    """Get the normalized text and each of its suffixes that starts at a later word."""
+    words = normalize(text).split()
+    return [" ".join(words[i:]) for i in range(min(len(words), max_words))]
+
+def _timestamp(date: Optional[str]) -> float:
+    try:
+        return datetime.datetime.fromisoformat(date).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+class Term:
+    """A title, tag or category to suggest."""
+
+    __slots__ = ("text", "kind", "document_id", "count", "last_seen", "score")
+
+    def __init__(self, text: str, kind: str, document_id: Optional[str] = None):
+        self.text = text
+        self.kind = kind
+        # Only titles lead to a single document
+        self.document_id = document_id
+        self.count = 0
+        self.last_seen = 0.0
+        self.score = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"text": self.text, "type": self.kind, "count": self.count}
+        if self.document_id is not None:
+            data["document_id"] = self.document_id
+        return data
+
+def _rank(term: Term) -> Tuple[float, str]:
+    return (term.score, term.text)
+
+class _Node:
+    __slots__ = ("label", "children", "terms", "top")
+
+    def __init__(self, label: str):
+        # The part of the key on the edge from the parent
+        self.label = label
+        # Children by the first character of their label
+        self.children: Dict[str, "_Node"] = {}
+        # Terms whose key ends at this node
+        self.terms: Set[Term] = set()
+        # The best terms at or below this node, best first
+        self.top: List[Term] = []
+
+class PrefixIndex:
+    """
+    A radix trie from normalized keys to terms.
+
+    Every node keeps the top_k best terms stored at or below it, sorted by score, so a
+    lookup returns the list of the node its prefix ends in. When a key is added or
+    removed, or the score of its terms changes, only the lists along the path of that
+    key are recomputed, each from the lists of the children of its node.
+
+    While deferred is set, the lists are left alone, and rebuild() recomputes all of
+    them at once; loading many keys that way is much faster than one by one.
+    """
+
+    def __init__(self, top_k: int = 10):
+        self.top_k = top_k
+        self.root = _Node("")
+        self.deferred = False
+
+    def add(self, key: str, term: Term) -> None:
+        path = self._insert(key)
+        path[-1].terms.add(term)
+        self._refresh(path)
+
+    def remove(self, key: str, term: Term) -> None:
+        path = self._find(key)
+        if path is None:
+            return
+        node = path[-1]
+        node.terms.discard(term)
+
+        # Drop nodes that no longer lead to any term
+        while len(path) > 1 and not node.terms and not node.children:
+            path.pop()
+            del path[-1].children[node.label[0]]
+            node = path[-1]
+        # Merge a node that only joins its parent to a single child into that child
+        if len(path) > 1 and not node.terms and len(node.children) == 1:
+            (child,) = node.children.values()
+            child.label = node.label + child.label
+            path[-2].children[child.label[0]] = child
+            path[-1] = child
+        self._refresh(path)
+
+    def rescore(self, key: str) -> None:
+        """Re-sort the lists along the path of a key after the score of one of its terms changed."""
+        path = self._find(key)
+        if path is not None:
+            self._refresh(path)
+
+    def nodes(self) -> List[_Node]:
+        """Get every node, each one before its children."""
+        stack, nodes = [self.root], []
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.children.values())
+        return nodes
+
+    def rebuild(self, nodes: Optional[List[_Node]] = None) -> None:
+        """
+        Recompute the best terms of the given nodes, or of every node, children first.
+
+        Args:
+            nodes: Nodes in the order of nodes(), or a slice of it. Rebuilding the
+                slices of that list from last to first rebuilds the whole trie.
+        """
+        self._refresh(self.nodes() if nodes is None else nodes, force=True)
+
+    def lookup(self, prefix: str, limit: int) -> List[Term]:
+        """Get the best terms whose key starts with a normalized prefix, best first."""
+        node, i = self.root, 0
+        while i < len(prefix):
+            child = node.children.get(prefix[i])
+            if child is None:
+                return []
+            rest = prefix[i:]
+            if rest.startswith(child.label):
+                i += len(child.label)
+            elif not child.label.startswith(rest):
+                return []
+            else:
+                i = len(prefix)
+            node = child
+        return node.top[:limit]
+
+    def _find(self, key: str) -> Optional[List[_Node]]:
+        path, node, i = [self.root], self.root, 0
+        while i < len(key):
+            node = node.children.get(key[i])
+            if node is None or not key.startswith(node.label, i):
+                return None
+            i += len(node.label)
+            path.append(node)
+        return path
+
+    def _insert(self, key: str) -> List[_Node]:
+        path, node, i = [self.root], self.root, 0
+        while i < len(key):
+            child = node.children.get(key[i])
+            if child is None:
+                child = _Node(key[i:])
+                node.children[key[i]] = child
+                path.append(child)
+                break
+
+            common = 0
+            limit = min(len(child.label), len(key) - i)
+            while common < limit and child.label[common] == key[i + common]:
+                common += 1
+            if common < len(child.label):
+                # Split the edge where the key leaves it
+                middle = _Node(child.label[:common])
+                middle.top = list(child.top)
+                child.label = child.label[common:]
+                middle.children[child.label[0]] = child
+                node.children[key[i]] = middle
+                child = middle
+            node = child
+            i += common
+            path.append(node)
+        return path
+
+    def _refresh(self, path: List[_Node], force: bool = False) -> None:
+        if self.deferred and not force:
+            return
+        for node in reversed(path):
+            candidates = set(node.terms)
+            for child in node.children.values():
+                candidates.update(child.top)
+            node.top = heapq.nlargest(self.top_k, candidates, key=_rank)
+
+def _signature(title: Optional[str], tags: Optional[Iterable[str]], category: Optional[str], date: Optional[str]) -> tuple:
+    return (title, tuple(tags or ()), category, date)
+
+class SuggestionIndex:
+    """
+    Typeahead suggestions for the documents of the archive.
+
+    Each document contributes its title, its tags and its category. Titles match the
+    prefixes of each of their words and lead to their document; tags and categories
+    are shared by documents and count them. Terms are ranked by
+
+        log(count) + last_seen / recency_seconds
+
+    where last_seen is the latest date of a document with the term. A term used twice
+    as often ranks like one seen recency_seconds * ln 2 later; and since scores only
+    change when documents are written, rankings never go stale as time passes.
+
+    The index lives in one process and only sees the writes that process handles.
+    Calling load() again reconciles it with the store, picking up documents that
+    other workers created, changed or deleted.
+    """
+
+    def __init__(self, top_k: int = 10, recency_seconds: float = 30 * 86400):
+        """
+        Initialize the suggestion index.
+
+        Args:
+            top_k: The most suggestions a lookup can return.
+            recency_seconds: The time over which recency outweighs frequency, see above.
+        """
+        self.trie = PrefixIndex(top_k)
+        self.recency_seconds = recency_seconds
+        # Tags and categories by kind and normalized text
+        self._shared: Dict[Tuple[str, str], Term] = {}
+        # Terms each document contributes, and the fields they were indexed from
+        self._documents: Dict[str, List[Term]] = {}
+        self._signatures: Dict[str, tuple] = {}
+        # Documents written in this process while the store is being loaded; the
+        # loaded copies of them may be older, so they are left as they are
+        self._touched: Set[str] = set()
+        self._writes = 0
+        self._loading = False
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._documents
+
+    def add(
+        self,
+        document_id: str,
+        title: Optional[str],
+        tags: Iterable[str] = (),
+        category: Optional[str] = None,
+        date: Optional[str] = None,
+    ) -> None:
+        """Index a document, replacing what was indexed for it before."""
+        self._written(document_id)
+        self._index(document_id, title, tags, category, date)
+
+    def remove(self, document_id: str) -> None:
+        """Remove a document from the index."""
+        self._written(document_id)
+        self._unindex(document_id)
+
+    async def load(self, fetch: Callable[[], List[Tuple[str, Dict[str, Any]]]], batch_size: int = 500) -> None:
+        """
+        Make the index match the stored documents, yielding to the event loop between batches.
+
+        Documents that changed are indexed again, and indexed documents that fetch does
+        not return are removed. Documents written in this process while the load runs
+        are left as they are, since the stored copies read by fetch may be older.
+
+        Args:
+            fetch: Reads pairs of document ID and stored data with title, tags, category
+                and date. Runs in a worker thread, so it may block.
+            batch_size: How many documents to index between yields.
+        """
+        self._loading = True
+        self._touched = set()
+        self.trie.deferred = True
+        rebuilt = False
+        try:
+            documents = await asyncio.to_thread(fetch)
+            stored = set()
+            for start in range(0, len(documents), batch_size):
+                for document_id, data in documents[start:start + batch_size]:
+                    stored.add(document_id)
+                    if document_id in self._touched:
+                        continue
+                    signature = _signature(data.get("title"), data.get("tags"), data.get("category"), data.get("date"))
+                    if self._signatures.get(document_id) != signature:
+                        self._index(document_id, *signature)
+                await asyncio.sleep(0)
+
+            for document_id in [key for key in self._documents if key not in stored and key not in self._touched]:
+                self._unindex(document_id)
+
+            # Rebuild the best terms of every node in slices, children first
+            writes = self._writes
+            nodes = self.trie.nodes()
+            step = batch_size * 10
+            for end in range(len(nodes), 0, -step):
+                self.trie.rebuild(nodes[max(end - step, 0):end])
+                await asyncio.sleep(0)
+            # Writes in between may have added nodes the slices did not cover
+            rebuilt = self._writes == writes
+        finally:
+            self.trie.deferred = False
+            if not rebuilt:
+                self.trie.rebuild()
+            self._loading = False
+            self._touched = set()
+        self.loaded = True
+
+    def lookup(self, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Get the best suggestions for what a user has typed so far, best first."""
+        key = normalize(prefix)
+        if not key:
+            return []
+        # A trailing space means the last word is complete
+        if prefix[-1:].isspace():
+            key += " "
+        return [term.to_dict() for term in self.trie.lookup(key, limit)]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": len(self._documents), "shared_terms": len(self._shared), "loaded": self.loaded}
+
+    def _written(self, document_id: str) -> None:
+        self._writes += 1
+        if self._loading:
+            self._touched.add(document_id)
+
+    def _index(
+        self,
+        document_id: str,
+        title: Optional[str],
+        tags: Optional[Iterable[str]],
+        category: Optional[str],
+        date: Optional[str],
+    ) -> None:
+        self._unindex(document_id)
+        timestamp = _timestamp(date)
+
+        terms = []
+        if title and normalize(title):
+            term = Term(title.strip(), "title", document_id)
+            self._count(term, 1, timestamp)
+            terms.append(term)
+
+        for kind, text in [("tag", tag) for tag in tags or ()] + [("category", category)]:
+            key = normalize(text or "")
+            if not key:
+                continue
+            term = self._shared.get((kind, key))
+            if term is None:
+                term = self._shared[(kind, key)] = Term(text.strip(), kind)
+            elif term in terms:
+                continue
+            self._count(term, 1, timestamp)
+            terms.append(term)
+
+        self._documents[document_id] = terms
+        self._signatures[document_id] = _signature(title, tags, category, date)
+
+    def _unindex(self, document_id: str) -> None:
+        self._signatures.pop(document_id, None)
+        for term in self._documents.pop(document_id, ()):
+            self._count(term, -1)
+
+    def _count(self, term: Term, delta: int, timestamp: Optional[float] = None) -> None:
+        term.count += delta
+        keys = word_suffixes(term.text)
+        if term.count <= 0:
+            for key in keys:
+                self.trie.remove(key, term)
+            self._shared.pop((term.kind, normalize(term.text)), None)
+            return
+
+        if timestamp is not None:
+            term.last_seen = max(term.last_seen, timestamp)
+        term.score = math.log(term.count) + term.last_seen / self.recency_seconds
+        for key in keys:
+            if delta > 0 and term.count == 1:
+                self.trie.add(key, term)
+            else:
+                self.trie.rescore(key)
@@ -0,0 +1,132 @@
+"""
+Per-request tracing.
+Services mark their processing stages with span(); the spans of the current request
+are collected in a context-local trace and reported in the Server-Timing header,
+or as a JSON trace for debugging. Every span is also recorded in the stage metrics.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core import metrics
+
+class Span:
+    """A timed stage within a trace."""
+
+    def __init__(self, name: str, start: float, parent: Optional["Span"] = None):
+        self.name = name
+        self.start = start
+        self.end: Optional[float] = None
+        self.parent = parent
+        self.error: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        """Get the duration of the span in seconds, up to now if it is still running."""
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+class Trace:
+    """The spans recorded while handling one request."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: List[Span] = []
+        # Spans may be recorded from worker threads started with asyncio.to_thread
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def durations(self) -> Dict[str, float]:
+        """
+        Get the total time spent in each stage, in seconds, in order of first occurrence.
+
+        Stages that ran several times, or concurrently, are summed.
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        totals: Dict[str, float] = {}
+        for span in spans:
+            totals[span.name] = totals.get(span.name, 0.0) + span.duration
+        return totals
+
+    def server_timing(self) -> str:
+        """Format the stage durations as a Server-Timing header value."""
+        entries = [f"{name};dur={duration * 1000:.1f}" for name, duration in self.durations().items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Get the trace as a JSON-serializable dict, with times in milliseconds."""
+        with self._lock:
+            spans = list(self.spans)
+
+        return {
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "stages_ms": {name: round(duration * 1000, 3) for name, duration in self.durations().items()},
+            "spans": [
+                {
+                    "name": span.name,
+                    "parent": span.parent.name if span.parent else None,
+                    "start_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    "error": span.error,
+                }
+                for span in spans
+            ],
+        }
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+@contextmanager
+def trace_request() -> Iterator[Trace]:
+    """Start a trace that collects the spans of the current request."""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+def current_trace() -> Optional[Trace]:
+    """Get the trace of the current request, if any."""
+    return _current_trace.get()
+
+@contextmanager
+def span(name: str) -> Iterator[Span]:
+    """
+    Time a processing stage, such as an embedding call or a Firestore read.
+
+    The span is added to the trace of the current request, if there is one, and its
+    duration, errors and concurrency are always recorded in the stage metrics.
+    Spans opened inside another span record it as their parent.
+
+    Args:
+        name: The name of the stage. It is used as a Server-Timing metric name,
+            so it must not contain spaces or separators.
+    """
+    current = Span(name, time.perf_counter(), _current_span.get())
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(current)
+
+    token = _current_span.set(current)
+    metrics.STAGES_IN_FLIGHT.inc(stage=name)
+    try:
+        yield current
+    except Exception as e:
+        current.error = type(e).__name__
+        metrics.STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        current.end = time.perf_counter()
+        _current_span.reset(token)
+        metrics.STAGES_IN_FLIGHT.dec(stage=name)
+        metrics.STAGE_DURATION.observe(current.end - current.start, stage=name)
@@ -0,0 +1,167 @@
+"""
+Capture of sanitised request streams for load testing.
+When TRAFFIC_CAPTURE_PATH is set, every request is recorded as one compact JSON line,
+written by a background thread like the application logs, for replay_traffic.py to
+re-issue against another deployment.
+
+Each line holds:
+    ts  Wall-clock time the request started, in seconds since the epoch
+    m   Method
+    p   Path
+    r   Route template, e.g. /api/documents/{document_id}
+    q   Query parameters as [name, value] pairs, secrets redacted
+    qh  Content query parameters recorded by hash only, as [name, length, SHA-256]
+        triples, see TRAFFIC_CAPTURE_CONTENT_PARAMS
+    h   Captured headers, see TRAFFIC_CAPTURE_HEADERS
+    bl  Body length in bytes
+    bh  SHA-256 of the body
+    b   Body as text, only with TRAFFIC_CAPTURE_BODIES and up to the size limit
+    be  "base64" if the captured body is not UTF-8 and was base64-encoded
+    s   Response status
+    d   Duration until the response was sent, in seconds
+"""
+
+import atexit
+import base64
+import hashlib
+import json
+import logging
+import logging.handlers
+import queue
+import random
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import (
+    LOG_QUEUE_SIZE, TRAFFIC_CAPTURE_BODIES, TRAFFIC_CAPTURE_MAX_BODY_BYTES, TRAFFIC_CAPTURE_SAMPLE_RATE,
+    TRAFFIC_CAPTURE_REDACT_PARAMS, TRAFFIC_CAPTURE_CONTENT_PARAMS, TRAFFIC_CAPTURE_HEADERS
+)
+from app.core.log import DroppingQueueHandler
+
+# Value that replaces redacted query parameters
+REDACTED = "[redacted]"
+
+class TrafficRecorder:
+    """Writes captured requests to a JSON lines file without blocking the event loop."""
+
+    def __init__(
+        self,
+        path: str,
+        capture_bodies: bool = False,
+        max_body_bytes: int = 65536,
+        sample_rate: float = 1.0,
+        redact_params: Iterable[str] = (),
+        content_params: Iterable[str] = (),
+        headers: Iterable[str] = (),
+    ):
+        """
+        Initialize the traffic recorder. Records are appended to the file.
+
+        Args:
+            path: The capture file.
+            capture_bodies: Whether to record request bodies; otherwise only their
+                length and hash are recorded.
+            max_body_bytes: Bodies longer than this are recorded by hash only.
+            sample_rate: The fraction of requests to record.
+            redact_params: Query parameters whose values are replaced, e.g. tokens.
+            content_params: Query parameters that carry content, such as texts, URLs
+                or search terms; they are recorded like bodies.
+            headers: Request headers to record; all others are dropped.
+        """
+        self.path = path
+        self.capture_bodies = capture_bodies
+        self.max_body_bytes = max_body_bytes
+        self.sample_rate = sample_rate
+        self.redact_params = {name.lower() for name in redact_params}
+        self.content_params = {name.lower() for name in content_params}
+        self.headers = [name.lower() for name in headers]
+
+        file_handler = logging.FileHandler(path, encoding="utf-8")
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+
+        # A standalone logger, so captured requests never reach the application log
+        capture_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        self._handler = DroppingQueueHandler(capture_queue)
+        self._logger = logging.Logger("marchiver.traffic")
+        self._logger.addHandler(self._handler)
+        self._listener = logging.handlers.QueueListener(capture_queue, file_handler)
+        self._listener.start()
+        self._closed = False
+        atexit.register(self.close)
+
+    @property
+    def dropped(self) -> int:
+        """The number of records dropped because the writer fell behind."""
+        return self._handler.dropped
+
+    def should_capture(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def query_fields(self, pairs: List[Tuple[str, str]]) -> Dict[str, Any]:
+        """
+        Get the fields that describe the query of a request.
+
+        Secret parameters are redacted. Content parameters are kept only when bodies are
+        captured and they are within the body size limit; otherwise their length and
+        hash are recorded instead, in qh.
+        """
+        query, hashed = [], []
+        for name, value in pairs:
+            key = name.lower()
+            if key in self.redact_params:
+                query.append([name, REDACTED])
+            elif key in self.content_params:
+                data = value.encode("utf-8")
+                if self.capture_bodies and len(data) <= self.max_body_bytes:
+                    query.append([name, value])
+                else:
+                    hashed.append([name, len(data), hashlib.sha256(data).hexdigest()])
+            else:
+                query.append([name, value])
+        fields: Dict[str, Any] = {"q": query}
+        if hashed:
+            fields["qh"] = hashed
+        return fields
+
+    def select_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
+        """Keep only the headers that are recorded."""
+        return {name: headers[name] for name in self.headers if name in headers}
+
+    def body_fields(self, body: bytes, length: int, digest: str) -> Dict[str, Any]:
+        """Get the fields that describe a request body."""
+        fields = {"bl": length, "bh": digest}
+        if not self.capture_bodies or length == 0 or length > self.max_body_bytes:
+            return fields
+        try:
+            fields["b"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            fields["b"] = base64.b64encode(body).decode("ascii")
+            fields["be"] = "base64"
+        return fields
+
+    def record(self, entry: Dict[str, Any]) -> None:
+        """Queue a captured request for writing."""
+        if not self._closed:
+            self._logger.info(json.dumps(entry, separators=(",", ":")))
+
+    def close(self) -> None:
+        """Write the queued records and close the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._listener.stop()
+        for handler in self._listener.handlers:
+            handler.close()
+
+def create_recorder(path: Optional[str]) -> Optional[TrafficRecorder]:
+    """Create the traffic recorder from the configuration, or None if capture is off."""
+    if not path:
+        return None
+    return TrafficRecorder(
+        path,
+        capture_bodies=TRAFFIC_CAPTURE_BODIES,
+        max_body_bytes=TRAFFIC_CAPTURE_MAX_BODY_BYTES,
+        sample_rate=TRAFFIC_CAPTURE_SAMPLE_RATE,
+        redact_params=TRAFFIC_CAPTURE_REDACT_PARAMS,
+        content_params=TRAFFIC_CAPTURE_CONTENT_PARAMS,
+        headers=TRAFFIC_CAPTURE_HEADERS,
+    )
@@ -45,3 +45,24 @@ class Document(DocumentBase):
     class Config:
         orm_mode = True
         arbitrary_types_allowed = True
+
+    @classmethod
+    def from_storage(cls, data: Dict[str, Any]) -> "Document":
+        """
+        Build a document from data the services stored themselves, without validating it.
+
+        Stored documents were validated when they were created, and validating their
+        embeddings again on every read dominated the cost of listing and search
+        responses. Missing fields get their defaults. Never use this for client data.
+        """
+        return cls.model_construct(**data)
+
+class DocumentBatchGet(BaseModel):
+    """Model for getting many documents by ID."""
+    ids: List[str]
+    fields: Optional[List[str]] = None
+
+class DocumentBatch(BaseModel):
+    """Model for the documents found by a batch get, in the order they were asked for."""
+    documents: List[Dict[str, Any]]
+    missing: List[str] = Field(default_factory=list)
@@ -0,0 +1,23 @@
+from typing import Iterable, Optional
+
+class Embedding(list):
+    """
+    An embedding vector tagged with the provider and model that produced it.
+
+    Vectors from different providers live in different spaces and must not be
+    compared, so the tags travel with the vector. It is still a plain list of floats
+    for serialization.
+    """
+
+    def __init__(self, values: Iterable[float], provider: str, model: Optional[str] = None):
+        super().__init__(values)
+        self.provider = provider
+        self.model = model
+
+class EmbeddingUnavailableError(Exception):
+    """Raised when no allowed embedding provider could produce an embedding."""
+    pass
+
+class EmbeddingSpaceMismatchError(Exception):
+    """Raised when an embedding is compared with vectors from a different provider."""
+    pass
@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+class Suggestion(BaseModel):
+    """Model for a typeahead suggestion: a document title, a tag or a category."""
+    text: str
+    type: str
+    count: int = 1
+    document_id: Optional[str] = None
+
+class SuggestionList(BaseModel):
+    """Model for the suggestions for a prefix, best first."""
+    prefix: str
+    suggestions: List[Suggestion]
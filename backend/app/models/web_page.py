@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class WebPage(BaseModel):
+    """Model for a fetched web page."""
+    url: str
+    title: str
+    content: str
+    content_type: Optional[str] = None
+    encoding: Optional[str] = None
+    bytes_read: int = 0
+    truncated: bool = False
+    main_content: bool = False
+    error: Optional[str] = None
@@ -0,0 +1,198 @@
+"""
+Main content extraction for fetched web pages.
+Scores blocks of the page by text density and link density, readability style,
+so that navigation, footers, cookie banners and comments are left out.
+"""
+
+import re
+from bs4 import BeautifulSoup, Comment, Tag
+from typing import Dict, List, Optional, Tuple
+
+# Elements that never contain main content
+STRIP_TAGS = [
+    "script", "style", "noscript", "template", "iframe", "svg", "canvas",
+    "nav", "footer", "aside", "form", "button", "select", "input", "dialog",
+]
+
+# Class/id fragments that mark boilerplate and that mark likely content
+BOILERPLATE_PATTERN = re.compile(
+    r"comment|cookie|consent|banner|footer|masthead|menu|nav|sidebar|social|share|"
+    r"sponsor|promo|advert|\bads?\b|popup|modal|newsletter|subscribe|related|breadcrumb|"
+    r"pagination|disqus|widget|skip-link",
+    re.IGNORECASE,
+)
+CONTENT_PATTERN = re.compile(
+    r"article|body|content|entry|main|post|story|text|blog",
+    re.IGNORECASE,
+)
+
+# Elements whose text is scored and credited to their ancestors
+SCORED_TAGS = ["p", "pre", "td", "blockquote", "li", "h2", "h3"]
+
+# Elements that can be chosen as the main content container
+CANDIDATE_TAGS = {"div", "article", "section", "main", "td", "body", "blockquote"}
+
+class ContentExtractor:
+    """Extracts the main content of an HTML page."""
+
+    def __init__(self, min_paragraph_length: int = 25, min_content_length: int = 250):
+        """
+        Initialize the content extractor.
+
+        Args:
+            min_paragraph_length: Paragraphs shorter than this are not scored.
+            min_content_length: Extracted content shorter than this falls back to the full text.
+        """
+        self.min_paragraph_length = min_paragraph_length
+        self.min_content_length = min_content_length
+
+    def extract(self, soup: BeautifulSoup) -> Tuple[str, bool]:
+        """
+        Extract the main content text of a parsed page.
+
+        Falls back to the full page text when no block stands out or the extracted
+        content is too short to be the real article.
+
+        Args:
+            soup: The parsed page. It is modified in place.
+
+        Returns:
+            A tuple of (text, is_main_content), where the text has one block per line
+            and is_main_content is False if the full page text was used.
+        """
+        for element in soup(["script", "style"]):
+            element.extract()
+        full_text = soup.get_text(separator="\n", strip=True)
+
+        self._remove_boilerplate(soup)
+
+        candidate = self._find_main_candidate(soup)
+        if candidate is None:
+            return full_text, False
+
+        content = candidate.get_text(separator="\n", strip=True)
+        if len(content) < self.min_content_length:
+            return full_text, False
+
+        return content, True
+
+    def _remove_boilerplate(self, soup: BeautifulSoup) -> None:
+        """Remove elements that are never part of the main content."""
+        for element in soup(STRIP_TAGS):
+            element.decompose()
+
+        for element in soup.find_all(self._is_boilerplate):
+            element.decompose()
+
+        for comment in soup.find_all(string=lambda text: isinstance(text, Comment)):
+            comment.extract()
+
+    def _is_boilerplate(self, element: Tag) -> bool:
+        """Check whether an element is marked as boilerplate by its class, id or role."""
+        if element.name in ("html", "body", "main", "article"):
+            return False
+        if element.attrs is None:
+            return False
+
+        role = element.get("role", "")
+        if role in ("navigation", "banner", "contentinfo", "complementary", "dialog"):
+            return True
+
+        names = " ".join(element.get("class", [])) + " " + element.get("id", "")
+        if not names.strip():
+            return False
+
+        return bool(BOILERPLATE_PATTERN.search(names)) and not CONTENT_PATTERN.search(names)
+
+    def _find_main_candidate(self, soup: BeautifulSoup) -> Optional[Tag]:
+        """
+        Find the element that most likely holds the main content.
+
+        Each paragraph adds a score based on its length and comma count to its
+        parent and, at half weight, its grandparent. Candidate scores are then
+        scaled down by their link density.
+        """
+        scores: Dict[int, float] = {}
+        elements: Dict[int, Tag] = {}
+
+        for paragraph in soup.find_all(SCORED_TAGS):
+            text = paragraph.get_text(" ", strip=True)
+            if len(text) < self.min_paragraph_length:
+                continue
+
+            score = 1 + text.count(",") + min(len(text) // 100, 3)
+
+            ancestors = [paragraph.parent, paragraph.parent.parent if paragraph.parent else None]
+            for level, ancestor in enumerate(ancestors):
+                if not isinstance(ancestor, Tag) or ancestor.name not in CANDIDATE_TAGS:
+                    continue
+                key = id(ancestor)
+                if key not in scores:
+                    elements[key] = ancestor
+                    scores[key] = self._initial_score(ancestor)
+                scores[key] += score if level == 0 else score / 2
+
+        if not scores:
+            return None
+
+        adjusted = {
+            key: score * (1 - self._link_density(elements[key]))
+            for key, score in scores.items()
+        }
+        best_key = max(adjusted, key=adjusted.get)
+        best = elements[best_key]
+        best_score = adjusted[best_key]
+
+        # A single, weak block is not enough evidence to drop the rest of the page
+        if best_score < 10:
+            return None
+
+        return self._merge_siblings(best, best_score, adjusted)
+
+    def _merge_siblings(self, best: Tag, best_score: float, adjusted: Dict[int, float]) -> Tag:
+        """
+        Pull in siblings of the best candidate that also look like content,
+        such as an article body split across several sibling containers.
+        """
+        if best.parent is None or best.name == "body":
+            return best
+
+        threshold = max(10, best_score * 0.2)
+        siblings: List[Tag] = []
+        for sibling in best.parent.children:
+            if sibling is best:
+                siblings.append(sibling)
+                continue
+            if not isinstance(sibling, Tag):
+                continue
+            if adjusted.get(id(sibling), 0) >= threshold:
+                siblings.append(sibling)
+
+        if len(siblings) == 1:
+            return best
+
+        container = BeautifulSoup("<div></div>", "lxml").div
+        for sibling in siblings:
+            container.append(sibling.extract())
+        return container
+
+    def _initial_score(self, element: Tag) -> float:
+        """Give an element a head start based on its tag and class/id names."""
+        score = {"article": 10, "main": 10, "section": 3, "div": 5, "blockquote": 3, "td": 3}.get(element.name, 0)
+
+        names = " ".join(element.get("class", [])) + " " + element.get("id", "")
+        if CONTENT_PATTERN.search(names):
+            score += 25
+        if BOILERPLATE_PATTERN.search(names):
+            score -= 25
+
+        return score
+
+    def _link_density(self, element: Tag) -> float:
+        """Get the share of an element's text that sits inside links."""
+        text_length = len(element.get_text(" ", strip=True))
+        if text_length == 0:
+            return 1.0
+
+        link_length = sum(len(link.get_text(" ", strip=True)) for link in element.find_all("a"))
+        return min(link_length / text_length, 1.0)
@@ -1,16 +1,27 @@
 from typing import List, Optional, Dict, Any
+import asyncio
 import firebase_admin
 from firebase_admin import credentials, firestore
 from google.cloud import aiplatform
+import logging
 import os
 import json
+import time
 
+from app.core.log import get_logger
+from app.core.suggestions import SuggestionIndex
+from app.core.tracing import span
 from app.models.document import Document, DocumentCreate, DocumentUpdate
+from app.models.embedding import EmbeddingSpaceMismatchError
 from app.core.config import (
     GOOGLE_APPLICATION_CREDENTIALS, GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_REGION,
-    VERTEX_AI_INDEX_ENDPOINT, VERTEX_AI_INDEX, FIRESTORE_COLLECTION
+    VERTEX_AI_INDEX_ENDPOINT, VERTEX_AI_INDEX, VERTEX_AI_INDEX_CACHE_FILE, FIRESTORE_COLLECTION,
+    VECTOR_INDEX_EMBEDDING_PROVIDER, SUGGEST_MAX_RESULTS, SUGGEST_RECENCY_DAYS, SUGGEST_LOAD_LIMIT,
+    SUGGEST_REFRESH_SECONDS
 )
 
+logger = get_logger(__name__)
+
 class DocumentService:
     """Service for document operations."""
     
@@ -24,13 +35,18 @@ class DocumentService:
                 cred = credentials.Certificate(cred_path)
                 firebase_admin.initialize_app(cred)
             except Exception as e:
-                print(f"Failed to initialize Firebase: {e}")
+                logger.warning(f"Failed to initialize Firebase: {e}")
                 # For development, we can use a mock implementation
                 pass
         
         self.db = firestore.client()
         self.collection = self.db.collection(FIRESTORE_COLLECTION)
         
+        # Typeahead suggestions, loaded by warm_up(), kept current on every write and
+        # reconciled with the writes of other workers every SUGGEST_REFRESH_SECONDS
+        self.suggestions = SuggestionIndex(SUGGEST_MAX_RESULTS, SUGGEST_RECENCY_DAYS * 86400)
+        self._refresh_task: Optional[asyncio.Task] = None
+        
         # Initialize Vertex AI Vector Search
         self.vector_search_initialized = False
         self.index = None
@@ -46,26 +62,27 @@ class DocumentService:
             # Initialize the index endpoint
             try:
                 self.index_endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=VERTEX_AI_INDEX_ENDPOINT)
-                print(f"Successfully initialized MatchingEngineIndexEndpoint with name: {self.index_endpoint.name}")
+                logger.info(f"Successfully initialized MatchingEngineIndexEndpoint with name: {self.index_endpoint.name}")
+                
+                # Resolving the index means scanning the deployed indexes or listing all
+                # indexes over the network, so reuse the name resolved by a previous start
+                cached_index_name = self._load_cached_index_name()
+                if cached_index_name:
+                    self._init_index(cached_index_name)
+                    if self.index is None:
+                        self._save_cached_index_name(None)
                 
                 # Get the actual index resource name from the deployed indexes
-                if hasattr(self.index_endpoint, 'deployed_indexes') and self.index_endpoint.deployed_indexes:
+                if self.index is None and hasattr(self.index_endpoint, 'deployed_indexes') and self.index_endpoint.deployed_indexes:
                     for deployed_index in self.index_endpoint.deployed_indexes:
                         if isinstance(deployed_index, dict) and 'id' in deployed_index and deployed_index['id'] == self.deployed_index_id:
                             # Found the deployed index with the matching ID
                             if 'index' in deployed_index:
                                 actual_index_name = deployed_index['index']
-                                print(f"Found actual index resource name: {actual_index_name}")
+                                logger.info(f"Found actual index resource name: {actual_index_name}")
                                 
                                 # Initialize the index with the actual resource name
-                                try:
-                                    self.index = aiplatform.MatchingEngineIndex(index_name=actual_index_name)
-                                    print(f"Successfully initialized MatchingEngineIndex with name: {self.index.name}")
-                                    self.vector_search_initialized = True
-                                except Exception as e:
-                                    print(f"Failed to initialize MatchingEngineIndex with actual resource name: {e}")
-                                    self.index = None
-                                
+                                self._init_index(actual_index_name)
                                 break
                 
                 # If we couldn't find the actual index resource name, try to list all indexes
@@ -75,25 +92,161 @@ class DocumentService:
                         if indexes and len(indexes) > 0:
                             # Use the first index
                             self.index = indexes[0]
-                            print(f"Using first available index: {self.index.name}")
+                            logger.info(f"Using first available index: {self.index.name}")
                             self.vector_search_initialized = True
                     except Exception as e:
-                        print(f"Failed to list indexes: {e}")
+                        logger.warning(f"Failed to list indexes: {e}")
                         self.index = None
+                
+                if self.index is not None and self.index.resource_name != cached_index_name:
+                    self._save_cached_index_name(self.index.resource_name)
             except Exception as e:
-                print(f"Failed to initialize MatchingEngineIndexEndpoint: {e}")
+                logger.warning(f"Failed to initialize MatchingEngineIndexEndpoint: {e}")
                 self.index_endpoint = None
             
             # Check if both index and index endpoint are initialized
             if self.index is None or self.index_endpoint is None:
-                print("Vector search is not fully initialized. Some operations may not work.")
+                logger.warning("Vector search is not fully initialized. Some operations may not work.")
                 if self.index_endpoint is not None:
-                    print("Only search operations will be available.")
+                    logger.warning("Only search operations will be available.")
                     self.vector_search_initialized = True
                 else:
                     self.vector_search_initialized = False
         except Exception as e:
-            print(f"Failed to initialize Vertex AI Vector Search: {e}")
+            logger.warning(f"Failed to initialize Vertex AI Vector Search: {e}")
+    
+    async def warm_up(self) -> None:
+        """Load the titles, tags and categories of the newest documents into the suggestion index."""
+        await self._load_suggestions()
+        if SUGGEST_REFRESH_SECONDS > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.ensure_future(self._refresh_suggestions())
+    
+    async def close(self) -> None:
+        """Stop reconciling the suggestion index."""
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+    
+    async def _refresh_suggestions(self) -> None:
+        while True:
+            await asyncio.sleep(SUGGEST_REFRESH_SECONDS)
+            await self._load_suggestions()
+    
+    async def _load_suggestions(self) -> None:
+        start = time.perf_counter()
+        query = (
+            self.collection.select(["title", "tags", "category", "date"])
+            .order_by("date", direction=firestore.Query.DESCENDING)
+            .limit(SUGGEST_LOAD_LIMIT)
+        )
+        try:
+            await self.suggestions.load(lambda: [(doc.id, doc.to_dict()) for doc in query.stream()])
+        except Exception as e:
+            # Suggestions still come from the documents this process writes
+            logger.warning(f"Failed to load the suggestion index: {e}")
+            return
+        logger.info(
+            "Loaded suggestion index",
+            extra={"documents": len(self.suggestions), "duration_ms": round((time.perf_counter() - start) * 1000, 1)},
+        )
+    
+    def describe(self) -> Dict[str, Any]:
+        return {"vector_search": self.vector_search_initialized, "suggestions": self.suggestions.stats()}
+    
+    def _index_suggestions(self, document: Document) -> None:
+        self.suggestions.add(document.id, document.title, document.tags, document.category, document.date)
+    
+    def _tag_embedding(self, metadata: Dict[str, Any], embedding: List[float]) -> Dict[str, Any]:
+        """Record the provider and model of an embedding in the document metadata."""
+        provider = getattr(embedding, "provider", None)
+        if provider is None:
+            return metadata
+        
+        metadata = dict(metadata)
+        metadata["embedding_provider"] = provider
+        metadata["embedding_model"] = getattr(embedding, "model", None)
+        return metadata
+    
+    def _matches_index_space(self, embedding: List[float]) -> bool:
+        """
+        Check whether an embedding lives in the vector space of the index.
+        Untagged embeddings, e.g. of documents stored before tagging, are assumed to.
+        """
+        provider = getattr(embedding, "provider", None)
+        return provider is None or provider == VECTOR_INDEX_EMBEDDING_PROVIDER
+    
+    def _check_index_space(self, document_id: str, embedding: List[float]) -> bool:
+        """Check whether an embedding may be written to the index, and warn if not."""
+        if self._matches_index_space(embedding):
+            return True
+        
+        logger.warning(
+            "Not indexing embedding from a different provider than the index",
+            extra={
+                "document_id": document_id,
+                "embedding_provider": embedding.provider,
+                "index_provider": VECTOR_INDEX_EMBEDDING_PROVIDER,
+            },
+        )
+        return False
+    
+    def _require_index_space(self, embedding: List[float]) -> None:
+        """Refuse to search the index with an embedding from a different vector space."""
+        if not self._matches_index_space(embedding):
+            raise EmbeddingSpaceMismatchError(
+                f"Embedding from provider {embedding.provider} cannot be compared with "
+                f"the {VECTOR_INDEX_EMBEDDING_PROVIDER} vectors in the index"
+            )
+    
+    def _init_index(self, index_name: str) -> None:
+        """Initialize the MatchingEngineIndex with the given resource name."""
+        try:
+            self.index = aiplatform.MatchingEngineIndex(index_name=index_name)
+            logger.info(f"Successfully initialized MatchingEngineIndex with name: {self.index.name}")
+            self.vector_search_initialized = True
+        except Exception as e:
+            logger.warning(f"Failed to initialize MatchingEngineIndex with resource name {index_name}: {e}")
+            self.index = None
+    
+    def _index_cache_key(self) -> str:
+        """Get the key of the resolved index name in the cache file."""
+        return f"{VERTEX_AI_INDEX_ENDPOINT}/{self.deployed_index_id}"
+    
+    def _load_cached_index_name(self) -> Optional[str]:
+        """Get the index resource name resolved by a previous start, if any."""
+        try:
+            with open(VERTEX_AI_INDEX_CACHE_FILE, "r") as f:
+                return json.load(f).get(self._index_cache_key())
+        except (OSError, ValueError, AttributeError):
+            return None
+    
+    def _save_cached_index_name(self, index_name: Optional[str]) -> None:
+        """Remember the resolved index resource name for the next start, or forget it."""
+        try:
+            with open(VERTEX_AI_INDEX_CACHE_FILE, "r") as f:
+                cached = json.load(f)
+            if not isinstance(cached, dict):
+                cached = {}
+        except (OSError, ValueError):
+            cached = {}
+        
+        if index_name:
+            cached[self._index_cache_key()] = index_name
+        else:
+            cached.pop(self._index_cache_key(), None)
+        
+        try:
+            os.makedirs(os.path.dirname(VERTEX_AI_INDEX_CACHE_FILE), exist_ok=True)
+            temp_path = f"{VERTEX_AI_INDEX_CACHE_FILE}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(cached, f)
+            os.replace(temp_path, VERTEX_AI_INDEX_CACHE_FILE)
+        except OSError as e:
+            logger.warning(f"Failed to cache index resource name: {e}")
     
     async def create_document(self, document: DocumentCreate, embedding: List[float]) -> Document:
         """Create a new document."""
@@ -103,7 +256,7 @@ class DocumentService:
             title=document.title,
             url=document.url,
             summary=document.summary,
-            metadata=document.metadata,
+            metadata=self._tag_embedding(document.metadata, embedding),
             tags=document.tags,
             category=document.category,
             embedding=embedding,
@@ -113,35 +266,84 @@ class DocumentService:
         
         # Save to Firestore
         doc_ref = self.collection.document(doc.id)
-        doc_ref.set(doc.dict())
+        with span("store"):
+            doc_ref.set(doc.dict())
+        self._index_suggestions(doc)
         
         # If Vector Search is initialized, add the embedding
-        if self.vector_search_initialized:
+        if self.vector_search_initialized and self._check_index_space(doc.id, embedding):
             try:
-                self._add_embedding_to_vector_search(doc.id, embedding)
+                with span("vector_write"):
+                    self._add_embedding_to_vector_search(doc.id, embedding)
             except Exception as e:
-                print(f"Failed to add embedding to Vector Search: {e}")
+                logger.warning(f"Failed to add embedding to Vector Search: {e}")
         
         return doc
     
     async def get_document(self, document_id: str) -> Optional[Document]:
         """Get a document by ID."""
         doc_ref = self.collection.document(document_id)
-        doc = doc_ref.get()
+        with span("firestore_read"):
+            doc = doc_ref.get()
+        
+        if not doc.exists:
+            return None
+        
+        return Document.from_storage(doc.to_dict())
+    
+    async def get_documents(
+        self, document_ids: List[str], field_paths: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get many documents in a single read.
+        
+        Args:
+            document_ids: The IDs of the documents.
+            field_paths: The fields to read, or None to read whole documents.
+        
+        Returns:
+            The stored data of each document that exists, keyed by ID.
+        """
+        if not document_ids:
+            return {}
+        
+        doc_refs = [self.collection.document(doc_id) for doc_id in dict.fromkeys(document_ids)]
+        
+        def read():
+            # get_all returns the documents in any order, and fetches them while it is iterated
+            docs = self.db.get_all(doc_refs, field_paths=field_paths)
+            return {doc.id: doc.to_dict() for doc in docs if doc.exists}
+        
+        with span("firestore_read"):
+            return await asyncio.to_thread(read)
+    
+    async def get_document_version(self, document_id: str) -> Optional[int]:
+        """
+        Get the version of a document without reading the rest of it.
+        
+        Returns:
+            The version, or None if the document does not exist.
+        """
+        doc_ref = self.collection.document(document_id)
+        with span("firestore_read"):
+            # The client is synchronous, so the read runs in a thread to keep the event loop free
+            doc = await asyncio.to_thread(doc_ref.get, field_paths=["version"])
         
         if not doc.exists:
             return None
         
-        return Document(**doc.to_dict())
+        # Documents stored before versions were added are at version 1
+        return doc.to_dict().get("version", 1)
     
     async def find_document_by_url(self, url: str) -> Optional[Document]:
         """Find a document by URL."""
         # Query Firestore for documents with the given URL
-        docs = self.collection.where("url", "==", url).limit(1).get()
+        with span("firestore_read"):
+            docs = self.collection.where("url", "==", url).limit(1).get()
         
         # Return the first document if found
         for doc in docs:
-            return Document(**doc.to_dict())
+            return Document.from_storage(doc.to_dict())
         
         # Return None if no document is found
         return None
@@ -151,13 +353,14 @@ class DocumentService:
     ) -> Document:
         """Update a document."""
         doc_ref = self.collection.document(document_id)
-        doc = doc_ref.get()
+        with span("firestore_read"):
+            doc = doc_ref.get()
         
         if not doc.exists:
             return None
         
         # Get the current document
-        current_doc = Document(**doc.to_dict())
+        current_doc = Document.from_storage(doc.to_dict())
         
         # Update the document
         update_data = document_update.dict(exclude_unset=True)
@@ -165,63 +368,75 @@ class DocumentService:
         # If embedding is provided, update it
         if embedding:
             update_data["embedding"] = embedding
+            update_data["metadata"] = self._tag_embedding(
+                update_data.get("metadata") or current_doc.metadata, embedding
+            )
             
             # If Vector Search is initialized, update the embedding
-            if self.vector_search_initialized:
+            if self.vector_search_initialized and self._check_index_space(document_id, embedding):
                 try:
-                    self._update_embedding_in_vector_search(document_id, embedding)
+                    with span("vector_write"):
+                        self._update_embedding_in_vector_search(document_id, embedding)
                 except Exception as e:
-                    print(f"Failed to update embedding in Vector Search: {e}")
+                    logger.warning(f"Failed to update embedding in Vector Search: {e}")
         
         # Increment the version
         update_data["version"] = current_doc.version + 1
         
         # Update the document
-        doc_ref.update(update_data)
+        with span("store"):
+            doc_ref.update(update_data)
         
         # Get the updated document
-        updated_doc = doc_ref.get()
+        with span("firestore_read"):
+            updated_doc = doc_ref.get()
         
-        return Document(**updated_doc.to_dict())
+        result = Document.from_storage(updated_doc.to_dict())
+        self._index_suggestions(result)
+        return result
     
     async def delete_document(self, document_id: str) -> None:
         """Delete a document."""
         doc_ref = self.collection.document(document_id)
         
         # Delete from Firestore
-        doc_ref.delete()
+        with span("store"):
+            doc_ref.delete()
+        self.suggestions.remove(document_id)
         
         # If Vector Search is initialized, delete the embedding
         if self.vector_search_initialized:
             try:
-                self._delete_embedding_from_vector_search(document_id)
+                with span("vector_write"):
+                    self._delete_embedding_from_vector_search(document_id)
             except Exception as e:
-                print(f"Failed to delete embedding from Vector Search: {e}")
+                logger.warning(f"Failed to delete embedding from Vector Search: {e}")
     
     async def semantic_search(
         self, query_embedding: List[float], limit: int = 10, offset: int = 0
     ) -> List[Document]:
         """
         Perform semantic search using the query embedding.
+        
+        Raises:
+            EmbeddingSpaceMismatchError: If the query embedding was not produced by the
+                provider whose vectors the index holds.
         """
+        self._require_index_space(query_embedding)
+        
         if not self.vector_search_initialized:
             # If Vector Search is not initialized, return empty list
             return []
         
         try:
             # Get similar documents from Vector Search
-            similar_doc_ids = self._find_similar_embeddings(query_embedding, limit + offset)
+            with span("vector_search"):
+                similar_doc_ids = self._find_similar_embeddings(query_embedding, limit + offset)
             
             # Get the documents from Firestore
-            docs = []
-            for doc_id in similar_doc_ids[offset:]:
-                doc = await self.get_document(doc_id)
-                if doc:
-                    docs.append(doc)
-            
-            return docs
+            return await self._hydrate(similar_doc_ids[offset:])
         except Exception as e:
-            print(f"Failed to perform semantic search: {e}")
+            logger.warning(f"Failed to perform semantic search: {e}")
             return []
     
     async def full_text_search(
@@ -234,9 +449,10 @@ class DocumentService:
         # In a real implementation, you might want to use a dedicated search engine
         
         # Search in content, title, and summary
-        content_docs = self.collection.where("content", ">=", query).where("content", "<=", query + "\uf8ff").limit(limit).get()
-        title_docs = self.collection.where("title", ">=", query).where("title", "<=", query + "\uf8ff").limit(limit).get()
-        summary_docs = self.collection.where("summary", ">=", query).where("summary", "<=", query + "\uf8ff").limit(limit).get()
+        with span("firestore_read"):
+            content_docs = self.collection.where("content", ">=", query).where("content", "<=", query + "\uf8ff").limit(limit).get()
+            title_docs = self.collection.where("title", ">=", query).where("title", "<=", query + "\uf8ff").limit(limit).get()
+            summary_docs = self.collection.where("summary", ">=", query).where("summary", "<=", query + "\uf8ff").limit(limit).get()
         
         # Combine the results
         docs = []
@@ -245,7 +461,7 @@ class DocumentService:
         for doc_list in [content_docs, title_docs, summary_docs]:
             for doc in doc_list:
                 if doc.id not in doc_ids:
-                    docs.append(Document(**doc.to_dict()))
+                    docs.append(Document.from_storage(doc.to_dict()))
                     doc_ids.add(doc.id)
                     
                     if len(docs) >= limit + offset:
@@ -262,44 +478,52 @@ class DocumentService:
         """
         Get the most recent documents.
         """
-        docs = self.collection.order_by("date", direction=firestore.Query.DESCENDING).limit(limit + offset).get()
+        with span("firestore_read"):
+            docs = self.collection.order_by("date", direction=firestore.Query.DESCENDING).limit(limit + offset).get()
         
-        return [Document(**doc.to_dict()) for doc in docs][offset:]
+        return [Document.from_storage(doc.to_dict()) for doc in docs][offset:]
     
     async def find_similar_documents(
         self, embedding: List[float], limit: int = 10, exclude_ids: List[str] = None
     ) -> List[Document]:
         """
         Find documents similar to the given embedding.
+        
+        Raises:
+            EmbeddingSpaceMismatchError: If the embedding was not produced by the
+                provider whose vectors the index holds.
         """
+        self._require_index_space(embedding)
+        
         if not self.vector_search_initialized:
             # If Vector Search is not initialized, return empty list
             return []
         
         try:
             # Get similar documents from Vector Search
-            similar_doc_ids = self._find_similar_embeddings(embedding, limit * 2)
+            with span("vector_search"):
+                similar_doc_ids = self._find_similar_embeddings(embedding, limit * 2)
             
             # Filter out excluded IDs
             if exclude_ids:
                 similar_doc_ids = [doc_id for doc_id in similar_doc_ids if doc_id not in exclude_ids]
             
             # Get the documents from Firestore
-            docs = []
-            for doc_id in similar_doc_ids[:limit]:
-                doc = await self.get_document(doc_id)
-                if doc:
-                    docs.append(doc)
-            
-            return docs
+            return await self._hydrate(similar_doc_ids[:limit])
         except Exception as e:
-            print(f"Failed to find similar documents: {e}")
+            logger.warning(f"Failed to find similar documents: {e}")
             return []
     
+    async def _hydrate(self, document_ids: List[str]) -> List[Document]:
+        """Get the documents found by a vector search in one read, in the order of the search."""
+        with span("hydrate"):
+            found = await self.get_documents(document_ids)
+        return [Document.from_storage(found[doc_id]) for doc_id in document_ids if doc_id in found]
+    
     def _add_embedding_to_vector_search(self, document_id: str, embedding: List[float]) -> None:
         """Add an embedding to Vector Search."""
         if not self.vector_search_initialized or self.index is None:
-            print("Vector search is not fully initialized. Cannot add embedding.")
+            logger.warning("Vector search is not fully initialized. Cannot add embedding.")
             return
         
         try:
@@ -321,11 +545,12 @@ class DocumentService:
             
             # Call the API
             self.index.api_client.upsert_datapoints(request)
-            print(f"Successfully added embedding for document {document_id} to Vector Search")
+            logger.debug("Added embedding to Vector Search", extra={"document_id": document_id})
         except Exception as e:
-            print(f"Error adding embedding to Vector Search: {e}")
-            print(f"Error details: {str(e)}")
-            print("WARNING: Could not add embedding to Vector Search. Document will be saved without vector search capability.")
+            logger.warning(
+                "Could not add embedding to Vector Search, the document is saved without vector search capability",
+                extra={"document_id": document_id, "error": str(e)},
+            )
     
     def _update_embedding_in_vector_search(self, document_id: str, embedding: List[float]) -> None:
         """Update an embedding in Vector Search."""
@@ -338,7 +563,7 @@ class DocumentService:
     def _delete_embedding_from_vector_search(self, document_id: str) -> None:
         """Delete an embedding from Vector Search."""
         if not self.vector_search_initialized or self.index is None:
-            print("Vector search is not fully initialized. Cannot delete embedding.")
+            logger.warning("Vector search is not fully initialized. Cannot delete embedding.")
             return
         
         try:
@@ -353,16 +578,17 @@ class DocumentService:
             
             # Call the API
             self.index.api_client.remove_datapoints(request)
-            print(f"Successfully deleted embedding for document {document_id} from Vector Search")
+            logger.debug("Deleted embedding from Vector Search", extra={"document_id": document_id})
         except Exception as e:
-            print(f"Error deleting embedding from Vector Search: {e}")
-            print(f"Error details: {str(e)}")
-            print("WARNING: Could not delete embedding from Vector Search. Document will be deleted from Firestore only.")
+            logger.warning(
+                "Could not delete embedding from Vector Search, the document is deleted from Firestore only",
+                extra={"document_id": document_id, "error": str(e)},
+            )
     
     def _find_similar_embeddings(self, embedding: List[float], limit: int = 10) -> List[str]:
         """Find similar embeddings in Vector Search."""
         if not self.vector_search_initialized or self.index_endpoint is None:
-            print("Vector search is not fully initialized. Cannot find similar embeddings.")
+            logger.warning("Vector search is not fully initialized. Cannot find similar embeddings.")
             return []
         
         try:
@@ -391,24 +617,13 @@ class DocumentService:
                     # Format from the test output: a list of MatchNeighbor objects
                     return [neighbor.id for neighbor in response[0]]
             
-            print("\nDetailed response information:")
-            print(f"Response type: {type(response)}")
-            print(f"Response: {response}")
-            
-            if response:
-                print(f"Response length: {len(response)}")
-                if len(response) > 0:
-                    print(f"First item type: {type(response[0])}")
-                    print(f"First item: {response[0]}")
-                    
-                    # Try to print attributes or keys
-                    if hasattr(response[0], '__dict__'):
-                        print(f"First item attributes: {response[0].__dict__}")
-                    elif isinstance(response[0], dict):
-                        print(f"First item keys: {response[0].keys()}")
+            logger.warning("Could not extract neighbors from the Vector Search response")
+            # Dumping the response is expensive, so only do it when debug logging is on
+            if logger.isEnabledFor(logging.DEBUG):
+                self._log_response_details(response)
             return []
         except Exception as e:
-            print(f"Error finding similar embeddings in Vector Search: {e}")
+            logger.warning("Failed to find similar embeddings in Vector Search", extra={"error": str(e)})
             
             # Try alternative method name
             try:
@@ -427,10 +642,26 @@ class DocumentService:
                     elif isinstance(response[0], dict) and 'neighbors' in response[0]:
                         return [neighbor['id'] for neighbor in response[0]['neighbors']]
                 
-                print("Warning: Could not extract neighbors from response format (match method)")
-                print(f"Response: {response}")
+                logger.warning("Could not extract neighbors from the Vector Search response (match method)")
+                if logger.isEnabledFor(logging.DEBUG):
+                    self._log_response_details(response)
                 return []
             except Exception as e2:
-                print(f"Error using match method: {e2}")
-                print("WARNING: Could not find similar embeddings in Vector Search. Returning empty list.")
+                logger.warning(
+                    "Could not find similar embeddings in Vector Search, returning no results",
+                    extra={"error": str(e2)},
+                )
                 return []
+    
+    def _log_response_details(self, response: Any) -> None:
+        """Log the structure of a Vector Search response that could not be parsed."""
+        details = {"response_type": type(response).__name__, "response": repr(response)}
+        if response:
+            details["response_length"] = len(response)
+            first = response[0]
+            details["first_item_type"] = type(first).__name__
+            if hasattr(first, '__dict__'):
+                details["first_item_attributes"] = repr(first.__dict__)
+            elif isinstance(first, dict):
+                details["first_item_keys"] = list(first.keys())
+        logger.debug("Vector Search response details", extra=details)
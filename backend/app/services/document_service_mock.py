@@ -1,23 +1,142 @@
 """
 Mock document service for testing purposes.
-Uses in-memory storage instead of Firestore and Vertex AI.
+Uses in-memory storage instead of Firestore, and exact cosine similarity over an
+in-memory matrix instead of Vertex AI Vector Search.
 """
 
 from typing import List, Optional, Dict, Any
-import uuid
+import heapq
 from datetime import datetime
-import json
+
+import numpy as np
 
 from app.models.document import Document, DocumentCreate, DocumentUpdate
+from app.core.config import (
+    MOCK_FAULT_SEED, MOCK_FIRESTORE_LATENCY_MS, MOCK_FIRESTORE_ERROR_RATE,
+    MOCK_VECTOR_SEARCH_LATENCY_MS, MOCK_VECTOR_SEARCH_ERROR_RATE, SUGGEST_MAX_RESULTS, SUGGEST_RECENCY_DAYS
+)
+from app.core.log import get_logger
+from app.core.suggestions import SuggestionIndex
+from app.core.tracing import span
+from app.services.fault_injection import FaultInjector
+
+logger = get_logger(__name__)
+
+# Number of embeddings the vector index has room for before it first grows
+INITIAL_INDEX_CAPACITY = 1024
+
+class VectorIndexMock:
+    """
+    Exact nearest-neighbour search by cosine similarity.
+    
+    Embeddings are kept as normalized float32 rows of one matrix, so a search is a
+    single matrix-vector product. Deleted rows are replaced by the last row.
+    """
+    
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def upsert(self, document_id: str, embedding: List[float]) -> None:
+        """Add or replace the embedding of a document."""
+        vector = self._normalize(embedding)
+        if self.vectors is None:
+            self.vectors = np.zeros((INITIAL_INDEX_CAPACITY, len(vector)), dtype=np.float32)
+        
+        row = self.rows.get(document_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.vectors):
+                # Double the capacity, so appends take amortized constant time
+                self.vectors = np.concatenate([self.vectors, np.zeros_like(self.vectors)])
+            self.ids.append(document_id)
+            self.rows[document_id] = row
+        self.vectors[row] = vector
+    
+    def get(self, document_id: str) -> Optional[List[float]]:
+        """Get the stored embedding of a document."""
+        row = self.rows.get(document_id)
+        return self.vectors[row].tolist() if row is not None else None
+    
+    def delete(self, document_id: str) -> None:
+        """Remove the embedding of a document."""
+        row = self.rows.pop(document_id, None)
+        if row is None:
+            return
+        
+        last = len(self.ids) - 1
+        if row != last:
+            self.vectors[row] = self.vectors[last]
+            self.ids[row] = self.ids[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+    
+    def search(self, embedding: List[float], limit: int, exclude_ids: List[str] = None) -> List[str]:
+        """
+        Find the documents whose embeddings are most similar to the given one.
+        
+        Args:
+            embedding: The embedding to compare with.
+            limit: The maximum number of documents to return.
+            exclude_ids: Documents to leave out.
+        
+        Returns:
+            The IDs of the most similar documents, most similar first.
+        """
+        if not self.ids or limit <= 0:
+            return []
+        
+        scores = self.vectors[:len(self.ids)] @ self._normalize(embedding)
+        for document_id in exclude_ids or []:
+            row = self.rows.get(document_id)
+            if row is not None:
+                scores[row] = -np.inf
+        
+        limit = min(limit, len(self.ids))
+        # Partial sort: only the top rows are ordered
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [self.ids[row] for row in top if scores[row] != -np.inf]
+    
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
 
 class DocumentServiceMock:
     """Mock service for document operations."""
     
     def __init__(self):
         """Initialize the mock document service."""
-        print("Initialized Mock Document Service")
-        # Use an in-memory dictionary to store documents
+        logger.info("Initialized Mock Document Service")
+        # Use an in-memory dictionary to store documents; their embeddings live in the index
         self.documents = {}
+        self.index = VectorIndexMock()
+        # Typeahead suggestions; the in-memory store starts empty, so there is nothing to load
+        self.suggestions = SuggestionIndex(SUGGEST_MAX_RESULTS, SUGGEST_RECENCY_DAYS * 86400)
+        
+        self.firestore_faults = FaultInjector(
+            "firestore", MOCK_FIRESTORE_LATENCY_MS, error_rate=MOCK_FIRESTORE_ERROR_RATE, seed=MOCK_FAULT_SEED
+        )
+        self.vector_search_faults = FaultInjector(
+            "vector_search", MOCK_VECTOR_SEARCH_LATENCY_MS, error_rate=MOCK_VECTOR_SEARCH_ERROR_RATE,
+            seed=MOCK_FAULT_SEED,
+        )
+    
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "documents": len(self.documents),
+            "indexed": len(self.index),
+            "suggestions": self.suggestions.stats(),
+            "faults": {
+                "firestore": self.firestore_faults.stats(),
+                "vector_search": self.vector_search_faults.stats(),
+            },
+        }
     
     async def create_document(self, document: DocumentCreate, embedding: List[float]) -> Document:
         """Create a new document."""
@@ -27,69 +146,124 @@ class DocumentServiceMock:
             title=document.title,
             url=document.url,
             summary=document.summary,
-            metadata=document.metadata,
+            metadata=self._tag_embedding(document.metadata, embedding),
             tags=document.tags,
             category=document.category,
             embedding=embedding,
             author=document.author,
-            date=document.date or datetime.now(),
+            date=document.date or datetime.now().isoformat(),
         )
         
         # Save to in-memory storage
-        self.documents[doc.id] = doc.dict()
+        with span("store"):
+            await self.firestore_faults.call()
+            self.documents[doc.id] = doc.dict(exclude={"embedding"})
+        self.suggestions.add(doc.id, doc.title, doc.tags, doc.category, doc.date)
         
-        print(f"Created document: {doc.id} - {doc.title}")
+        await self._index_embedding(doc.id, embedding)
+        
+        logger.debug(f"Created document: {doc.id} - {doc.title}")
         return doc
     
     async def get_document(self, document_id: str) -> Optional[Document]:
         """Get a document by ID."""
-        if document_id not in self.documents:
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            if document_id not in self.documents:
+                return None
+            return self._to_document(document_id)
+    
+    async def get_documents(
+        self, document_ids: List[str], field_paths: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Get many documents in a single read."""
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            found = {}
+            for document_id in document_ids:
+                if document_id not in self.documents:
+                    continue
+                doc_data = {**self.documents[document_id], "embedding": self.index.get(document_id) or []}
+                if field_paths is not None:
+                    doc_data = {field: doc_data[field] for field in field_paths if field in doc_data}
+                found[document_id] = doc_data
+            return found
+    
+    async def get_document_version(self, document_id: str) -> Optional[int]:
+        """Get the version of a document without reading the rest of it."""
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            doc_data = self.documents.get(document_id)
+            return doc_data["version"] if doc_data is not None else None
+    
+    async def find_document_by_url(self, url: str) -> Optional[Document]:
+        """Find a document by URL."""
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            for document_id, doc_data in self.documents.items():
+                if doc_data.get("url") == url:
+                    return self._to_document(document_id)
             return None
-        
-        return Document(**self.documents[document_id])
     
     async def update_document(
         self, document_id: str, document_update: DocumentUpdate, embedding: Optional[List[float]] = None
     ) -> Document:
         """Update a document."""
-        if document_id not in self.documents:
-            return None
-        
-        # Get the current document
-        current_doc = Document(**self.documents[document_id])
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            if document_id not in self.documents:
+                return None
+            current_doc = self.documents[document_id]
         
         # Update the document
         update_data = document_update.dict(exclude_unset=True)
         
         # If embedding is provided, update it
         if embedding:
-            update_data["embedding"] = embedding
+            update_data["metadata"] = self._tag_embedding(
+                update_data.get("metadata") or current_doc["metadata"], embedding
+            )
+            await self._index_embedding(document_id, embedding)
         
         # Increment the version
-        update_data["version"] = current_doc.version + 1
+        update_data["version"] = current_doc["version"] + 1
         
         # Update the document
-        self.documents[document_id].update(update_data)
+        with span("store"):
+            await self.firestore_faults.call()
+            current_doc.update(update_data)
         
-        print(f"Updated document: {document_id}")
-        return Document(**self.documents[document_id])
+        logger.debug(f"Updated document: {document_id}")
+        result = self._to_document(document_id)
+        self.suggestions.add(document_id, result.title, result.tags, result.category, result.date)
+        return result
     
     async def delete_document(self, document_id: str) -> None:
         """Delete a document."""
-        if document_id in self.documents:
-            del self.documents[document_id]
-            print(f"Deleted document: {document_id}")
+        with span("store"):
+            await self.firestore_faults.call()
+            if document_id in self.documents:
+                del self.documents[document_id]
+                logger.debug(f"Deleted document: {document_id}")
+        self.suggestions.remove(document_id)
+        
+        with span("vector_write"):
+            self.index.delete(document_id)
     
     async def semantic_search(
         self, query_embedding: List[float], limit: int = 10, offset: int = 0
     ) -> List[Document]:
-        """
-        Perform semantic search using the query embedding.
-        For mock purposes, just return some documents.
-        """
-        # For simplicity, just return some documents
-        docs = list(self.documents.values())
-        return [Document(**doc) for doc in docs[offset:offset+limit]]
+        """Perform semantic search using the query embedding."""
+        try:
+            with span("vector_search"):
+                await self.vector_search_faults.call()
+                similar_doc_ids = self.index.search(query_embedding, limit + offset)
+        except Exception as e:
+            # Like the real service, a failed vector search returns no results
+            logger.warning(f"Failed to perform semantic search: {e}")
+            return []
+        
+        return await self._hydrate(similar_doc_ids[offset:])
     
     async def full_text_search(
         self, query: str, limit: int = 10, offset: int = 0
@@ -98,19 +272,22 @@ class DocumentServiceMock:
         Perform full-text search.
         For mock purposes, just return documents that contain the query.
         """
-        matching_docs = []
+        matching_ids = []
+        query = query.lower()
         
-        for doc_id, doc_data in self.documents.items():
-            # Check if query is in content, title, or summary
-            if (query.lower() in doc_data.get("content", "").lower() or
-                query.lower() in doc_data.get("title", "").lower() or
-                query.lower() in doc_data.get("summary", "").lower()):
-                matching_docs.append(Document(**doc_data))
-                
-                if len(matching_docs) >= limit + offset:
-                    break
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            for doc_id, doc_data in self.documents.items():
+                # Check if query is in content, title, or summary
+                if (query in doc_data.get("content", "").lower() or
+                    query in doc_data.get("title", "").lower() or
+                    query in (doc_data.get("summary") or "").lower()):
+                    matching_ids.append(doc_id)
+                    
+                    if len(matching_ids) >= limit + offset:
+                        break
         
-        return matching_docs[offset:offset+limit]
+        return [self._to_document(doc_id) for doc_id in matching_ids[offset:offset+limit]]
     
     async def get_recent_documents(
         self, limit: int = 10, offset: int = 0
@@ -118,26 +295,50 @@ class DocumentServiceMock:
         """
         Get the most recent documents.
         """
-        # Convert to list of Document objects
-        docs = [Document(**doc) for doc in self.documents.values()]
+        with span("firestore_read"):
+            await self.firestore_faults.call()
+            # Only the requested page is sorted and converted to documents
+            recent_ids = heapq.nlargest(
+                limit + offset, self.documents, key=lambda doc_id: self.documents[doc_id]["date"]
+            )
         
-        # Sort by date
-        docs.sort(key=lambda x: x.date, reverse=True)
-        
-        return docs[offset:offset+limit]
+        return [self._to_document(doc_id) for doc_id in recent_ids[offset:]]
     
     async def find_similar_documents(
         self, embedding: List[float], limit: int = 10, exclude_ids: List[str] = None
     ) -> List[Document]:
-        """
-        Find documents similar to the given embedding.
-        For mock purposes, just return some documents.
-        """
-        # For simplicity, just return some documents
-        docs = list(self.documents.values())
+        """Find documents similar to the given embedding."""
+        try:
+            with span("vector_search"):
+                await self.vector_search_faults.call()
+                similar_doc_ids = self.index.search(embedding, limit, exclude_ids=exclude_ids)
+        except Exception as e:
+            logger.warning(f"Failed to find similar documents: {e}")
+            return []
         
-        # Filter out excluded IDs
-        if exclude_ids:
-            docs = [doc for doc in docs if doc["id"] not in exclude_ids]
-        
-        return [Document(**doc) for doc in docs[:limit]]
+        return await self._hydrate(similar_doc_ids)
+    
+    async def _index_embedding(self, document_id: str, embedding: List[float]) -> None:
+        """Add an embedding to the vector index. Like the real service, failures only log a warning."""
+        try:
+            with span("vector_write"):
+                await self.vector_search_faults.call()
+                self.index.upsert(document_id, embedding)
+        except Exception as e:
+            logger.warning(f"Failed to add embedding to the vector index: {e}")
+    
+    async def _hydrate(self, document_ids: List[str]) -> List[Document]:
+        """Get the documents found by a vector search in one read, as the real service does."""
+        with span("hydrate"):
+            found = await self.get_documents(document_ids)
+        return [Document.from_storage(found[doc_id]) for doc_id in document_ids if doc_id in found]
+    
+    def _to_document(self, document_id: str) -> Document:
+        return Document.from_storage({**self.documents[document_id], "embedding": self.index.get(document_id) or []})
+    
+    def _tag_embedding(self, metadata: Dict[str, Any], embedding: List[float]) -> Dict[str, Any]:
+        """Record the provider and model of the embedding in the document metadata, as the real service does."""
+        provider = getattr(embedding, "provider", None)
+        if provider is None:
+            return metadata
+        return {**metadata, "embedding_provider": provider, "embedding_model": getattr(embedding, "model", None)}
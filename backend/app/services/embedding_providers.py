@@ -0,0 +1,231 @@
+"""
+Embedding provider clients.
+Each provider wraps one embedding backend behind the same async embed() interface.
+The Vertex AI provider owns a long-lived model handle that is created once, warmed up
+with a probe request at startup, and shared by all requests and worker threads.
+"""
+
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as api_exceptions
+from google.auth import exceptions as auth_exceptions
+from google.cloud import aiplatform
+from vertexai.language_models import TextEmbeddingModel
+
+from app.core.log import get_logger
+
+logger = get_logger(__name__)
+
+# Errors after which the model handle and its credentials are created again
+CREDENTIAL_ERRORS = (
+    auth_exceptions.RefreshError,
+    auth_exceptions.TransportError,
+    api_exceptions.Unauthenticated,
+)
+
+# Text embedded by the warm-up probe
+PROBE_TEXT = "warm-up"
+
+class VertexEmbeddingProvider:
+    """Generates embeddings with a Vertex AI text embedding model."""
+
+    name = "vertex"
+
+    def __init__(self, model_name: str, project: Optional[str], location: str):
+        """
+        Initialize the provider. The model handle is created on first use or by warm_up().
+
+        Args:
+            model_name: The name of the Vertex AI text embedding model.
+            project: The Google Cloud project.
+            location: The Google Cloud region.
+        """
+        self.model_name = model_name
+        self.project = project
+        self.location = location
+
+        self._model: Optional[TextEmbeddingModel] = None
+        self._lock = threading.Lock()
+
+        self.model_version: Optional[str] = None
+        self.created_at: Optional[float] = None
+        self.warmed_up = False
+        self.probe_latency: Optional[float] = None
+        self.refreshes = 0
+
+    async def warm_up(self) -> None:
+        """Create the model handle and send a probe request, so the first real request is fast."""
+        start = time.perf_counter()
+        await self.embed([PROBE_TEXT])
+        self.probe_latency = time.perf_counter() - start
+        self.warmed_up = True
+        logger.info(
+            "Warmed up Vertex AI embedding model",
+            extra={
+                "model": self.model_name,
+                "model_version": self.model_version,
+                "probe_ms": round(self.probe_latency * 1000, 1),
+            },
+        )
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings without blocking the event loop.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            One embedding per text.
+        """
+        return await asyncio.to_thread(self._embed, texts)
+
+    def describe(self) -> Dict[str, Any]:
+        """Get the model the provider is bound to and its warm-up state."""
+        return {
+            "provider": self.name,
+            "model": self.model_name,
+            "model_version": self.model_version,
+            "warmed_up": self.warmed_up,
+            "probe_ms": round(self.probe_latency * 1000, 1) if self.probe_latency is not None else None,
+            "refreshes": self.refreshes,
+        }
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings, recreating the model handle once if the credentials have expired."""
+        try:
+            return self._get_embeddings(self._get_model(), texts)
+        except CREDENTIAL_ERRORS as e:
+            logger.warning(f"Vertex AI credentials rejected, refreshing the model handle: {e}")
+            self._refresh()
+            return self._get_embeddings(self._get_model(), texts)
+
+    def _get_embeddings(self, model: TextEmbeddingModel, texts: List[str]) -> List[List[float]]:
+        return [embedding.values for embedding in model.get_embeddings(texts)]
+
+    def _get_model(self) -> TextEmbeddingModel:
+        """Get the shared model handle, creating it on first use."""
+        model = self._model
+        if model is not None:
+            return model
+
+        with self._lock:
+            if self._model is None:
+                self._model = self._create_model()
+            return self._model
+
+    def _create_model(self) -> TextEmbeddingModel:
+        """Resolve the model and record the version it is bound to. Must be called with the lock held."""
+        model = TextEmbeddingModel.from_pretrained(self.model_name)
+        # The resource name pins the publisher model version, e.g. .../models/text-embedding-004
+        self.model_version = getattr(model, "_model_resource_name", None) or self.model_name
+        self.created_at = time.time()
+        logger.info(
+            "Created Vertex AI embedding model handle",
+            extra={"model": self.model_name, "model_version": self.model_version},
+        )
+        return model
+
+    def _refresh(self) -> None:
+        """Drop the model handle and re-initialize Vertex AI, which loads fresh credentials."""
+        with self._lock:
+            self._model = None
+            self.refreshes += 1
+            aiplatform.init(project=self.project, location=self.location)
+
+class GenAIEmbeddingProvider:
+    """Generates embeddings with the Google Generative AI API."""
+
+    name = "genai"
+
+    def __init__(self, model_name: str):
+        """
+        Initialize the provider.
+
+        Args:
+            model_name: The name of the embedding model, with or without the "models/" prefix.
+        """
+        # Ensure model name is correctly formatted
+        if not model_name.startswith("models/") and not model_name.startswith("tunedModels/"):
+            model_name = f"models/{model_name}"
+        self.model_name = model_name
+        self.model_version = model_name
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings without blocking the event loop.
+
+        Args:
+            texts: The texts to embed.
+
+        Returns:
+            One embedding per text.
+        """
+        return [await asyncio.to_thread(self._embed_one, text) for text in texts]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model_name}
+
+    def _embed_one(self, text: str) -> List[float]:
+        result = genai.embed_content(
+            model=self.model_name,
+            content=text,
+            task_type="retrieval_document",
+        )
+
+        # The result is a dictionary with an 'embedding' key, or has an embedding attribute
+        if isinstance(result, dict) and 'embedding' in result:
+            return result['embedding']
+        if hasattr(result, "embedding"):
+            return result.embedding
+        raise ValueError("Result does not have expected embedding format")
+
+class DeterministicEmbeddingProvider:
+    """
+    Derives a pseudo-random unit vector from a hash of the text.
+
+    The same text always gets the same embedding, but the vectors carry no meaning.
+    This is the last resort when no real provider is available.
+    """
+
+    name = "deterministic"
+
+    def __init__(self, dimensions: int = 768):
+        """
+        Initialize the provider.
+
+        Args:
+            dimensions: The size of the embeddings, matching the Vector Search index.
+        """
+        self.dimensions = dimensions
+        self.model_name = f"sha256-{dimensions}d"
+        self.model_version = self.model_name
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+    def describe(self) -> Dict[str, Any]:
+        return {"provider": self.name, "model": self.model_name}
+
+    def _embed_one(self, text: str) -> List[float]:
+        # Use a hash of the text as a seed for random number generation
+        # This ensures deterministic but unique embeddings for different texts
+        text_hash = int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16) % 10**8
+        rng = random.Random(text_hash)
+
+        # Generate a random embedding
+        embedding = [rng.uniform(-1, 1) for _ in range(self.dimensions)]
+
+        # Normalize the embedding to unit length
+        magnitude = sum(x**2 for x in embedding) ** 0.5
+        if magnitude > 0:
+            return [x/magnitude for x in embedding]
+
+        # Fallback if magnitude is zero
+        return [0.0] * self.dimensions
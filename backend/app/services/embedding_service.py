@@ -1,14 +1,66 @@
-from typing import List
-import random
-import hashlib
+from typing import Any, Dict, List, Optional
+import time
 import google.generativeai as genai
 from google.cloud import aiplatform
-from vertexai.language_models import TextEmbeddingModel
 
+from app.core.circuit_breaker import CircuitBreaker, LatencyTracker
 from app.core.config import (
     GOOGLE_API_KEY, EMBEDDING_MODEL, GOOGLE_CLOUD_PROJECT,
-    GOOGLE_CLOUD_REGION, VERTEX_AI_EMBEDDING_ENDPOINT
+    GOOGLE_CLOUD_REGION, VERTEX_AI_EMBEDDING_ENDPOINT,
+    EMBEDDING_BREAKER_FAILURE_THRESHOLD, EMBEDDING_BREAKER_RESET_TIMEOUT,
+    EMBEDDING_SLOW_THRESHOLD, EMBEDDING_QUOTA_PER_MINUTE, EMBEDDING_QUOTA_BURST,
+    QUOTA_BACKGROUND_RESERVE, QUOTA_INTERACTIVE_MAX_WAIT, QUOTA_BACKGROUND_MAX_WAIT,
+    QUOTA_BACKGROUND_MAX_QUEUE
 )
+from app.core.log import get_logger
+from app.core.scheduler import QuotaExceededError, QuotaScheduler
+from app.core.tracing import span
+from app.models.embedding import Embedding, EmbeddingUnavailableError
+from app.services.embedding_providers import (
+    DeterministicEmbeddingProvider, GenAIEmbeddingProvider, VertexEmbeddingProvider
+)
+
+logger = get_logger(__name__)
+
+# Size of the embeddings, matching the Vector Search index
+EMBEDDING_DIMENSIONS = 768
+
+# Weight of the newest observation in the per-provider latency averages
+LATENCY_EWMA_ALPHA = 0.2
+
+class ProviderRoute:
+    """An embedding provider together with its circuit breaker, latency average and quota."""
+    
+    def __init__(self, provider: Any, fallback: bool = False):
+        self.provider = provider
+        self.fallback = fallback
+        self.breaker = CircuitBreaker(
+            provider.name,
+            failure_threshold=EMBEDDING_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=EMBEDDING_BREAKER_RESET_TIMEOUT,
+        )
+        self.latency = LatencyTracker(alpha=LATENCY_EWMA_ALPHA)
+        
+        # The local fallback has no quota
+        self.scheduler = None
+        if not fallback:
+            self.scheduler = QuotaScheduler(
+                provider.name,
+                requests_per_minute=EMBEDDING_QUOTA_PER_MINUTE,
+                burst=EMBEDDING_QUOTA_BURST,
+                background_reserve=QUOTA_BACKGROUND_RESERVE,
+                interactive_max_wait=QUOTA_INTERACTIVE_MAX_WAIT,
+                background_max_wait=QUOTA_BACKGROUND_MAX_WAIT,
+                background_max_queue=QUOTA_BACKGROUND_MAX_QUEUE,
+            )
+    
+    @property
+    def name(self) -> str:
+        return self.provider.name
+    
+    def is_slow(self) -> bool:
+        """Check whether the provider has recently been slower than the configured threshold."""
+        return self.latency.value is not None and self.latency.value > EMBEDDING_SLOW_THRESHOLD
 
 class EmbeddingService:
     """Service for generating and managing embeddings."""
@@ -34,89 +86,154 @@ class EmbeddingService:
             # Use the model name from the environment variable or default to a known good model
             self.vertex_embedding_model_name = "text-embedding-004"  # Use a model we know is available
             
-            print(f"Using Vertex AI embedding model: {self.vertex_embedding_model_name}")
+            # The model handle is created once and shared by all requests
+            self.vertex_provider = VertexEmbeddingProvider(
+                self.vertex_embedding_model_name, GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_REGION
+            )
+            
+            logger.info(f"Using Vertex AI embedding model: {self.vertex_embedding_model_name}")
             
         except Exception as e:
-            print(f"Failed to initialize Vertex AI: {e}")
+            logger.warning(f"Failed to initialize Vertex AI: {e}")
             self.vertex_ai_initialized = False
+            self.vertex_provider = None
+        
+        # Providers in order of preference. Vertex AI comes first so that documents and
+        # search queries end up in the same vector space as the Vector Search index.
+        self.routes: List[ProviderRoute] = []
+        if self.vertex_provider is not None:
+            self.routes.append(ProviderRoute(self.vertex_provider))
+        if GOOGLE_API_KEY:
+            self.routes.append(ProviderRoute(GenAIEmbeddingProvider(self.embedding_model)))
+        self.routes.append(ProviderRoute(DeterministicEmbeddingProvider(EMBEDDING_DIMENSIONS), fallback=True))
+    
+    async def warm_up(self) -> None:
+        """Create the Vertex AI model handle and send a probe request before the first real request."""
+        if self.vertex_provider is not None:
+            await self.vertex_provider.warm_up()
+    
+    @property
+    def model_version(self) -> str:
+        """Get the version of the preferred embedding model."""
+        return self.routes[0].provider.model_version or self.routes[0].provider.model_name
+    
+    def describe(self) -> Dict[str, Any]:
+        """Get the preferred embedding model and the state of every provider."""
+        info = self.routes[0].provider.describe()
+        info["providers"] = self.get_provider_stats()
+        return info
+    
+    def get_provider_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get the circuit breaker state, latency average and quota of every provider."""
+        stats = {}
+        for route in self.routes:
+            provider_stats = route.breaker.stats()
+            provider_stats["latency_seconds"] = route.latency.value
+            provider_stats["calls"] = route.latency.count
+            if route.scheduler is not None:
+                provider_stats["quota"] = route.scheduler.stats()
+            stats[route.name] = provider_stats
+        return stats
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    async def generate_embedding(self, text: str, provider: Optional[str] = None) -> Embedding:
         """
         Generate an embedding for the given text.
         
+        Providers are tried in order of preference. Providers whose circuit breaker
+        is open are skipped, and providers that have recently been slow are tried
+        after the others. Calls wait for the quota of their provider, where
+        interactive requests go before background work, see app.core.scheduler.
+        
         Args:
             text: The text to generate an embedding for.
+            provider: Only use this provider, e.g. because the embedding is compared
+                with vectors that it produced.
             
         Returns:
-            A list of floats representing the embedding.
+            The embedding, tagged with the provider and model that produced it.
+            
+        Raises:
+            EmbeddingUnavailableError: If no allowed provider could produce an embedding.
+            QuotaExceededError: If the work was shed because the provider quotas are
+                exhausted. Shed work does not fall back to deterministic embeddings,
+                so it can be retried later with real ones.
         """
-        # IMPORTANT: Always use Vertex AI for consistency
-        # This ensures that all embeddings (both for documents and search queries)
-        # are in the same vector space, which is essential for semantic search to work correctly.
-        # Using different embedding models for different texts can result in embeddings
-        # that are not comparable, causing semantic search to fail.
-        
-        # Use Vertex AI if initialized
-        if self.vertex_ai_initialized:
-            try:
-                print(f"Using Vertex AI for embedding generation (for consistency)")
-                # Use Vertex AI Text Embedding Model with a model we know is available
-                model = TextEmbeddingModel.from_pretrained(self.vertex_embedding_model_name)
-                embeddings = model.get_embeddings([text])
-                if embeddings and len(embeddings) > 0 and embeddings[0].values:
-                    print("Successfully generated embedding using Vertex AI")
-                    # Resize the embedding to 768 dimensions
-                    return self._resize_embedding(embeddings[0].values, 768)
-            except Exception as e:
-                print(f"Failed to generate embedding using Vertex AI: {e}")
-                
-                # If we get a permission error, provide more helpful information
-                if "Permission" in str(e) and "denied" in str(e):
-                    print("\nPermission error detected. Please ensure that:")
-                    print("1. The service account has the 'Vertex AI User' role")
-                    print("2. The Vertex AI API is enabled for your project")
-                    print("3. The credentials file is correctly configured")
-                    print("4. The project has billing enabled\n")
-        
-        # Fall back to Google Generative AI API if Vertex AI fails or is not initialized
-        if GOOGLE_API_KEY:
+        with span("embed"):
+            return await self._generate_embedding(text, provider)
+    
+    async def _generate_embedding(self, text: str, provider: Optional[str] = None) -> Embedding:
+        """Generate an embedding with the first healthy provider."""
+        shed: Optional[QuotaExceededError] = None
+        for route in self._plan_routes(provider):
+            if route.fallback and shed is not None:
+                break
+            
+            if not route.breaker.allow_request():
+                continue
+            
             try:
-                print(f"Falling back to Google Generative AI API for embedding generation")
+                if route.scheduler is not None:
+                    try:
+                        await route.scheduler.acquire()
+                    except QuotaExceededError as e:
+                        # The breaker let a call through that is not going to happen
+                        route.breaker.release()
+                        logger.warning(str(e), extra={"provider": route.name})
+                        shed = e
+                        continue
                 
-                if hasattr(genai, "embed_content"):
-                    # Ensure model name is correctly formatted
-                    model_name = self.embedding_model
-                    if not model_name.startswith("models/") and not model_name.startswith("tunedModels/"):
-                        model_name = f"models/{model_name}"
-                    
-                    print(f"Using model name: {model_name}")
-                    
-                    result = genai.embed_content(
-                        model=model_name,
-                        content=text,
-                        task_type="retrieval_document",
+                start = time.perf_counter()
+                try:
+                    embeddings = await route.provider.embed([text])
+                    if not embeddings or not embeddings[0]:
+                        raise ValueError("Empty embedding")
+                except Exception as e:
+                    route.breaker.record_failure()
+                    logger.warning(
+                        f"Failed to generate embedding using {route.name}: {e}",
+                        extra={"provider": route.name, "breaker": route.breaker.state},
                     )
-                    
-                    # Check if result is a dictionary with an 'embedding' key
-                    if isinstance(result, dict) and 'embedding' in result:
-                        print("Successfully generated embedding using Google Generative AI API")
-                        # Resize the embedding to 768 dimensions
-                        return self._resize_embedding(result['embedding'], 768)
-                    # Check if result has an embedding attribute
-                    elif hasattr(result, "embedding"):
-                        print("Successfully generated embedding using Google Generative AI API")
-                        # Resize the embedding to 768 dimensions
-                        return self._resize_embedding(result.embedding, 768)
-                    else:
-                        print("Result does not have expected embedding format")
-            except Exception as e:
-                print(f"Failed to generate embedding using Google Generative AI API: {e}")
-                import traceback
-                traceback.print_exc()
+                
+                    # If we get a permission error, provide more helpful information
+                    if "Permission" in str(e) and "denied" in str(e):
+                        logger.warning(
+                            "Permission error detected. Please ensure that the service account has the "
+                            "'Vertex AI User' role, the Vertex AI API is enabled for your project, the "
+                            "credentials file is correctly configured and the project has billing enabled"
+                        )
+                    continue
+            except BaseException:
+                # Cancelled before the call had an outcome, e.g. when the client went away;
+                # free the probe a half-open breaker let through, or it would stay closed to calls
+                route.breaker.release()
+                raise
+            
+            route.breaker.record_success()
+            route.latency.observe(time.perf_counter() - start)
+            
+            if route.fallback:
+                logger.warning("Generated deterministic embedding based on text content")
+            
+            # Resize the embedding to the dimensions of the Vector Search index
+            values = self._resize_embedding(embeddings[0], EMBEDDING_DIMENSIONS)
+            return Embedding(values, provider=route.name, model=route.provider.model_version)
+        
+        if shed is not None:
+            raise shed
+        
+        raise EmbeddingUnavailableError(
+            f"No embedding provider available{f' (requested {provider})' if provider else ''}"
+        )
+    
+    def _plan_routes(self, provider: Optional[str] = None) -> List[ProviderRoute]:
+        """Order the providers to try: healthy and fast ones first, slow ones after, the fallback last."""
+        if provider is not None:
+            return [route for route in self.routes if route.name == provider]
         
-        # If all else fails, generate a deterministic embedding based on the text content
-        print("WARNING: Generating deterministic embedding based on text content")
-        return self._create_deterministic_embedding(text)
+        preferred = [route for route in self.routes if not route.fallback and not route.is_slow()]
+        slow = [route for route in self.routes if not route.fallback and route.is_slow()]
+        fallback = [route for route in self.routes if route.fallback]
+        return preferred + slow + fallback
     
     def _resize_embedding(self, embedding: List[float], target_size: int) -> List[float]:
         """
@@ -139,39 +256,9 @@ class EmbeddingService:
             return embedding
         elif current_size < target_size:
             # Pad with zeros
-            print(f"Padding embedding from {current_size} to {target_size} dimensions")
+            logger.debug(f"Padding embedding from {current_size} to {target_size} dimensions")
             return embedding + [0.0] * (target_size - current_size)
         else:
             # Truncate
-            print(f"Truncating embedding from {current_size} to {target_size} dimensions")
+            logger.debug(f"Truncating embedding from {current_size} to {target_size} dimensions")
             return embedding[:target_size]
-    
-    def _create_deterministic_embedding(self, text: str) -> List[float]:
-        """
-        Create a deterministic embedding based on the text content.
-        This ensures that the same text always gets the same embedding,
-        which is important for semantic search functionality.
-        
-        Args:
-            text: The text to generate an embedding for.
-            
-        Returns:
-            A list of floats representing the embedding.
-        """
-        # Use a hash of the text as a seed for random number generation
-        # This ensures deterministic but unique embeddings for different texts
-        text_hash = int(hashlib.sha256(text.encode('utf-8')).hexdigest(), 16) % 10**8
-        random.seed(text_hash)
-        
-        # Generate a random embedding
-        embedding_size = 768  # Match the dimension of the Vector Search index
-        embedding = [random.uniform(-1, 1) for _ in range(embedding_size)]
-        
-        # Normalize the embedding to unit length
-        magnitude = sum(x**2 for x in embedding) ** 0.5
-        if magnitude > 0:
-            normalized_embedding = [x/magnitude for x in embedding]
-            return normalized_embedding
-        
-        # Fallback if magnitude is zero
-        return [0.0] * embedding_size  # 768 dimensions
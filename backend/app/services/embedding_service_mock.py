@@ -1,37 +1,130 @@
 """
 Mock embedding service for testing purposes.
-Returns dummy embeddings instead of calling Google Vertex AI.
+Embeds texts locally by feature hashing instead of calling Google Vertex AI, so that
+texts sharing words get similar embeddings and semantic search returns meaningful results.
 """
 
-from typing import List
-import random
+import hashlib
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    MOCK_FAULT_SEED, MOCK_EMBEDDING_LATENCY_MS, MOCK_EMBEDDING_ERROR_RATE, MOCK_EMBEDDING_QUOTA_RATE
+)
+from app.core.log import get_logger
+from app.core.tracing import span
+from app.models.embedding import Embedding, EmbeddingUnavailableError
+from app.services.fault_injection import FaultInjector, InjectedFaultError
+
+logger = get_logger(__name__)
+
+# Size of the embeddings, matching the Vector Search index
+EMBEDDING_DIMENSIONS = 768
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class FeatureHashingEmbedder:
+    """
+    Embeds texts by hashing their words and word pairs into a fixed number of dimensions.
+    
+    Each feature adds a +1 or -1, weighted by its log term frequency, to the dimension
+    its hash selects, and the result is normalized to unit length. The cosine similarity
+    of two embeddings then approximates the overlap of their vocabularies. Hashes are
+    stable across processes, unlike hash().
+    """
+    
+    def __init__(self, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.model_name = f"feature-hashing-{dimensions}d"
+    
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed a text.
+        
+        Args:
+            text: The text to embed.
+        
+        Returns:
+            A float32 unit vector, or a zero vector if the text has no words.
+        """
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = Counter(tokens)
+        features.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+        
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if not features:
+            return vector
+        
+        indices = np.empty(len(features), dtype=np.int64)
+        weights = np.empty(len(features), dtype=np.float32)
+        for i, (feature, count) in enumerate(features.items()):
+            index, sign = self._hash(feature)
+            indices[i] = index
+            weights[i] = sign * (1 + math.log(count))
+        np.add.at(vector, indices, weights)
+        
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+    
+    @lru_cache(maxsize=200_000)
+    def _hash(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dimensions, 1.0 if digest >> 63 else -1.0
 
 class EmbeddingServiceMock:
     """Mock service for generating and managing embeddings."""
     
+    provider_name = "mock"
+    
     def __init__(self):
         """Initialize the mock embedding service."""
-        print("Initialized Mock Embedding Service")
+        self.embedder = FeatureHashingEmbedder(EMBEDDING_DIMENSIONS)
+        self.faults = FaultInjector(
+            "embedding",
+            MOCK_EMBEDDING_LATENCY_MS,
+            error_rate=MOCK_EMBEDDING_ERROR_RATE,
+            quota_rate=MOCK_EMBEDDING_QUOTA_RATE,
+            seed=MOCK_FAULT_SEED,
+        )
+        logger.info("Initialized Mock Embedding Service")
+    
+    @property
+    def model_version(self) -> str:
+        return self.embedder.model_name
     
-    async def generate_embedding(self, text: str) -> List[float]:
+    def describe(self) -> Dict[str, Any]:
+        return {"provider": self.provider_name, "model": self.embedder.model_name, "faults": self.faults.stats()}
+    
+    async def generate_embedding(self, text: str, provider: Optional[str] = None) -> Embedding:
         """
         Generate a mock embedding for the given text.
         
         Args:
             text: The text to generate an embedding for.
-            
+            provider: Only use this provider, as for the real service. The mock only
+                knows itself and accepts the name of any real provider in its place.
+        
         Returns:
-            A list of floats representing the mock embedding.
+            The embedding, tagged with the mock provider and model.
+        
+        Raises:
+            EmbeddingUnavailableError: If an injected fault made the call fail.
+            QuotaExceededError: If an injected quota rejection made the call fail.
         """
-        # Generate a deterministic but unique embedding based on the text
-        # This ensures that the same text always gets the same embedding
-        random.seed(hash(text))
-        embedding_size = 768  # Common embedding dimension
-        mock_embedding = [random.uniform(-1, 1) for _ in range(embedding_size)]
-        
-        # Normalize the embedding
-        magnitude = sum(x**2 for x in mock_embedding) ** 0.5
-        normalized_embedding = [x/magnitude for x in mock_embedding]
-        
-        print(f"Generated mock embedding for text: {text[:50]}...")
-        return normalized_embedding
+        with span("embed"):
+            try:
+                await self.faults.call()
+            except InjectedFaultError as e:
+                raise EmbeddingUnavailableError(str(e)) from e
+            
+            values = self.embedder.embed(text).tolist()
+        
+        logger.debug(f"Generated mock embedding for text: {text[:50]}...")
+        return Embedding(values, provider=self.provider_name, model=self.embedder.model_name)
@@ -0,0 +1,109 @@
+"""
+Latency and fault injection for the mock services.
+Each mock service calls its injector where the real service would call Vertex AI,
+Gemini, Firestore or a web server, so that timeouts, retries, fallbacks and tail
+latency can be exercised offline. Injectors are configured with the MOCK_* settings
+and do nothing by default.
+"""
+
+import asyncio
+import math
+import random
+from typing import Any, Dict, Optional
+
+from app.core.scheduler import QuotaExceededError
+
+# z-score of the 99th percentile of the standard normal distribution
+Z_P99 = 2.326
+
+class InjectedFaultError(Exception):
+    """Raised by a mock service to simulate a failed call to its backend."""
+    pass
+
+class FaultInjector:
+    """Delays calls by a random latency and fails a fraction of them."""
+
+    def __init__(
+        self,
+        name: str,
+        latency_ms: str = "0",
+        error_rate: float = 0.0,
+        quota_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        """
+        Initialize the fault injector.
+
+        Args:
+            name: The name of the simulated backend, used in errors.
+            latency_ms: The median latency in milliseconds, optionally followed by the
+                99th percentile, e.g. "40,400". Latencies follow a log-normal distribution
+                through both points; a single value gives a constant latency.
+            error_rate: The fraction of calls that fail with InjectedFaultError.
+            quota_rate: The fraction of calls that are rejected with QuotaExceededError.
+            seed: Seed for reproducible runs.
+        """
+        self.name = name
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.rng = random.Random(f"{seed}:{name}") if seed is not None else random.Random()
+
+        median, _, p99 = latency_ms.partition(",")
+        self.median = float(median) / 1000
+        self.p99 = float(p99) / 1000 if p99 else self.median
+        if self.p99 < self.median:
+            raise ValueError(f"The 99th percentile latency of {name} is below its median")
+        # Log-normal sigma that puts the 99th percentile at the configured value
+        self.sigma = math.log(self.p99 / self.median) / Z_P99 if self.median > 0 else 0.0
+
+        self.calls = 0
+        self.errors = 0
+        self.quota_rejections = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.median > 0 or self.error_rate > 0 or self.quota_rate > 0
+
+    def sample_latency(self) -> float:
+        """Draw a latency, in seconds."""
+        if self.median <= 0:
+            return 0.0
+        if self.sigma == 0:
+            return self.median
+        return self.rng.lognormvariate(math.log(self.median), self.sigma)
+
+    async def call(self) -> None:
+        """
+        Simulate a call to the backend: wait for a random latency, then maybe fail.
+
+        Raises:
+            QuotaExceededError: If the call is rejected as over quota.
+            InjectedFaultError: If the call fails.
+        """
+        self.calls += 1
+        if not self.enabled:
+            return
+
+        latency = self.sample_latency()
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        roll = self.rng.random()
+        if roll < self.quota_rate:
+            self.quota_rejections += 1
+            raise QuotaExceededError(f"{self.name} quota exceeded (injected)", retry_after=1.0)
+        if roll < self.quota_rate + self.error_rate:
+            self.errors += 1
+            raise InjectedFaultError(f"{self.name} call failed (injected)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the configuration and counters of the injector."""
+        return {
+            "median_ms": self.median * 1000,
+            "p99_ms": self.p99 * 1000,
+            "error_rate": self.error_rate,
+            "quota_rate": self.quota_rate,
+            "calls": self.calls,
+            "errors": self.errors,
+            "quota_rejections": self.quota_rejections,
+        }
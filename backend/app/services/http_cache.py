@@ -0,0 +1,230 @@
+"""
+Persistent HTTP response cache for fetched web pages.
+Honours Cache-Control and Expires, and keeps ETag/Last-Modified validators so that
+stale pages can be revalidated with conditional requests.
+"""
+
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Mapping, Optional
+
+from app.core.disk_cache import DiskCache
+
+# Cap on heuristic freshness for responses that only carry Last-Modified (RFC 9111, 4.2.2)
+MAX_HEURISTIC_LIFETIME = 24 * 60 * 60
+
+class CachedResponse:
+    """A decoded response body stored in the HTTP cache."""
+
+    def __init__(self, url: str, meta: Dict[str, Any], body: bytes):
+        """
+        Initialize the cached response.
+
+        Args:
+            url: The URL the response was fetched from.
+            meta: The metadata stored with the response.
+            body: The decoded response text, encoded as UTF-8.
+        """
+        self.url = url
+        self.meta = meta
+        self.body = body
+
+    @property
+    def text(self) -> str:
+        """Get the response text."""
+        return self.body.decode("utf-8")
+
+    @property
+    def content_type(self) -> Optional[str]:
+        return self.meta.get("content_type")
+
+    @property
+    def encoding(self) -> str:
+        return self.meta.get("encoding") or "utf-8"
+
+    @property
+    def bytes_read(self) -> int:
+        return self.meta.get("bytes_read", 0)
+
+    @property
+    def truncated(self) -> bool:
+        return self.meta.get("truncated", False)
+
+    def is_fresh(self, now: Optional[float] = None) -> bool:
+        """Check whether the response can be served without revalidation."""
+        now = now if now is not None else time.time()
+        return now < self.meta.get("expires_at", 0)
+
+    def validators(self) -> Dict[str, str]:
+        """Get the headers for a conditional request revalidating this response."""
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        return headers
+
+class HttpCache:
+    """On-disk cache of fetched web pages with HTTP freshness and revalidation."""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Initialize the HTTP cache.
+
+        Args:
+            directory: The directory to store cached responses in.
+            max_bytes: The maximum total size of the cache. Least recently used
+                responses are evicted beyond this.
+        """
+        self.store = DiskCache(directory, max_bytes)
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        """
+        Look up a cached response.
+
+        Args:
+            url: The URL of the page.
+
+        Returns:
+            The cached response, fresh or stale, or None if the URL is not cached.
+        """
+        entry = self.store.get(url)
+        if entry is None:
+            return None
+
+        meta, body = entry
+        return CachedResponse(url, meta, body)
+
+    def put(
+        self,
+        url: str,
+        headers: Mapping[str, str],
+        text: str,
+        content_type: Optional[str],
+        encoding: str,
+        bytes_read: int,
+        truncated: bool,
+    ) -> bool:
+        """
+        Store a response if its headers allow it.
+
+        Args:
+            url: The URL of the page.
+            headers: The response headers.
+            text: The decoded response body.
+            content_type: The media type of the response.
+            encoding: The character encoding the body was decoded with.
+            bytes_read: The number of body bytes that were read.
+            truncated: Whether the body was cut off at the download size limit.
+
+        Returns:
+            True if the response was stored.
+        """
+        if not self._is_storable(headers):
+            return False
+
+        lifetime = self._freshness_lifetime(headers)
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+
+        # A response that is never fresh and cannot be revalidated is useless to keep
+        if lifetime <= 0 and not etag and not last_modified:
+            return False
+
+        meta = {
+            "stored_at": time.time(),
+            "expires_at": time.time() + lifetime,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": content_type,
+            "encoding": encoding,
+            "bytes_read": bytes_read,
+            "truncated": truncated,
+        }
+        self.store.set(url, meta, text.encode("utf-8"))
+        return True
+
+    def revalidated(self, cached: CachedResponse, headers: Mapping[str, str]) -> None:
+        """
+        Refresh a cached response after the server answered 304 Not Modified.
+
+        Args:
+            cached: The cached response that was revalidated.
+            headers: The headers of the 304 response.
+        """
+        if not self._is_storable(headers):
+            self.store.delete(cached.url)
+            return
+
+        lifetime = self._freshness_lifetime(headers)
+        cached.meta["stored_at"] = time.time()
+        cached.meta["expires_at"] = time.time() + lifetime
+        cached.meta["etag"] = headers.get("etag") or cached.meta.get("etag")
+        cached.meta["last_modified"] = headers.get("last-modified") or cached.meta.get("last_modified")
+        self.store.set(cached.url, cached.meta, cached.body)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the size and hit/miss counters of the cache."""
+        return self.store.stats()
+
+    def _is_storable(self, headers: Mapping[str, str]) -> bool:
+        """Check whether a response may be stored at all."""
+        directives = self._cache_control(headers)
+        if "no-store" in directives:
+            return False
+        if headers.get("vary", "").strip() == "*":
+            return False
+        return True
+
+    def _freshness_lifetime(self, headers: Mapping[str, str]) -> float:
+        """
+        Get how long a response stays fresh, in seconds.
+
+        Uses max-age, then Expires, then a heuristic based on Last-Modified.
+        no-cache makes the response stale immediately so it is always revalidated.
+        """
+        directives = self._cache_control(headers)
+        if "no-cache" in directives:
+            return 0
+
+        age = self._parse_int(headers.get("age")) or 0
+
+        max_age = self._parse_int(directives.get("max-age"))
+        if max_age is not None:
+            return max_age - age
+
+        date = self._parse_date(headers.get("date")) or time.time()
+
+        if "expires" in headers:
+            expires = self._parse_date(headers.get("expires"))
+            # An invalid Expires value means already expired
+            return (expires - date) - age if expires is not None else 0
+
+        last_modified = self._parse_date(headers.get("last-modified"))
+        if last_modified is not None and last_modified < date:
+            return min((date - last_modified) / 10, MAX_HEURISTIC_LIFETIME) - age
+
+        return 0
+
+    def _cache_control(self, headers: Mapping[str, str]) -> Dict[str, Optional[str]]:
+        """Parse the Cache-Control header into a dict of directives."""
+        directives = {}
+        for directive in headers.get("cache-control", "").split(","):
+            name, _, value = directive.strip().partition("=")
+            if name:
+                directives[name.lower()] = value.strip('"') if value else None
+        return directives
+
+    def _parse_int(self, value: Optional[str]) -> Optional[int]:
+        try:
+            return int(value) if value is not None else None
+        except ValueError:
+            return None
+
+    def _parse_date(self, value: Optional[str]) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return None
@@ -1,78 +1,641 @@
+import asyncio
+import hashlib
+import time
 import google.generativeai as genai
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from app.core.config import GOOGLE_API_KEY, SUMMARIZATION_MODEL
+from app.core.config import (
+    GOOGLE_API_KEY, SUMMARIZATION_MODEL, SUMMARIZATION_TIMEOUT,
+    SUMMARIZATION_MAX_CONCURRENCY, SUMMARIZATION_CHUNK_CHARS,
+    SUMMARIZATION_CHUNK_OVERLAP, SUMMARIZATION_MAX_CHUNKS,
+    SUMMARIZATION_MAP_CONCURRENCY, SUMMARY_CACHE_ENABLED, SUMMARY_CACHE_DIR,
+    SUMMARY_CACHE_MAX_BYTES, SUMMARY_CACHE_TTL, SUMMARY_CACHE_MEMORY_ENTRIES,
+    SUMMARIZATION_LOCAL_MAX_CHARS, SUMMARIZATION_LOCAL_SENTENCES,
+    SUMMARIZATION_EXPECTED_LATENCY, SUMMARIZATION_QUOTA_PER_MINUTE,
+    SUMMARIZATION_QUOTA_BURST, QUOTA_BACKGROUND_RESERVE, QUOTA_INTERACTIVE_MAX_WAIT,
+    QUOTA_BACKGROUND_MAX_WAIT, QUOTA_BACKGROUND_MAX_QUEUE
+)
+from app.core.log import get_logger
+from app.core.scheduler import QuotaExceededError, QuotaScheduler
+from app.core.tracing import span
+from app.services.extractive_summarizer import ExtractiveSummarizer
+from app.services.summary_cache import SummaryCache
+
+logger = get_logger(__name__)
+
+# Summary modes: pick a tier automatically, always summarize locally, or always use Gemini
+SUMMARY_MODES = ("auto", "local", "llm")
+
+# Weight of the latest observation in the Gemini latency estimate
+LATENCY_EWMA_ALPHA = 0.2
+
+# Prompt used to summarize a text
+SUMMARY_PROMPT_TEMPLATE = """
+            Please provide a concise summary of the following text.
+            Focus on the main points and key information.
+
+            TEXT:
+            {text}
+
+            SUMMARY:
+            """
+
+# Prompt used to summarize one chunk of a long text (map step)
+CHUNK_PROMPT_TEMPLATE = """
+            The following is part {index} of {count} of a longer text.
+            Please provide a concise summary of this part.
+            Focus on the main points and key information.
+
+            TEXT:
+            {text}
+
+            SUMMARY:
+            """
+
+# Prompt used to combine the summaries of the chunks of a long text (reduce step)
+REDUCE_PROMPT_TEMPLATE = """
+            The following are summaries of consecutive parts of a longer text.
+            Please combine them into a single concise summary of the whole text.
+            Focus on the main points and key information, and do not repeat yourself.
+
+            SUMMARIES:
+            {text}
+
+            SUMMARY:
+            """
+
+# Fingerprint of the prompts, part of the summary cache key
+PROMPT_VERSION = hashlib.sha256(
+    "\0".join([SUMMARY_PROMPT_TEMPLATE, CHUNK_PROMPT_TEMPLATE, REDUCE_PROMPT_TEMPLATE]).encode("utf-8")
+).hexdigest()[:16]
 
 class SummarizationService:
     """Service for summarizing content."""
-    
+
     def __init__(self):
         """Initialize the summarization service."""
         # Set up Google Generative AI API
         if GOOGLE_API_KEY:
             genai.configure(api_key=GOOGLE_API_KEY)
-        
+
         # Set up summarization model
         self.model_name = SUMMARIZATION_MODEL
         try:
             self.model = genai.GenerativeModel(self.model_name)
             self.model_initialized = True
         except Exception as e:
-            print(f"Failed to initialize Gemini model: {e}")
+            logger.warning(f"Failed to initialize Gemini model: {e}")
             self.model_initialized = False
-    
-    async def summarize(self, text: str) -> str:
+
+        # Bound the number of concurrent requests to Gemini and how long each may take
+        self.timeout = SUMMARIZATION_TIMEOUT
+        self.max_concurrency = SUMMARIZATION_MAX_CONCURRENCY
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        # Share the Gemini quota so that interactive requests go before background work
+        self.scheduler = QuotaScheduler(
+            "gemini",
+            requests_per_minute=SUMMARIZATION_QUOTA_PER_MINUTE,
+            burst=SUMMARIZATION_QUOTA_BURST,
+            background_reserve=QUOTA_BACKGROUND_RESERVE,
+            interactive_max_wait=QUOTA_INTERACTIVE_MAX_WAIT,
+            background_max_wait=QUOTA_BACKGROUND_MAX_WAIT,
+            background_max_queue=QUOTA_BACKGROUND_MAX_QUEUE,
+        )
+
+        # Long texts are split into chunks that are summarized in parallel and then combined
+        self.chunk_chars = SUMMARIZATION_CHUNK_CHARS
+        self.chunk_overlap = SUMMARIZATION_CHUNK_OVERLAP
+        self.max_chunks = SUMMARIZATION_MAX_CHUNKS
+        self.map_concurrency = SUMMARIZATION_MAP_CONCURRENCY
+
+        # Set up the summary cache
+        self.cache = None
+        if SUMMARY_CACHE_ENABLED:
+            try:
+                self.cache = SummaryCache(
+                    SUMMARY_CACHE_DIR, SUMMARY_CACHE_MAX_BYTES, SUMMARY_CACHE_TTL,
+                    memory_entries=SUMMARY_CACHE_MEMORY_ENTRIES,
+                )
+            except Exception as e:
+                logger.warning(f"Failed to initialize summary cache: {e}")
+
+        # Short texts and tight latency budgets are summarized locally instead of by Gemini
+        self.extractive_summarizer = ExtractiveSummarizer(max_sentences=SUMMARIZATION_LOCAL_SENTENCES)
+        self.local_max_chars = SUMMARIZATION_LOCAL_MAX_CHARS
+        self.latency_estimate = SUMMARIZATION_EXPECTED_LATENCY
+        self.local_summaries = 0
+
+        # Queue metrics
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.total_wait_time = 0.0
+        self.total_generation_time = 0.0
+
+    async def summarize(self, text: str, mode: str = "auto", latency_budget: Optional[float] = None) -> str:
         """
         Summarize the given text.
-        
+
         Args:
             text: The text to summarize.
-            
+            mode: "local" for the local extractive summarizer, "llm" for Gemini, or
+                "auto" to choose by text length and latency budget.
+            latency_budget: How long the caller is willing to wait, in seconds.
+
         Returns:
             A summary of the text.
         """
-        if not self.model_initialized:
-            return self._create_fallback_summary(text)
-        
-        try:
+        if self.choose_tier(text, mode, latency_budget) == "local":
+            self.local_summaries += 1
+            with span("summarize_local"):
+                return self.extractive_summarizer.summarize(text)
+
+        with span("summarize"):
+            return await self._summarize_with_model(text)
+
+    async def _summarize_with_model(self, text: str) -> str:
+        """Summarize a text with Gemini, going through the summary cache."""
+        # Serve repeat summaries from the cache
+        cache_key = SummaryCache.make_key(self.model_name, PROMPT_VERSION, text)
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            return cached
+
+        # Long texts go through map-reduce, short ones are summarized in a single call
+        if len(text) > self.chunk_chars:
+            summary, complete = await self._summarize_long(text)
+        else:
             # Prepare the prompt
-            prompt = f"""
-            Please provide a concise summary of the following text. 
-            Focus on the main points and key information.
-            
-            TEXT:
-            {text}
-            
-            SUMMARY:
-            """
-            
+            prompt = SUMMARY_PROMPT_TEMPLATE.format(text=text)
+
             # Generate the summary
-            response = self.model.generate_content(prompt)
-            
+            summary = await self._generate(prompt)
+            complete = bool(summary)
+
+        # Only summaries fully generated by the model are cached, so fallbacks get retried
+        if complete:
+            await self._set_cached(cache_key, summary)
+            return summary
+
+        return summary or self._create_fallback_summary(text)
+
+    async def _get_cached(self, cache_key: str) -> Optional[str]:
+        """Look up a summary in the cache, if the cache is enabled."""
+        if self.cache is None:
+            return None
+
+        # Memory hits are answered without leaving the event loop
+        summary = self.cache.get_from_memory(cache_key)
+        if summary is not None:
+            return summary
+
+        try:
+            return await asyncio.to_thread(self.cache.get, cache_key)
+        except Exception as e:
+            logger.warning(f"Summary cache lookup failed: {e}")
+            return None
+
+    async def _set_cached(self, cache_key: str, summary: str) -> None:
+        """Store a summary in the cache, if the cache is enabled."""
+        if self.cache is None:
+            return
+
+        try:
+            await asyncio.to_thread(self.cache.set, cache_key, summary)
+        except Exception as e:
+            logger.warning(f"Summary cache store failed: {e}")
+
+    def choose_tier(self, text: str, mode: str = "auto", latency_budget: Optional[float] = None) -> str:
+        """
+        Choose whether a text is summarized locally or by Gemini.
+
+        In auto mode, short texts are summarized locally, as is anything whose latency
+        budget is below the expected Gemini latency.
+
+        Args:
+            text: The text to summarize.
+            mode: One of SUMMARY_MODES.
+            latency_budget: How long the caller is willing to wait, in seconds.
+
+        Returns:
+            "local" or "llm".
+        """
+        if mode == "local" or not self.model_initialized:
+            return "local"
+        if mode == "llm":
+            return "llm"
+        if len(text) <= self.local_max_chars:
+            return "local"
+        if latency_budget is not None and latency_budget < self.expected_latency(text):
+            return "local"
+        return "llm"
+
+    def expected_latency(self, text: str) -> float:
+        """
+        Estimate how long Gemini will take to summarize a text, in seconds.
+
+        Based on a moving average of recent generation times. Long texts need a
+        map and a reduce pass, so they take about twice as long.
+        """
+        if len(text) > self.chunk_chars:
+            return 2 * self.latency_estimate
+        return self.latency_estimate
+
+    async def summarize_stream(
+        self, text: str, mode: str = "auto", latency_budget: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Summarize the given text, yielding the summary in pieces as the model generates it.
+
+        Local and cached summaries are yielded in one piece. For long texts, the chunk
+        summaries are generated first and the final reduce pass is streamed. The full
+        summary is cached once the stream completes.
+
+        Args:
+            text: The text to summarize.
+            mode: "local", "llm" or "auto", as for summarize().
+            latency_budget: How long the caller is willing to wait, in seconds.
+
+        Yields:
+            Consecutive pieces of the summary.
+
+        Raises:
+            Exception: If generation fails after pieces were yielded, since the summary
+                the caller has sent so far is then incomplete.
+        """
+        if self.choose_tier(text, mode, latency_budget) == "local":
+            self.local_summaries += 1
+            yield self.extractive_summarizer.summarize(text)
+            return
+
+        cache_key = SummaryCache.make_key(self.model_name, PROMPT_VERSION, text)
+        cached = await self._get_cached(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        if len(text) > self.chunk_chars:
+            chunk_summaries, complete = await self._map_chunks(text)
+            combined = await self._combine_for_reduce(chunk_summaries)
+            if combined is None:
+                yield self._create_fallback_summary(text)
+                return
+            prompt = REDUCE_PROMPT_TEMPLATE.format(text=combined)
+        else:
+            prompt = SUMMARY_PROMPT_TEMPLATE.format(text=text)
+            complete = True
+
+        parts = []
+        try:
+            async for piece in self._generate_stream(prompt):
+                parts.append(piece)
+                yield piece
+        except Exception:
+            # Already yielded pieces cannot be taken back, so only fall back if nothing was sent
+            if not parts:
+                yield self._create_fallback_summary(text)
+                return
+            raise
+
+        summary = "".join(parts).strip()
+        if not summary:
+            yield self._create_fallback_summary(text)
+            return
+
+        if complete:
+            await self._set_cached(cache_key, summary)
+
+    async def _summarize_long(self, text: str) -> Tuple[str, bool]:
+        """
+        Summarize a long text with map-reduce.
+
+        The text is split into chunks that are summarized in parallel, then the
+        chunk summaries are combined with a final reduce pass.
+
+        Args:
+            text: The text to summarize.
+
+        Returns:
+            A tuple of (summary, complete), where complete is False if any part
+            of the summary had to fall back to a local summary.
+        """
+        chunk_summaries, complete = await self._map_chunks(text)
+
+        # Reduce: combine the chunk summaries into one
+        summary = await self._reduce(chunk_summaries)
+        if summary is None:
+            return self._create_fallback_summary(text), False
+
+        return summary, complete
+
+    async def _map_chunks(self, text: str) -> Tuple[List[str], bool]:
+        """
+        Split a long text into chunks and summarize them in parallel.
+
+        Args:
+            text: The text to summarize.
+
+        Returns:
+            A tuple of (chunk_summaries, complete), where complete is False if any
+            chunk had to fall back to a local summary.
+        """
+        chunks = self._split_text(text)
+        logger.debug(f"Summarizing long text ({len(text)} characters) in {len(chunks)} chunks")
+
+        # Map: summarize the chunks in parallel, a few at a time per document
+        chunk_semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize_chunk(index: int, chunk: str) -> Optional[str]:
+            async with chunk_semaphore:
+                prompt = CHUNK_PROMPT_TEMPLATE.format(index=index + 1, count=len(chunks), text=chunk)
+                return await self._generate(prompt)
+
+        results = await asyncio.gather(
+            *[summarize_chunk(index, chunk) for index, chunk in enumerate(chunks)]
+        )
+
+        # Keep going with a local summary of any chunk that could not be summarized
+        complete = all(results)
+        chunk_summaries = [
+            summary or self._create_fallback_summary(chunk)
+            for summary, chunk in zip(results, chunks)
+        ]
+        return chunk_summaries, complete
+
+    async def _reduce(self, summaries: List[str]) -> Optional[str]:
+        """
+        Combine chunk summaries into a single summary.
+
+        Args:
+            summaries: The summaries of consecutive chunks.
+
+        Returns:
+            The combined summary, or None if it could not be generated.
+        """
+        combined = await self._combine_for_reduce(summaries)
+        if combined is None:
+            return None
+
+        return await self._generate(REDUCE_PROMPT_TEMPLATE.format(text=combined))
+
+    async def _combine_for_reduce(self, summaries: List[str]) -> Optional[str]:
+        """
+        Join chunk summaries into the text of the final reduce prompt.
+
+        If the summaries together are still too long for one prompt, they are
+        combined in groups first.
+
+        Args:
+            summaries: The summaries of consecutive chunks.
+
+        Returns:
+            The joined summaries, or None if a group could not be combined.
+        """
+        combined = "\n\n".join(summaries)
+
+        if len(combined) > self.chunk_chars and len(summaries) > 1:
+            groups = self._group_summaries(summaries)
+            if len(groups) < len(summaries):
+                group_summaries = await asyncio.gather(*[self._reduce(group) for group in groups])
+                if not all(group_summaries):
+                    return None
+                return await self._combine_for_reduce(list(group_summaries))
+
+        return combined
+
+    def _group_summaries(self, summaries: List[str]) -> List[List[str]]:
+        """Group consecutive summaries so that each group fits in one prompt."""
+        groups = [[]]
+        size = 0
+        for summary in summaries:
+            if groups[-1] and size + len(summary) > self.chunk_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += len(summary)
+        return groups
+
+    def _split_text(self, text: str) -> List[str]:
+        """
+        Split a text into overlapping chunks, preferably at paragraph or sentence boundaries.
+
+        Args:
+            text: The text to split.
+
+        Returns:
+            The chunks of the text, in order.
+        """
+        # Very long texts get larger chunks rather than an unbounded number of calls
+        chunk_chars = max(self.chunk_chars, -(-len(text) // self.max_chunks))
+        overlap = min(self.chunk_overlap, chunk_chars // 4)
+
+        chunks = []
+        start = 0
+        while start < len(text):
+            end = min(start + chunk_chars, len(text))
+
+            if end < len(text):
+                # Prefer to break in the second half of the chunk at a paragraph, then a sentence
+                window_start = start + chunk_chars // 2
+                for separator in ("\n\n", "\n", ". "):
+                    position = text.rfind(separator, window_start, end)
+                    if position != -1:
+                        end = position + len(separator)
+                        break
+
+            chunk = text[start:end].strip()
+            if chunk:
+                chunks.append(chunk)
+
+            if end >= len(text):
+                break
+            start = max(end - overlap, start + 1)
+
+        return chunks
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get the queue metrics of the service.
+
+        Returns:
+            A dictionary with the current queue depth, in-flight requests,
+            counters for completed, failed and timed out generations, and the
+            summary cache statistics.
+        """
+        started = self.completed + self.failed + self.timed_out
+        metrics = {
+            "max_concurrency": self.max_concurrency,
+            "timeout": self.timeout,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "average_wait_seconds": self.total_wait_time / started if started else 0.0,
+            "average_generation_seconds": self.total_generation_time / self.completed if self.completed else 0.0,
+            "expected_latency_seconds": self.latency_estimate,
+            "local_summaries": self.local_summaries,
+            "quota": self.scheduler.stats(),
+        }
+        if self.cache is not None:
+            metrics["cache"] = self.cache.stats()
+        return metrics
+
+    async def _generate(self, prompt: str) -> Optional[str]:
+        """
+        Generate a response to the prompt within the concurrency limit and deadline.
+
+        The deadline covers the time spent waiting for the quota and a free slot,
+        and the generation itself.
+
+        Args:
+            prompt: The prompt to send to the model.
+
+        Returns:
+            The generated text, or None if generation failed, timed out or was shed.
+        """
+        try:
+            return await asyncio.wait_for(self._generate_limited(prompt, time.monotonic()), timeout=self.timeout)
+        except QuotaExceededError as e:
+            logger.warning(str(e))
+            return None
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Summarization timed out after {self.timeout} seconds")
+            return None
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Failed to summarize text: {e}")
+            return None
+
+    async def _generate_limited(self, prompt: str, queued_at: float) -> Optional[str]:
+        """Wait for the quota and a free slot, then generate a response to the prompt."""
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._acquire_slot()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.monotonic()
+        self.total_wait_time += started_at - queued_at
+        self.in_flight += 1
+        try:
+            response = await self._generate_content(prompt)
+
             # Extract the summary from the response
-            if hasattr(response, "text"):
-                return response.text.strip()
-            else:
-                return self._create_fallback_summary(text)
+            text = response.text.strip() if hasattr(response, "text") else None
+
+            self._record_latency(time.monotonic() - started_at)
+            return text
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _generate_stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Stream a response to the prompt within the quota and concurrency limit.
+
+        The deadline applies to the wait for the quota and a free slot plus the first
+        piece, and then separately to the wait for each following piece.
+
+        Args:
+            prompt: The prompt to send to the model.
+
+        Yields:
+            Consecutive pieces of the generated text.
+
+        Raises:
+            Exception: If generation fails, times out or is shed.
+        """
+        # Older SDK versions cannot stream asynchronously, so the response comes in one piece
+        if not hasattr(self.model, "generate_content_async"):
+            text = await self._generate(prompt)
+            if text is None:
+                raise RuntimeError("Summarization failed")
+            yield text
+            return
+
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await asyncio.wait_for(self._acquire_slot(), timeout=self.timeout)
+        except QuotaExceededError as e:
+            logger.warning(str(e))
+            raise
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Summarization timed out after {self.timeout} seconds waiting for a slot")
+            raise
+        finally:
+            self.waiting -= 1
+
+        started_at = time.monotonic()
+        self.total_wait_time += started_at - queued_at
+        self.in_flight += 1
+        try:
+            remaining = max(self.timeout - (started_at - queued_at), 0.001)
+            response = await asyncio.wait_for(
+                self.model.generate_content_async(prompt, stream=True), timeout=remaining
+            )
+
+            pieces = response.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(pieces.__anext__(), timeout=self.timeout)
+                except StopAsyncIteration:
+                    break
+
+                text = chunk.text if hasattr(chunk, "text") else None
+                if text:
+                    yield text
+
+            self._record_latency(time.monotonic() - started_at)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.warning(f"Summarization stream timed out after {self.timeout} seconds")
+            raise
         except Exception as e:
-            print(f"Failed to summarize text: {e}")
-            return self._create_fallback_summary(text)
-    
+            self.failed += 1
+            logger.warning(f"Failed to stream summary: {e}")
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    async def _acquire_slot(self) -> None:
+        """Wait for the Gemini quota at the priority of the current request, then for a free slot."""
+        await self.scheduler.acquire()
+        await self._semaphore.acquire()
+
+    def _record_latency(self, duration: float) -> None:
+        """Record a completed generation and update the latency estimate."""
+        self.completed += 1
+        self.total_generation_time += duration
+        self.latency_estimate += LATENCY_EWMA_ALPHA * (duration - self.latency_estimate)
+
+    async def _generate_content(self, prompt: str) -> Any:
+        """Call the model without blocking the event loop."""
+        if hasattr(self.model, "generate_content_async"):
+            return await self.model.generate_content_async(prompt)
+
+        # Older SDK versions only have the blocking call
+        return await asyncio.to_thread(self.model.generate_content, prompt)
+
     def _create_fallback_summary(self, text: str) -> str:
         """
-        Create a simple fallback summary when the API fails.
-        
+        Create a local extractive summary when the API fails.
+
         Args:
             text: The text to summarize.
-            
+
         Returns:
-            A simple summary of the text.
-        """
-        # Get the first few sentences as a simple summary
-        sentences = text.split('.')
-        if len(sentences) <= 3:
-            return text  # Text is already short enough
-        
-        # Take first 3 sentences
-        summary = '. '.join(sentences[:3]) + '.'
-        
-        return summary.strip()
+            A summary made of the most central sentences of the text.
+        """
+        return self.extractive_summarizer.summarize(text)
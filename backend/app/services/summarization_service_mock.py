@@ -1,25 +1,70 @@
 """
 Mock summarization service for testing purposes.
-Returns predefined summaries instead of calling Google Gemini.
+Returns predefined summaries instead of calling Google Gemini. Simulated Gemini calls
+go through a fault injector and, like the real service, fall back to the local
+extractive summarizer when they fail or time out.
 """
 
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.core.config import (
+    SUMMARIZATION_TIMEOUT, MOCK_FAULT_SEED, MOCK_SUMMARIZATION_LATENCY_MS,
+    MOCK_SUMMARIZATION_ERROR_RATE, MOCK_SUMMARIZATION_QUOTA_RATE
+)
+from app.core.log import get_logger
+from app.core.tracing import span
+from app.services.extractive_summarizer import ExtractiveSummarizer
+from app.services.fault_injection import FaultInjector
+
+logger = get_logger(__name__)
+
 class SummarizationServiceMock:
     """Mock service for generating text summaries."""
     
     def __init__(self):
         """Initialize the mock summarization service."""
-        print("Initialized Mock Summarization Service")
+        self.timeout = SUMMARIZATION_TIMEOUT
+        self.extractive_summarizer = ExtractiveSummarizer()
+        self.faults = FaultInjector(
+            "gemini",
+            MOCK_SUMMARIZATION_LATENCY_MS,
+            error_rate=MOCK_SUMMARIZATION_ERROR_RATE,
+            quota_rate=MOCK_SUMMARIZATION_QUOTA_RATE,
+            seed=MOCK_FAULT_SEED,
+        )
+        self.fallbacks = 0
+        logger.info("Initialized Mock Summarization Service")
+    
+    def describe(self) -> Dict[str, Any]:
+        return {"fallbacks": self.fallbacks, "faults": self.faults.stats()}
     
-    async def summarize(self, text: str) -> str:
+    async def summarize(self, text: str, mode: str = "auto", latency_budget: Optional[float] = None) -> str:
         """
         Generate a mock summary for the given text.
         
         Args:
             text: The text to summarize.
-            
+            mode: "local" for the local extractive summarizer, which skips the
+                simulated Gemini call; any other mode goes through it.
+            latency_budget: Accepted for compatibility with the real service and ignored.
+        
         Returns:
             A mock summary of the text.
         """
+        if mode == "local":
+            with span("summarize_local"):
+                return self.extractive_summarizer.summarize(text)
+        
+        with span("summarize"):
+            try:
+                await asyncio.wait_for(self.faults.call(), timeout=self.timeout)
+            except Exception as e:
+                # Like the real service, failed and timed out calls fall back to a local summary
+                self.fallbacks += 1
+                logger.warning(f"Failed to summarize text: {e or type(e).__name__}")
+                return self.extractive_summarizer.summarize(text)
+        
         # Get the first few words and last few words to create a mock summary
         words = text.split()
         
@@ -35,5 +80,24 @@ class SummarizationServiceMock:
         # Create a mock summary
         mock_summary = f"{first_part} [...] {last_part}"
         
-        print(f"Generated mock summary for text: {text[:50]}...")
+        logger.debug(f"Generated mock summary for text: {text[:50]}...")
         return mock_summary
+    
+    async def summarize_stream(
+        self, text: str, mode: str = "auto", latency_budget: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Generate a mock summary for the given text, one word at a time.
+        
+        Args:
+            text: The text to summarize.
+            mode: "local" or any other mode, as for summarize().
+            latency_budget: Accepted for compatibility with the real service and ignored.
+        
+        Yields:
+            Consecutive pieces of the mock summary.
+        """
+        summary = await self.summarize(text, mode=mode)
+        words = summary.split(" ")
+        for index, word in enumerate(words):
+            yield word if index == len(words) - 1 else word + " "
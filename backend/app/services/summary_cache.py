@@ -0,0 +1,159 @@
+"""
+Persistent cache of generated summaries.
+Summaries are keyed by a hash of the model, the prompt templates and the text, so a
+change to any of them produces a new summary instead of a stale one.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.disk_cache import DiskCache
+
+class SummaryCache:
+    """Two-level summary cache: a small in-memory LRU in front of a bounded on-disk cache."""
+
+    def __init__(self, directory: str, max_bytes: int, ttl: float, memory_entries: int = 1024):
+        """
+        Initialize the summary cache.
+
+        Args:
+            directory: The directory to store cached summaries in.
+            max_bytes: The maximum total size of the on-disk cache.
+            ttl: How long a summary stays valid, in seconds.
+            memory_entries: How many summaries to keep in memory.
+        """
+        self.store = DiskCache(directory, max_bytes)
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+
+        self._lock = threading.Lock()
+        # Maps keys to (expires_at, summary), least recently used first
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stores = 0
+
+    @staticmethod
+    def make_key(model_name: str, prompt_version: str, text: str) -> str:
+        """
+        Build the cache key for a summary.
+
+        Args:
+            model_name: The name of the summarization model.
+            prompt_version: A fingerprint of the prompt templates.
+            text: The text that is summarized.
+
+        Returns:
+            A hex digest identifying the summary.
+        """
+        digest = hashlib.sha256()
+        for part in (model_name, prompt_version, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get_from_memory(self, key: str) -> Optional[str]:
+        """
+        Look up a summary in memory only.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached summary, or None if it is not in memory or has expired.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+
+            expires_at, summary = entry
+            if time.time() >= expires_at:
+                del self._memory[key]
+                return None
+
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return summary
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a summary in memory, then on disk.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            The cached summary, or None on a miss.
+        """
+        summary = self.get_from_memory(key)
+        if summary is not None:
+            return summary
+
+        entry = self.store.get(key)
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        meta, value = entry
+        if time.time() >= meta.get("expires_at", 0):
+            self.store.delete(key)
+            with self._lock:
+                self.expired += 1
+                self.misses += 1
+            return None
+
+        summary = value.decode("utf-8")
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, meta["expires_at"], summary)
+        return summary
+
+    def set(self, key: str, summary: str) -> None:
+        """
+        Store a summary in memory and on disk.
+
+        Args:
+            key: The cache key.
+            summary: The summary to store.
+        """
+        expires_at = time.time() + self.ttl
+        self.store.set(key, {"created_at": time.time(), "expires_at": expires_at}, summary.encode("utf-8"))
+        with self._lock:
+            self.stores += 1
+            self._remember(key, expires_at, summary)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the hit/miss counters and size of the cache."""
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            stats = {
+                "memory_entries": len(self._memory),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stores": self.stores,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+            }
+
+        disk = self.store.stats()
+        stats["disk_entries"] = disk["entries"]
+        stats["disk_bytes"] = disk["bytes"]
+        stats["evictions"] = disk["evictions"]
+        return stats
+
+    def _remember(self, key: str, expires_at: float, summary: str) -> None:
+        """Add a summary to the in-memory LRU. Must be called with the lock held."""
+        self._memory[key] = (expires_at, summary)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
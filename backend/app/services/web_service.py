@@ -1,55 +1,287 @@
+import asyncio
+import codecs
+import re
 import httpx
 from bs4 import BeautifulSoup
-from typing import Tuple
+from typing import Optional, Tuple
+
+from app.core.config import (
+    WEB_FETCH_TIMEOUT, WEB_FETCH_MAX_BYTES, WEB_FETCH_CHUNK_SIZE,
+    WEB_FETCH_ALLOWED_CONTENT_TYPES, WEB_EXTRACT_MAIN_CONTENT, WEB_EXTRACT_MIN_CHARS,
+    WEB_CACHE_ENABLED, WEB_CACHE_DIR, WEB_CACHE_MAX_BYTES
+)
+from app.core.log import get_logger
+from app.core.tracing import span
+from app.models.web_page import WebPage
+from app.services.content_extractor import ContentExtractor
+from app.services.http_cache import CachedResponse, HttpCache
+
+logger = get_logger(__name__)
+
+# Matches <meta charset="..."> and <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_PATTERN = re.compile(rb"<meta[^>]+charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+
+# How much of the body to inspect when sniffing for binary content or a meta charset
+SNIFF_BYTES = 1024
+
+class UnsupportedContentError(Exception):
+    """Raised when a response is not a text document that can be archived."""
+    pass
 
 class WebService:
     """Service for fetching web pages."""
-    
+
     def __init__(self):
         """Initialize the web service."""
         self.client = httpx.AsyncClient(
             follow_redirects=True,
-            timeout=30.0,
+            timeout=WEB_FETCH_TIMEOUT,
         )
-    
+        self.max_bytes = WEB_FETCH_MAX_BYTES
+        self.chunk_size = WEB_FETCH_CHUNK_SIZE
+        self.allowed_content_types = {
+            content_type.strip().lower()
+            for content_type in WEB_FETCH_ALLOWED_CONTENT_TYPES
+            if content_type.strip()
+        }
+        self.content_extractor = ContentExtractor(min_content_length=WEB_EXTRACT_MIN_CHARS)
+        self.extract_main_content = WEB_EXTRACT_MAIN_CONTENT
+
+        # Set up the on-disk HTTP cache
+        self.cache = None
+        if WEB_CACHE_ENABLED:
+            try:
+                self.cache = HttpCache(WEB_CACHE_DIR, WEB_CACHE_MAX_BYTES)
+            except Exception as e:
+                logger.warning(f"Failed to initialize HTTP cache: {e}")
+
     async def fetch_web_page(self, url: str) -> Tuple[str, str]:
         """
         Fetch a web page and extract its content and title.
-        
+
         Args:
             url: The URL of the web page to fetch.
-            
+
         Returns:
             A tuple of (content, title).
         """
+        page = await self.fetch_page(url)
+        return page.content, page.title
+
+    async def fetch_page(self, url: str) -> WebPage:
+        """
+        Fetch a web page with a bounded download and extract its content and title.
+
+        The body is streamed and decoded incrementally. The content type is checked
+        before any of the body is read, and the download is aborted as soon as the
+        configured byte budget is exhausted, in which case the page is marked as truncated.
+        Cached responses are reused while fresh and revalidated once stale.
+
+        Args:
+            url: The URL of the web page to fetch.
+
+        Returns:
+            A WebPage with the extracted content and title.
+        """
         try:
-            # Fetch the web page
-            response = await self.client.get(url)
+            with span("fetch"):
+                text, content_type, encoding, bytes_read, truncated = await self._download(url)
+
+            if truncated:
+                logger.warning(f"Truncated {url} after {bytes_read} bytes (limit: {self.max_bytes} bytes)")
+
+            # Plain text needs no HTML parsing
+            main_content = False
+            if content_type == "text/plain":
+                content, title = text.strip(), url
+            else:
+                with span("parse"):
+                    content, title, main_content = self._parse_html(text, url)
+
+            return WebPage(
+                url=url,
+                title=title,
+                content=content,
+                content_type=content_type,
+                encoding=encoding,
+                bytes_read=bytes_read,
+                truncated=truncated,
+                main_content=main_content,
+            )
+        except Exception as e:
+            logger.warning(f"Failed to fetch web page: {e}")
+            return WebPage(
+                url=url,
+                title=url,
+                content=f"Failed to fetch web page: {e}",
+                error=str(e),
+            )
+
+    async def _download(self, url: str) -> Tuple[str, Optional[str], str, int, bool]:
+        """
+        Download and decode a page, going through the HTTP cache.
+
+        Fresh cached responses are served without a request. Stale ones are
+        revalidated with a conditional request and reused on 304 Not Modified.
+
+        Args:
+            url: The URL of the page.
+
+        Returns:
+            A tuple of (text, content_type, encoding, bytes_read, truncated).
+        """
+        cached = await self._get_cached(url)
+        if cached is not None and cached.is_fresh():
+            logger.debug(f"Serving {url} from the HTTP cache")
+            return cached.text, cached.content_type, cached.encoding, cached.bytes_read, cached.truncated
+
+        request_headers = cached.validators() if cached is not None else {}
+
+        async with self.client.stream("GET", url, headers=request_headers) as response:
+            if response.status_code == 304 and cached is not None:
+                logger.debug(f"Revalidated {url} in the HTTP cache")
+                await self._run_cache_operation(self.cache.revalidated, cached, response.headers)
+                return cached.text, cached.content_type, cached.encoding, cached.bytes_read, cached.truncated
+
             response.raise_for_status()
-            
-            # Parse the HTML
-            soup = BeautifulSoup(response.text, "lxml")
-            
-            # Extract the title
-            title = soup.title.string if soup.title else url
-            
-            # Extract the main content
-            # This is a simple implementation that just gets the text
-            # In a real implementation, you might want to use a more sophisticated
-            # approach to extract the main content
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-            
-            # Get the text
-            content = soup.get_text(separator="\n", strip=True)
-            
-            return content, title
+
+            # Reject binary downloads before reading any of the body
+            content_type = self._get_content_type(response)
+            if content_type and content_type not in self.allowed_content_types:
+                raise UnsupportedContentError(f"Unsupported content type: {content_type}")
+
+            text, encoding, bytes_read, truncated = await self._read_body(response, content_type)
+
+        if self.cache is not None:
+            await self._run_cache_operation(
+                self.cache.put, url, response.headers, text, content_type, encoding, bytes_read, truncated
+            )
+
+        return text, content_type, encoding, bytes_read, truncated
+
+    async def _get_cached(self, url: str) -> Optional[CachedResponse]:
+        """Look up a page in the HTTP cache, if the cache is enabled."""
+        if self.cache is None:
+            return None
+        return await self._run_cache_operation(self.cache.get, url)
+
+    async def _run_cache_operation(self, operation, *args):
+        """
+        Run a cache operation in a worker thread so disk I/O does not block the event loop.
+        Cache failures are logged and otherwise ignored.
+        """
+        try:
+            return await asyncio.to_thread(operation, *args)
         except Exception as e:
-            print(f"Failed to fetch web page: {e}")
-            return f"Failed to fetch web page: {e}", url
-    
+            logger.warning(f"HTTP cache operation failed: {e}")
+            return None
+
+    async def _read_body(
+        self, response: httpx.Response, content_type: Optional[str]
+    ) -> Tuple[str, str, int, bool]:
+        """
+        Stream the response body up to the byte budget, decoding it incrementally.
+
+        Args:
+            response: The streaming response to read.
+            content_type: The declared media type, if any.
+
+        Returns:
+            A tuple of (text, encoding, bytes_read, truncated).
+        """
+        decoder = None
+        encoding = None
+        parts = []
+        bytes_read = 0
+        truncated = False
+
+        async for chunk in response.aiter_bytes(self.chunk_size):
+            if decoder is None:
+                # Sniff the first chunk when the server did not declare a content type
+                if not content_type and b"\x00" in chunk[:SNIFF_BYTES]:
+                    raise UnsupportedContentError("Response body looks like binary data")
+                encoding = self._detect_encoding(response, chunk)
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+
+            remaining = self.max_bytes - bytes_read
+            if len(chunk) > remaining:
+                chunk = chunk[:remaining]
+                truncated = True
+
+            bytes_read += len(chunk)
+            parts.append(decoder.decode(chunk))
+
+            if truncated:
+                # Leaving the stream context closes the connection and aborts the download
+                break
+
+        if decoder is None:
+            return "", encoding or "utf-8", 0, False
+
+        parts.append(decoder.decode(b"", final=True))
+        return "".join(parts), encoding, bytes_read, truncated
+
+    def _get_content_type(self, response: httpx.Response) -> Optional[str]:
+        """Get the media type of a response without its parameters."""
+        content_type = response.headers.get("content-type")
+        if not content_type:
+            return None
+        return content_type.split(";")[0].strip().lower()
+
+    def _detect_encoding(self, response: httpx.Response, first_chunk: bytes) -> str:
+        """
+        Determine the character encoding of a response.
+
+        The charset from the Content-Type header wins, then a <meta> charset in the
+        first chunk of the body, then UTF-8.
+        """
+        candidates = [response.charset_encoding]
+        match = META_CHARSET_PATTERN.search(first_chunk[:SNIFF_BYTES])
+        if match:
+            candidates.append(match.group(1).decode("ascii", errors="ignore"))
+
+        for candidate in candidates:
+            if not candidate:
+                continue
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                continue
+
+        return "utf-8"
+
+    def _parse_html(self, html: str, url: str) -> Tuple[str, str, bool]:
+        """
+        Extract the text content and title from an HTML document.
+
+        Args:
+            html: The HTML to parse.
+            url: The URL of the page, used as the title if the page has none.
+
+        Returns:
+            A tuple of (content, title, main_content), where main_content is True
+            if boilerplate was stripped and False if the full page text was kept.
+        """
+        # Parse the HTML
+        soup = BeautifulSoup(html, "lxml")
+
+        # Extract the title
+        title = soup.title.string if soup.title and soup.title.string else url
+
+        # Extract the main content, leaving out navigation, footers and other boilerplate
+        if self.extract_main_content:
+            content, main_content = self.content_extractor.extract(soup)
+            return content, title.strip(), main_content
+
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.extract()
+
+        # Get the text
+        content = soup.get_text(separator="\n", strip=True)
+
+        return content, title.strip(), False
+
     async def close(self):
         """Close the HTTP client."""
         await self.client.aclose()
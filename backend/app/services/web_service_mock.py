@@ -3,14 +3,23 @@ Mock web service for testing purposes.
 Returns predefined content instead of fetching real web pages.
 """
 
-from typing import Tuple
+from typing import Any, Dict, Tuple
+
+from app.models.web_page import WebPage
+from app.core.config import MOCK_FAULT_SEED, MOCK_WEB_LATENCY_MS, MOCK_WEB_ERROR_RATE
+from app.core.log import get_logger
+from app.core.tracing import span
+from app.services.fault_injection import FaultInjector
+
+logger = get_logger(__name__)
 
 class WebServiceMock:
     """Mock service for fetching web pages."""
     
     def __init__(self):
         """Initialize the mock web service."""
-        print("Initialized Mock Web Service")
+        logger.info("Initialized Mock Web Service")
+        self.faults = FaultInjector("web", MOCK_WEB_LATENCY_MS, error_rate=MOCK_WEB_ERROR_RATE, seed=MOCK_FAULT_SEED)
         
         # Predefined responses for common URLs
         self.predefined_responses = {
@@ -28,6 +37,9 @@ class WebServiceMock:
             )
         }
     
+    def describe(self) -> Dict[str, Any]:
+        return {"faults": self.faults.stats()}
+    
     async def fetch_web_page(self, url: str) -> Tuple[str, str]:
         """
         Return predefined content for the given URL.
@@ -38,16 +50,39 @@ class WebServiceMock:
         Returns:
             A tuple of (content, title).
         """
+        with span("fetch"):
+            await self.faults.call()
+        
         # Check if we have a predefined response for this URL
         if url in self.predefined_responses:
             content, title = self.predefined_responses[url]
-            print(f"Returning predefined content for URL: {url}")
+            logger.debug(f"Returning predefined content for URL: {url}")
             return content, title
         
         # For unknown URLs, generate a mock response
-        print(f"Generating mock content for URL: {url}")
+        logger.debug(f"Generating mock content for URL: {url}")
         return f"This is mock content for {url}", f"Mock Page: {url}"
     
+    async def fetch_page(self, url: str) -> WebPage:
+        """
+        Return predefined content for the given URL as a web page.
+        
+        Args:
+            url: The URL of the web page to fetch.
+            
+        Returns:
+            A WebPage with the mock content and title.
+        """
+        content, title = await self.fetch_web_page(url)
+        return WebPage(
+            url=url,
+            title=title,
+            content=content,
+            content_type="text/html",
+            encoding="utf-8",
+            bytes_read=len(content.encode("utf-8")),
+        )
+    
     async def close(self):
         """Close the mock service."""
-        print("Closing Mock Web Service")
+        logger.info("Closing Mock Web Service")
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Script to benchmark the API against the mock backend.
+
+A synthetic corpus is loaded into main_mock, then concurrent workers send a mixed
+workload of creates, gets, full-text and semantic searches, similar-document lookups
+and web fetches for a fixed time. Latency percentiles and throughput per operation are
+written as JSON, and can be compared against an earlier run to catch regressions.
+
+By default the mock application runs in-process, so no server is needed and large
+corpora can be loaded directly into the mock document service. With --base-url, a
+running server is benchmarked instead and the corpus is loaded through the API.
+
+Examples:
+    python benchmark_mock.py --documents 1k --duration 30 --output baseline.json
+    python benchmark_mock.py --documents 1k --duration 30 --baseline baseline.json
+    python benchmark_mock.py --corpus corpus-100k.jsonl --load direct --concurrency 32
+    python benchmark_mock.py --base-url http://localhost:8000 --documents 1k
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+# Add the backend directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_synthetic_corpus import CorpusGenerator, parse_size
+
+OPERATIONS = ("create", "get", "full_text", "semantic", "similar", "fetch")
+DEFAULT_MIX = "create=5,get=40,full_text=20,semantic=15,similar=10,fetch=10"
+
+# Number of titles and words kept from the corpus to build queries from
+QUERY_POOL_SIZE = 1000
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse an operation mix such as get=40,full_text=20 into weights."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise argparse.ArgumentTypeError(f"Unknown operation: {name}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for {name}: {weight}")
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+def percentile(values: List[float], q: float) -> float:
+    """Get the q-th percentile of sorted values, using the nearest rank."""
+    if not values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+def summarize_latencies(latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+    """Get the count, throughput and latency percentiles, in milliseconds, of an operation."""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "errors": errors,
+        "throughput": len(values) / duration if duration > 0 else 0.0,
+        "mean_ms": sum(values) / len(values) * 1000 if values else 0.0,
+        "p50_ms": percentile(values, 50) * 1000,
+        "p95_ms": percentile(values, 95) * 1000,
+        "p99_ms": percentile(values, 99) * 1000,
+        "max_ms": values[-1] * 1000 if values else 0.0,
+    }
+
+def compare_to_baseline(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[Dict[str, Any]]:
+    """
+    Compare the results of a run with a baseline run.
+
+    Args:
+        results: The results of this run.
+        baseline: The results of the baseline run.
+        tolerance: The relative change that is not yet a regression, e.g. 0.1 for 10%.
+
+    Returns:
+        One entry per operation and metric, with the relative change and whether it
+        is a regression: higher latency percentiles or lower throughput.
+    """
+    comparison = []
+    for operation, current in results["operations"].items():
+        previous = baseline.get("operations", {}).get(operation)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "throughput"):
+            if not previous.get(metric):
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            regression = change < -tolerance if metric == "throughput" else change > tolerance
+            comparison.append({
+                "operation": operation,
+                "metric": metric,
+                "baseline": previous[metric],
+                "current": current[metric],
+                "change": change,
+                "regression": regression,
+            })
+    return comparison
+
+class Workload:
+    """Builds the requests of the benchmark from the documents loaded so far."""
+
+    def __init__(self, generator: CorpusGenerator, seed: int):
+        self.generator = generator
+        self.rng = random.Random(seed)
+        self.document_ids: List[str] = []
+        self.titles: List[str] = []
+        self.words: List[str] = []
+        self.seen = 0
+        self.created = 0
+
+    def add(self, document_id: str, document: Dict[str, Any]) -> None:
+        """Remember a loaded document, keeping a uniform sample of titles and words for queries."""
+        self.document_ids.append(document_id)
+        self.seen += 1
+        if len(self.titles) < QUERY_POOL_SIZE:
+            self.titles.append(document["title"])
+            self.words.append(self._pick_word(document))
+            return
+
+        # Reservoir sampling, so queries come from the whole corpus
+        slot = self.rng.randrange(self.seen)
+        if slot < QUERY_POOL_SIZE:
+            self.titles[slot] = document["title"]
+            self.words[slot] = self._pick_word(document)
+
+    def next_document(self) -> Dict[str, Any]:
+        """Generate a new document to create."""
+        self.created += 1
+        return next(self.generator.generate(1, start=10**9 + self.created))
+
+    def _pick_word(self, document: Dict[str, Any]) -> str:
+        return self.rng.choice(document["content"].split()).strip(".").lower()
+
+    async def run(self, client: httpx.AsyncClient, operation: str, rng: random.Random) -> httpx.Response:
+        """Send the request of an operation."""
+        if operation == "create":
+            document = self.next_document()
+            response = await client.post("/api/documents", json=document)
+            if response.status_code == 201:
+                self.add(response.json()["id"], document)
+            return response
+        if operation == "get":
+            return await client.get(f"/api/documents/{rng.choice(self.document_ids)}")
+        if operation == "full_text":
+            return await client.get("/api/documents", params={"query": rng.choice(self.words), "limit": 10})
+        if operation == "semantic":
+            params = {"query": rng.choice(self.titles), "semantic": "true", "limit": 10}
+            return await client.get("/api/documents", params=params)
+        if operation == "similar":
+            return await client.get(f"/api/documents/{rng.choice(self.document_ids)}/similar", params={"limit": 10})
+        if operation == "fetch":
+            url = f"https://example.com/page/{rng.randrange(10_000)}"
+            return await client.post("/api/web/fetch", params={"url": url, "save": "false"})
+        raise ValueError(f"Unknown operation: {operation}")
+
+def read_corpus(path: str, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Read documents from a JSON lines file."""
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f):
+            if limit is not None and number >= limit:
+                break
+            if line.strip():
+                yield json.loads(line)
+
+async def load_through_api(
+    client: httpx.AsyncClient, documents: Iterator[Dict[str, Any]], workload: Workload, concurrency: int
+) -> int:
+    """Load documents by creating them through the API."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    loaded = 0
+
+    async def worker():
+        nonlocal loaded
+        while True:
+            document = await queue.get()
+            if document is None:
+                return
+            response = await client.post("/api/documents", json=document)
+            response.raise_for_status()
+            workload.add(response.json()["id"], document)
+            loaded += 1
+            if loaded % 10_000 == 0:
+                print(f"Loaded {loaded} documents", file=sys.stderr)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    for document in documents:
+        await queue.put(document)
+    for _ in workers:
+        await queue.put(None)
+    await asyncio.gather(*workers)
+    return loaded
+
+async def load_directly(documents: Iterator[Dict[str, Any]], workload: Workload) -> int:
+    """Load documents straight into the in-process mock services, skipping HTTP."""
+    from app.api import routes_mock
+    from app.models.document import DocumentCreate
+
+    # Recomputing the best suggestions along the path of every inserted term dominates a
+    # bulk load, so the suggestion trie is rebuilt once at the end instead
+    trie = routes_mock.document_service.suggestions.trie
+    trie.deferred = True
+    loaded = 0
+    try:
+        for document in documents:
+            embedding = await routes_mock.embedding_service.generate_embedding(document["content"])
+            created = await routes_mock.document_service.create_document(DocumentCreate(**document), embedding)
+            workload.add(created.id, document)
+            loaded += 1
+            if loaded % 10_000 == 0:
+                print(f"Loaded {loaded} documents", file=sys.stderr)
+    finally:
+        trie.deferred = False
+        trie.rebuild()
+    return loaded
+
+async def run_workload(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    mix: Dict[str, float],
+    concurrency: int,
+    duration: float,
+    warmup: float,
+    seed: int,
+) -> Dict[str, Any]:
+    """Run the mixed workload and collect the latencies of each operation."""
+    operations = list(mix)
+    weights = [mix[name] for name in operations]
+    latencies: Dict[str, List[float]] = {name: [] for name in operations}
+    errors: Dict[str, int] = {name: 0 for name in operations}
+    statuses: Dict[str, Dict[str, int]] = {name: {} for name in operations}
+
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    async def worker(number: int):
+        rng = random.Random(seed + number)
+        while True:
+            operation = rng.choices(operations, weights)[0]
+            request_start = time.perf_counter()
+            if request_start >= deadline:
+                return
+            try:
+                response = await workload.run(client, operation, rng)
+                status = str(response.status_code)
+                failed = response.status_code >= 400
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+                failed = True
+            latency = time.perf_counter() - request_start
+
+            # Requests that started during the warm-up are not measured
+            if request_start < measure_from:
+                continue
+            statuses[operation][status] = statuses[operation].get(status, 0) + 1
+            if failed:
+                errors[operation] += 1
+            else:
+                latencies[operation].append(latency)
+
+    await asyncio.gather(*(worker(number) for number in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+
+    results = {name: summarize_latencies(latencies[name], errors[name], elapsed) for name in operations}
+    for name in operations:
+        results[name]["statuses"] = statuses[name]
+    total = summarize_latencies([value for name in operations for value in latencies[name]],
+                                sum(errors.values()), elapsed)
+    return {"operations": results, "total": total, "duration": elapsed}
+
+def print_report(results: Dict[str, Any], comparison: Optional[List[Dict[str, Any]]]) -> None:
+    """Print the results as a table, with the changes against the baseline if there is one."""
+    print(f"{'operation':<10} {'count':>8} {'errors':>7} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+          file=sys.stderr)
+    rows = dict(results["operations"], total=results["total"])
+    for name, stats in rows.items():
+        print(
+            f"{name:<10} {stats['count']:>8} {stats['errors']:>7} {stats['throughput']:>9.1f} "
+            f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}",
+            file=sys.stderr,
+        )
+
+    if comparison is None:
+        return
+    regressions = [entry for entry in comparison if entry["regression"]]
+    print(f"\n{len(regressions)} regressions against the baseline", file=sys.stderr)
+    for entry in regressions:
+        print(
+            f"  {entry['operation']} {entry['metric']}: {entry['baseline']:.2f} -> {entry['current']:.2f} "
+            f"({entry['change']:+.1%})",
+            file=sys.stderr,
+        )
+
+async def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    generator = CorpusGenerator(seed=args.seed)
+    workload = Workload(generator, args.seed)
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    else:
+        from main_mock import app
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=args.timeout
+        )
+
+    if args.corpus:
+        documents = read_corpus(args.corpus, args.documents)
+    else:
+        documents = generator.generate(args.documents or parse_size("1k"))
+
+    async with client:
+        load_start = time.perf_counter()
+        if args.load == "direct":
+            loaded = await load_directly(documents, workload)
+        else:
+            loaded = await load_through_api(client, documents, workload, args.concurrency)
+        load_seconds = time.perf_counter() - load_start
+        print(f"Loaded {loaded} documents in {load_seconds:.1f} seconds", file=sys.stderr)
+
+        if not workload.document_ids:
+            raise SystemExit("The corpus is empty")
+
+        results = await run_workload(
+            client, workload, args.mix, args.concurrency, args.duration, args.warmup, args.seed
+        )
+
+    results["load"] = {
+        "mode": args.load,
+        "documents": loaded,
+        "seconds": load_seconds,
+        "documents_per_second": loaded / load_seconds if load_seconds > 0 else 0.0,
+    }
+    results["benchmark"] = {
+        "target": args.base_url or "in-process",
+        "corpus": args.corpus or "generated",
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "warmup": args.warmup,
+        "mix": args.mix,
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API against the mock backend")
+    parser.add_argument("--documents", type=parse_size,
+                        help="Number of documents to load, e.g. 1k, 100k or 1m (default: 1k, or the whole corpus)")
+    parser.add_argument("--corpus", help="JSON lines corpus written by generate_synthetic_corpus.py")
+    parser.add_argument("--load", choices=("api", "direct"), default="api",
+                        help="Load the corpus through the API, or directly into the in-process mock services")
+    parser.add_argument("--base-url", help="Benchmark a running server instead of the in-process mock app")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--duration", type=float, default=30, help="Measured duration, in seconds")
+    parser.add_argument("--warmup", type=float, default=2, help="Unmeasured warm-up, in seconds")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout, in seconds")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", help="Write the results as JSON to this file (default: standard output)")
+    parser.add_argument("--baseline", help="Compare with the JSON results of an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change that counts as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    if args.load == "direct" and args.base_url:
+        parser.error("--load direct only works with the in-process mock app")
+    if not args.mix:
+        parser.error("--mix has no operations")
+
+    results = asyncio.run(benchmark(args))
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            comparison = compare_to_baseline(results, json.load(f), args.tolerance)
+        results["comparison"] = {"baseline": args.baseline, "tolerance": args.tolerance, "metrics": comparison}
+
+    print_report(results, comparison)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    # Fail when there are regressions, so the benchmark can gate changes
+    if comparison and any(entry["regression"] for entry in comparison):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
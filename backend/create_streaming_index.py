@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 """
 Script to create a new Vertex AI Vector Search index with streaming updates enabled.
+Use evaluate_ann.py to choose the index settings for the size of the corpus.
 """
 
 import os
 import sys
+import argparse
 from google.cloud import aiplatform
 from google.cloud.aiplatform.matching_engine import matching_engine_index_config
 
@@ -16,7 +18,7 @@ from app.core.config import (
     VERTEX_AI_INDEX_ENDPOINT, VERTEX_AI_INDEX
 )
 
-def main():
+def main(args):
     """Create a new Vertex AI Vector Search index with streaming updates enabled."""
     print("Initializing Vertex AI...")
     aiplatform.init(
@@ -35,12 +37,11 @@ def main():
             print(f"\nUsing index as template: {old_index.name}")
             print(f"Resource name: {old_index.resource_name}")
             
-            # Use hardcoded values from the check_index_config.py output
             dimensions = 768  # Changed from 1024 to 768
-            approximate_neighbors_count = 5
             distance_measure_type = "DOT_PRODUCT_DISTANCE"
-            leaf_node_embedding_count = 1000
-            leaf_nodes_to_search_percent = 5
+            approximate_neighbors_count = args.approximate_neighbors_count
+            leaf_node_embedding_count = args.leaf_node_embedding_count
+            leaf_nodes_to_search_percent = args.leaf_nodes_to_search_percent
             
             # Print the configuration
             print("\nUsing configuration:")
@@ -87,4 +88,13 @@ def main():
         print(f"Error listing indexes: {e}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Create a Vertex AI Vector Search index with streaming updates")
+    parser.add_argument("--approximate-neighbors-count", type=int, default=5,
+                        help="Candidates found before exact reordering; should be at least the search limit")
+    parser.add_argument("--leaf-node-embedding-count", type=int, default=1000,
+                        help="Average number of embeddings per leaf node")
+    parser.add_argument("--leaf-nodes-to-search-percent", type=int, default=5,
+                        help="Percentage of leaf nodes searched per query")
+    args = parser.parse_args()
+    
+    main(args)
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+"""
+Script to evaluate approximate nearest neighbour (ANN) index settings.
+
+Exact top-k neighbours are computed by brute force over a set of embeddings, then each
+backend and parameter set is scored by recall@k against them and by query latency.
+The output lists every configuration and the recall/latency frontier: the
+configurations that no other one beats on both recall and latency.
+
+Backends:
+    exact   Brute force; the latency baseline.
+    ivf     A local model of the Vertex AI Tree-AH index: embeddings are clustered into
+            leaves of about leaf_node_embedding_count embeddings, a query searches the
+            closest leaf_nodes_to_search_percent of the leaves with int8-quantized
+            scores, and the best approximate_neighbors_count candidates are reordered
+            by exact score. The parameters map directly to create_tree_ah_index().
+    vertex  A deployed Vertex AI index, queried with find_neighbors(). The index must
+            hold the same embeddings as the evaluated set, i.e. use --source firestore.
+            The held-out queries are in the deployed index too, so vertex is scored
+            against all embeddings with each query's own embedding left out.
+
+The recommended configuration is the fastest ivf or vertex one that reaches the target recall.
+
+Examples:
+    python evaluate_ann.py --source synthetic --documents 100k
+    python evaluate_ann.py --source firestore --backends ivf,vertex --output ann.json
+    python evaluate_ann.py --source npy --embeddings vectors.npy --leaf-sizes 500,1000 --k 20
+"""
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Add the backend directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_synthetic_corpus import CorpusGenerator, parse_size
+
+# Number of k-means iterations used to build the leaves of the ivf backend
+KMEANS_ITERATIONS = 10
+# Maximum number of embeddings k-means is trained on
+KMEANS_SAMPLE_SIZE = 50_000
+# Number of query embeddings scored at once when computing the ground truth
+GROUND_TRUTH_BATCH_SIZE = 256
+# Backends that can be evaluated; all but exact are approximate
+BACKENDS = ("exact", "ivf", "vertex")
+
+def parse_list(value: str, cast=int) -> List[Any]:
+    """Parse a comma-separated list of numbers."""
+    try:
+        return [cast(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid list: {value}")
+
+def parse_backends(value: str) -> List[str]:
+    """Parse a comma-separated list of backend names."""
+    backends = [item.strip() for item in value.split(",") if item.strip()]
+    unknown = [backend for backend in backends if backend not in BACKENDS]
+    if unknown or not backends:
+        raise argparse.ArgumentTypeError(
+            f"Invalid backends: {value} (choose from {', '.join(BACKENDS)})"
+        )
+    return backends
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors to unit length, so the dot product is the cosine similarity."""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Get the indices of the k highest scores of each row, highest first."""
+    k = min(k, scores.shape[-1])
+    top = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=-1), axis=-1)
+    return np.take_along_axis(top, order, axis=-1)
+
+def ground_truth(vectors: np.ndarray, queries: np.ndarray, k: int,
+                 exclude: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Compute the exact top-k neighbours of each query by brute force.
+
+    Args:
+        vectors: The embeddings to search.
+        queries: The query embeddings.
+        k: The number of neighbours per query.
+        exclude: For each query, a row of vectors that is never a neighbour, such as
+            the query's own embedding.
+    """
+    results = []
+    for start in range(0, len(queries), GROUND_TRUTH_BATCH_SIZE):
+        scores = queries[start:start + GROUND_TRUTH_BATCH_SIZE] @ vectors.T
+        if exclude is not None:
+            scores[np.arange(len(scores)), exclude[start:start + GROUND_TRUTH_BATCH_SIZE]] = -np.inf
+        results.append(top_k(scores, k))
+    return np.concatenate(results)
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray, k: int) -> float:
+    """Get the average fraction of the true top-k neighbours that were found."""
+    hits = [len(set(result[:k]) & set(expected[:k].tolist())) for result, expected in zip(found, truth)]
+    return sum(hits) / (len(truth) * k)
+
+def latency_stats(latencies: List[float]) -> Dict[str, float]:
+    """Get latency percentiles in milliseconds and the queries per second."""
+    values = np.array(latencies) * 1000
+    return {
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "qps": len(values) / (values.sum() / 1000) if values.sum() > 0 else 0.0,
+    }
+
+class ExactBackend:
+    """Brute-force search over all embeddings."""
+
+    name = "exact"
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def search(self, query: np.ndarray, k: int) -> List[int]:
+        return top_k(self.vectors @ query, k).tolist()
+
+class IVFBackend:
+    """
+    Inverted-file index with quantized scoring and exact reordering, modelled on Tree-AH.
+
+    The leaves are built once per leaf size; the search parameters are varied per query
+    run, as with the per-query overrides of a deployed Vertex AI index.
+    """
+
+    name = "ivf"
+
+    def __init__(self, vectors: np.ndarray, leaf_node_embedding_count: int, seed: int = 42):
+        """
+        Build the leaves.
+
+        Args:
+            vectors: The normalized embeddings to index.
+            leaf_node_embedding_count: The average number of embeddings per leaf.
+            seed: Seed of the k-means initialization.
+        """
+        self.vectors = vectors
+        self.leaf_node_embedding_count = leaf_node_embedding_count
+        self.leaves = max(len(vectors) // leaf_node_embedding_count, 1)
+
+        rng = np.random.default_rng(seed)
+        self.centroids = self._kmeans(vectors, self.leaves, rng)
+        assignments = self._assign(vectors, self.centroids)
+
+        # Store each leaf contiguously, so a leaf is a slice of the sorted arrays
+        self.order = np.argsort(assignments, kind="stable")
+        self.offsets = np.searchsorted(assignments[self.order], np.arange(self.leaves + 1))
+        sorted_vectors = vectors[self.order]
+
+        # Symmetric int8 quantization per dimension stands in for asymmetric hashing
+        self.scale = np.abs(sorted_vectors).max(axis=0) / 127
+        self.scale[self.scale == 0] = 1
+        self.quantized = np.round(sorted_vectors / self.scale).astype(np.int8)
+        self.sorted_vectors = sorted_vectors
+
+    def search(self, query: np.ndarray, k: int, leaf_nodes_to_search_percent: float,
+               approximate_neighbors_count: int) -> List[int]:
+        """
+        Find the approximate top-k neighbours of a query.
+
+        Args:
+            query: The normalized query embedding.
+            k: The number of neighbours to return.
+            leaf_nodes_to_search_percent: The percentage of leaves to search.
+            approximate_neighbors_count: The number of candidates, by quantized score,
+                that are reordered by exact score.
+        """
+        probes = max(int(math.ceil(self.leaves * leaf_nodes_to_search_percent / 100)), 1)
+        leaves = top_k(self.centroids @ query, probes)
+
+        rows = np.concatenate([np.arange(self.offsets[leaf], self.offsets[leaf + 1]) for leaf in leaves])
+        if len(rows) == 0:
+            return []
+
+        approximate_scores = self.quantized[rows].astype(np.float32) @ (query * self.scale)
+        candidates = rows[top_k(approximate_scores, approximate_neighbors_count)]
+
+        exact_scores = self.sorted_vectors[candidates] @ query
+        best = candidates[top_k(exact_scores, k)]
+        return self.order[best].tolist()
+
+    def _kmeans(self, vectors: np.ndarray, clusters: int, rng: np.random.Generator) -> np.ndarray:
+        """Spherical k-means on a sample of the embeddings."""
+        sample = vectors
+        if len(vectors) > KMEANS_SAMPLE_SIZE:
+            sample = vectors[rng.choice(len(vectors), KMEANS_SAMPLE_SIZE, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), clusters, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            assignments = self._assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            # Empty clusters keep their previous centroid
+            empty = np.bincount(assignments, minlength=clusters) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize(sums)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        return np.concatenate([
+            np.argmax(vectors[start:start + batch_size] @ centroids.T, axis=1)
+            for start in range(0, len(vectors), batch_size)
+        ])
+
+class VertexBackend:
+    """A deployed Vertex AI Vector Search index."""
+
+    name = "vertex"
+
+    def __init__(self, index_endpoint: str, deployed_index_id: str, ids: List[str]):
+        """
+        Connect to the index endpoint.
+
+        Args:
+            index_endpoint: The resource name of the index endpoint.
+            deployed_index_id: The ID of the deployed index.
+            ids: The document ID of each evaluated embedding, to map results back.
+        """
+        from google.cloud import aiplatform
+        from app.core.config import GOOGLE_CLOUD_PROJECT, GOOGLE_CLOUD_REGION
+
+        aiplatform.init(project=GOOGLE_CLOUD_PROJECT, location=GOOGLE_CLOUD_REGION)
+        self.endpoint = aiplatform.MatchingEngineIndexEndpoint(index_endpoint_name=index_endpoint)
+        self.deployed_index_id = deployed_index_id
+        self.rows = {document_id: row for row, document_id in enumerate(ids)}
+
+    def search(self, query: np.ndarray, k: int, leaf_nodes_to_search_percent: Optional[float] = None,
+               approximate_neighbors_count: Optional[int] = None) -> List[int]:
+        kwargs = {}
+        if leaf_nodes_to_search_percent is not None:
+            kwargs["fraction_leaf_nodes_to_search_override"] = leaf_nodes_to_search_percent / 100
+        if approximate_neighbors_count is not None:
+            kwargs["approx_num_neighbors"] = approximate_neighbors_count
+
+        response = self.endpoint.find_neighbors(
+            deployed_index_id=self.deployed_index_id,
+            queries=[query.tolist()],
+            num_neighbors=k,
+            **kwargs,
+        )
+        # Neighbours that are not in the evaluated set count as misses
+        return [self.rows.get(neighbor.id, -1) for neighbor in response[0]]
+
+def load_synthetic(documents: int, seed: int) -> Tuple[List[str], np.ndarray]:
+    """Embed a synthetic corpus with the feature-hashing embedder of the mock services."""
+    from app.services.embedding_service_mock import FeatureHashingEmbedder
+
+    embedder = FeatureHashingEmbedder()
+    generator = CorpusGenerator(seed=seed)
+    ids, vectors = [], np.empty((documents, embedder.dimensions), dtype=np.float32)
+    for row, document in enumerate(generator.generate(documents)):
+        ids.append(document["url"])
+        vectors[row] = embedder.embed(f"{document['title']} {document['content']}")
+        if (row + 1) % 10_000 == 0:
+            print(f"Embedded {row + 1}/{documents} documents", file=sys.stderr)
+    return ids, vectors
+
+def load_firestore() -> Tuple[List[str], np.ndarray]:
+    """Read the stored embeddings of all documents from Firestore."""
+    from app.services.document_service import DocumentService
+
+    document_service = DocumentService()
+    ids, vectors = [], []
+    for doc in document_service.collection.select(["embedding"]).stream():
+        embedding = doc.to_dict().get("embedding")
+        if embedding:
+            ids.append(doc.id)
+            vectors.append(embedding)
+    return ids, np.array(vectors, dtype=np.float32)
+
+def load_npy(path: str) -> Tuple[List[str], np.ndarray]:
+    """Read embeddings from a .npy file; their IDs are their row numbers."""
+    vectors = np.load(path).astype(np.float32)
+    return [str(row) for row in range(len(vectors))], vectors
+
+def run_queries(search, queries: np.ndarray, truth: np.ndarray, k: int,
+                exclude: Optional[np.ndarray] = None, **params) -> Dict[str, Any]:
+    """
+    Run every query through a backend and measure recall@k and latency.
+
+    With exclude, each query's row in it is dropped from the query's results; one more
+    neighbour is asked for to make up for it.
+    """
+    found, latencies = [], []
+    for row, query in enumerate(queries):
+        start = time.perf_counter()
+        if exclude is None:
+            found.append(search(query, k, **params))
+        else:
+            found.append([match for match in search(query, k + 1, **params) if match != exclude[row]][:k])
+        latencies.append(time.perf_counter() - start)
+    return {"recall": recall_at_k(found, truth, k), **latency_stats(latencies)}
+
+def frontier(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Get the configurations that no other configuration beats on both recall and p95 latency."""
+    ordered = sorted(results, key=lambda result: (result["p95_ms"], -result["recall"]))
+    best_recall = -1.0
+    optimal = []
+    for result in ordered:
+        if result["recall"] > best_recall:
+            optimal.append(result)
+            best_recall = result["recall"]
+    return optimal
+
+def evaluate(args: argparse.Namespace) -> Dict[str, Any]:
+    print(f"Loading embeddings from {args.source}...", file=sys.stderr)
+    if args.source == "synthetic":
+        ids, vectors = load_synthetic(args.documents, args.seed)
+    elif args.source == "firestore":
+        ids, vectors = load_firestore()
+    else:
+        ids, vectors = load_npy(args.embeddings)
+    if len(vectors) <= args.queries:
+        raise SystemExit(f"Need more than {args.queries} embeddings, found {len(vectors)}")
+
+    # Queries are held-out embeddings, so the local backends search the other embeddings
+    rng = np.random.default_rng(args.seed)
+    all_vectors = normalize(vectors)
+    query_rows = rng.choice(len(all_vectors), args.queries, replace=False)
+    queries = all_vectors[query_rows]
+    keep = np.ones(len(all_vectors), dtype=bool)
+    keep[query_rows] = False
+    vectors = all_vectors[keep]
+
+    print(f"Computing exact top-{args.k} for {len(queries)} queries over {len(vectors)} embeddings...",
+          file=sys.stderr)
+    truth = ground_truth(vectors, queries, args.k)
+
+    results = []
+    if "exact" in args.backends:
+        backend = ExactBackend(vectors)
+        results.append({"backend": "exact", "params": {}, **run_queries(backend.search, queries, truth, args.k)})
+
+    if "ivf" in args.backends:
+        for leaf_size in args.leaf_sizes:
+            start = time.perf_counter()
+            backend = IVFBackend(vectors, leaf_size, seed=args.seed)
+            build_seconds = time.perf_counter() - start
+            print(f"Built {backend.leaves} leaves of ~{leaf_size} embeddings in {build_seconds:.1f} seconds",
+                  file=sys.stderr)
+
+            for percent, approximate in itertools.product(args.search_percents, args.approximate_neighbors):
+                params = {"leaf_nodes_to_search_percent": percent, "approximate_neighbors_count": approximate}
+                result = run_queries(backend.search, queries, truth, args.k, **params)
+                results.append({
+                    "backend": "ivf",
+                    "params": {"leaf_node_embedding_count": leaf_size, **params},
+                    "build_seconds": build_seconds,
+                    **result,
+                })
+
+    if "vertex" in args.backends:
+        # The deployed index holds every embedding, queries included, so it is scored
+        # against the full set with each query's own embedding left out of both sides
+        print(f"Computing exact top-{args.k} over all {len(all_vectors)} embeddings for vertex...",
+              file=sys.stderr)
+        vertex_truth = ground_truth(all_vectors, queries, args.k, exclude=query_rows)
+        backend = VertexBackend(args.index_endpoint, args.deployed_index_id, ids)
+        for percent, approximate in itertools.product(args.search_percents, args.approximate_neighbors):
+            params = {"leaf_nodes_to_search_percent": percent, "approximate_neighbors_count": approximate}
+            results.append({
+                "backend": "vertex",
+                "params": params,
+                **run_queries(backend.search, queries, vertex_truth, args.k, exclude=query_rows, **params),
+            })
+
+    optimal = frontier(results)
+    # Exact search is the baseline, not a setting to deploy
+    approximate_results = frontier([result for result in results if result["backend"] != "exact"])
+    recommendation = next((result for result in approximate_results if result["recall"] >= args.target_recall), None)
+    return {
+        "dataset": {"source": args.source, "embeddings": len(vectors), "queries": len(queries),
+                    "dimensions": int(vectors.shape[1])},
+        "k": args.k,
+        "target_recall": args.target_recall,
+        "results": results,
+        "frontier": optimal,
+        "recommendation": recommendation,
+    }
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Print the frontier and the recommended configuration."""
+    k = report["k"]
+    print(f"\nRecall/latency frontier (recall@{k}):", file=sys.stderr)
+    print(f"{'backend':<8} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'qps':>8}  params", file=sys.stderr)
+    for result in report["frontier"]:
+        params = ", ".join(f"{name}={value}" for name, value in result["params"].items())
+        print(
+            f"{result['backend']:<8} {result['recall']:>7.3f} {result['p50_ms']:>8.2f} "
+            f"{result['p95_ms']:>8.2f} {result['qps']:>8.0f}  {params}",
+            file=sys.stderr,
+        )
+
+    recommendation = report["recommendation"]
+    if recommendation is None:
+        print(f"\nNo approximate configuration reached recall@{k} of {report['target_recall']}", file=sys.stderr)
+    else:
+        print(f"\nFastest approximate configuration with recall@{k} >= {report['target_recall']}: "
+              f"{recommendation['backend']} {recommendation['params']}", file=sys.stderr)
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate recall@k and latency of ANN index settings")
+    parser.add_argument("--source", choices=("synthetic", "firestore", "npy"), default="synthetic",
+                        help="Where the embeddings come from")
+    parser.add_argument("--documents", type=parse_size, default=parse_size("100k"),
+                        help="Number of synthetic documents, e.g. 5000, 5k, 100k or 1m")
+    parser.add_argument("--embeddings", help="The .npy file to read with --source npy")
+    parser.add_argument("--backends", type=parse_backends, default=["exact", "ivf"],
+                        help="Comma-separated backends: exact, ivf, vertex (default: exact,ivf)")
+    parser.add_argument("--k", type=int, default=10, help="Number of neighbours per query")
+    parser.add_argument("--queries", type=int, default=200, help="Number of held-out queries")
+    parser.add_argument("--leaf-sizes", type=parse_list, default=[250, 500, 1000, 2000],
+                        help="leaf_node_embedding_count values to build")
+    parser.add_argument("--search-percents", type=lambda value: parse_list(value, float), default=[1, 2, 5, 10, 20],
+                        help="leaf_nodes_to_search_percent values to try")
+    parser.add_argument("--approximate-neighbors", type=parse_list, default=[5, 10, 50, 150],
+                        help="approximate_neighbors_count values to try")
+    parser.add_argument("--target-recall", type=float, default=0.95,
+                        help="Recall@k the recommended configuration must reach")
+    parser.add_argument("--index-endpoint", help="Index endpoint resource name for the vertex backend")
+    parser.add_argument("--deployed-index-id", help="Deployed index ID for the vertex backend")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--output", help="Write the report as JSON to this file (default: standard output)")
+    args = parser.parse_args()
+
+    if args.source == "npy" and not args.embeddings:
+        parser.error("--source npy requires --embeddings")
+    if "vertex" in args.backends:
+        from app.core.config import VERTEX_AI_INDEX_ENDPOINT
+        args.index_endpoint = args.index_endpoint or VERTEX_AI_INDEX_ENDPOINT
+        if not args.index_endpoint or not args.deployed_index_id:
+            parser.error("the vertex backend requires --index-endpoint and --deployed-index-id")
+
+    report = evaluate(args)
+    print_report(report)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
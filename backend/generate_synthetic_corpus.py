@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Script to generate a synthetic document corpus for benchmarks.
+
+Documents are written as JSON lines in the shape of DocumentCreate. The text is made
+of invented words drawn from per-topic vocabularies with a Zipf-like distribution, so
+that full-text queries hit a realistic share of the corpus and documents on the same
+topic resemble each other. The same seed always produces the same corpus.
+
+Examples:
+    python generate_synthetic_corpus.py --documents 1k --output corpus-1k.jsonl
+    python generate_synthetic_corpus.py --documents 1m --output corpus-1m.jsonl --mean-words 150
+"""
+
+import argparse
+import datetime
+import json
+import random
+import sys
+from typing import Any, Dict, Iterator, List
+
+# Suffixes that multiply corpus sizes, as in 5k or 1m
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+SYLLABLES = [
+    "ka", "lo", "mi", "ra", "ve", "to", "su", "ne", "pa", "di", "go", "ber", "tan", "qui",
+    "lex", "mor", "vin", "sol", "dra", "fen", "gal", "hor", "jun", "kel", "nor", "pix",
+]
+
+def parse_size(value: str) -> int:
+    """Parse a corpus size such as 1000, 5k or 1m."""
+    number = value.strip().lower()
+    multiplier = SIZE_SUFFIXES.get(number[-1:], 1)
+    if multiplier > 1:
+        number = number[:-1]
+    if not number.isdigit() or int(number) == 0:
+        raise argparse.ArgumentTypeError(f"Invalid corpus size: {value}")
+    return int(number) * multiplier
+
+class CorpusGenerator:
+    """Generates synthetic documents from a fixed seed."""
+
+    def __init__(self, seed: int = 42, topics: int = 50, topic_words: int = 400, common_words: int = 2000,
+                 mean_words: int = 300):
+        """
+        Initialize the corpus generator.
+
+        Args:
+            seed: The seed of the random number generator.
+            topics: The number of topics documents are drawn from.
+            topic_words: The size of the vocabulary of each topic.
+            common_words: The size of the vocabulary shared by all topics.
+            mean_words: The average number of words per document.
+        """
+        self.rng = random.Random(seed)
+        self.mean_words = mean_words
+
+        words = self._make_words(common_words + topics * topic_words)
+        self.common_words = words[:common_words]
+        self.topics = [
+            {
+                "name": self._make_word(3),
+                "words": words[common_words + i * topic_words:common_words + (i + 1) * topic_words],
+            }
+            for i in range(topics)
+        ]
+
+        # Zipf-like weights: the n-th word is 1/n as frequent as the first
+        self.common_weights = self._zipf_weights(common_words)
+        self.topic_weights = self._zipf_weights(topic_words)
+        self.topic_popularity = self._zipf_weights(topics)
+
+    def generate(self, count: int, start: int = 0) -> Iterator[Dict[str, Any]]:
+        """
+        Generate documents.
+
+        Args:
+            count: The number of documents to generate.
+            start: The number of the first document, used in its URL.
+
+        Yields:
+            Documents in the shape of DocumentCreate.
+        """
+        base_date = datetime.datetime(2024, 1, 1)
+        for number in range(start, start + count):
+            # Some topics are much more popular than others
+            topic = self.rng.choices(self.topics, weights=self.topic_popularity)[0]
+            words = self._words(topic, max(int(self.rng.lognormvariate(0, 0.5) * self.mean_words), 10))
+            title = " ".join(self.rng.choices(topic["words"][:50], k=self.rng.randint(3, 7))).capitalize()
+            content = self._sentences(words)
+            date = base_date + datetime.timedelta(minutes=number)
+
+            yield {
+                "title": title,
+                "content": content,
+                "url": f"https://example.com/{topic['name']}/{number}",
+                "summary": self._sentences(words[:25]),
+                "metadata": {"source": "synthetic", "topic": topic["name"]},
+                "tags": [topic["name"]] + self.rng.sample(topic["words"][:20], 2),
+                "category": topic["name"],
+                "author": f"author-{self.rng.randint(1, 500)}",
+                "date": date.isoformat(),
+            }
+
+    def _words(self, topic: Dict[str, Any], count: int) -> List[str]:
+        # About a third of the words are specific to the topic
+        topic_count = count // 3
+        words = self.rng.choices(topic["words"], weights=self.topic_weights, k=topic_count)
+        words += self.rng.choices(self.common_words, weights=self.common_weights, k=count - topic_count)
+        self.rng.shuffle(words)
+        return words
+
+    def _sentences(self, words: List[str]) -> str:
+        sentences = []
+        i = 0
+        while i < len(words):
+            length = self.rng.randint(6, 20)
+            sentences.append(" ".join(words[i:i + length]).capitalize() + ".")
+            i += length
+        return " ".join(sentences)
+
+    def _make_words(self, count: int) -> List[str]:
+        words = set()
+        while len(words) < count:
+            words.add(self._make_word(self.rng.randint(2, 4)))
+        # Sort before shuffling so the result does not depend on set ordering
+        words = sorted(words)
+        self.rng.shuffle(words)
+        return words
+
+    def _make_word(self, syllables: int) -> str:
+        return "".join(self.rng.choice(SYLLABLES) for _ in range(syllables))
+
+    @staticmethod
+    def _zipf_weights(count: int) -> List[float]:
+        return [1 / rank for rank in range(1, count + 1)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic document corpus")
+    parser.add_argument("--documents", type=parse_size, default=parse_size("1k"),
+                        help="Number of documents, e.g. 1000, 5k, 100k or 1m")
+    parser.add_argument("--output", help="Output JSON lines file (default: standard output)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--topics", type=int, default=50, help="Number of topics")
+    parser.add_argument("--mean-words", type=int, default=300, help="Average number of words per document")
+    args = parser.parse_args()
+
+    generator = CorpusGenerator(seed=args.seed, topics=args.topics, mean_words=args.mean_words)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for number, document in enumerate(generator.generate(args.documents), start=1):
+            output.write(json.dumps(document) + "\n")
+            if args.output and number % 10_000 == 0:
+                print(f"Generated {number}/{args.documents} documents", file=sys.stderr)
+    finally:
+        if args.output:
+            output.close()
+
+    if args.output:
+        print(f"Wrote {args.documents} documents to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,78 @@
 import uvicorn
-import firebase_admin
-import time
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 
+from app.api.admin import router as admin_router
+from app.api.compression import CompressionMiddleware
+from app.api.dependencies import services
+from app.api.errors import quota_exceeded_handler
+from app.api.middleware import (
+    MetricsMiddleware, PriorityMiddleware, ProfilingMiddleware, RequestLoggingMiddleware,
+    TracingMiddleware, TrafficCaptureMiddleware
+)
 from app.api.routes import router as api_router
+from app.core import metrics
 from app.core.config import (
     API_TITLE, API_DESCRIPTION, API_VERSION, API_PREFIX,
-    HOST, PORT, DEBUG, CORS_ORIGINS, CORS_METHODS, CORS_HEADERS
+    HOST, PORT, DEBUG, CORS_ORIGINS, CORS_METHODS, CORS_HEADERS, TRAFFIC_CAPTURE_PATH,
+    LOOP_WATCHDOG_ENABLED, LOOP_SLOW_CALLBACK_SECONDS, COMPRESSION_ENABLED, COMPRESSION_MIN_BYTES,
+    COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
 )
+from app.core.profiling import LoopWatchdog
+from app.core.scheduler import QuotaExceededError
+from app.core.traffic import create_recorder
+
+# Log the stack of any callback that blocks the event loop
+loop_watchdog = LoopWatchdog(LOOP_SLOW_CALLBACK_SECONDS) if LOOP_WATCHDOG_ENABLED else None
 
-# Custom middleware to log requests
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Log the request as soon as it arrives
-        path = request.url.path
-        method = request.method
-        query_params = dict(request.query_params)
-        
-        # Print a brief summary of the request
-        print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] Request received: {method} {path}")
-        if query_params:
-            print(f"Query parameters: {query_params}")
-        
-        # Process the request
-        start_time = time.time()
-        response = await call_next(request)
-        process_time = time.time() - start_time
-        
-        # Log additional information after the request is completed
-        print(f"[{time.strftime('%Y-%m-%d %H:%M:%S')}] Request completed: {method} {path}")
-        print(f"Status code: {response.status_code}")
-        print(f"Processing time: {process_time:.4f} seconds")
-        
-        return response
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if loop_watchdog:
+        loop_watchdog.start()
+    # Create and warm up the services in the background, so the server starts
+    # accepting requests right away; /ready reports when warm-up has finished
+    services.start_warm_up()
+    yield
+    await services.close()
+    if loop_watchdog:
+        await loop_watchdog.stop()
+    if traffic_recorder:
+        traffic_recorder.close()
 
 app = FastAPI(
     title=API_TITLE,
     description=API_DESCRIPTION,
     version=API_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add request logging middleware
 app.add_middleware(RequestLoggingMiddleware)
 
+# Add request metrics middleware
+app.add_middleware(MetricsMiddleware)
+
+# Add Server-Timing and trace middleware
+app.add_middleware(TracingMiddleware)
+
+# Add request priority middleware, which decides the order of calls to provider quotas
+app.add_middleware(PriorityMiddleware)
+
+# Profile single admin requests that carry the profile header
+app.add_middleware(ProfilingMiddleware)
+
+# Compress responses with gzip or brotli, as the client prefers
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MIN_BYTES,
+        gzip_level=COMPRESSION_GZIP_LEVEL,
+        brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    )
+
 # Set up CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -54,9 +82,21 @@ app.add_middleware(
     allow_headers=CORS_HEADERS,
 )
 
+# Capture requests for replay when TRAFFIC_CAPTURE_PATH is set; added last, so the
+# captured durations cover all other middleware
+traffic_recorder = create_recorder(TRAFFIC_CAPTURE_PATH)
+if traffic_recorder:
+    app.add_middleware(TrafficCaptureMiddleware, recorder=traffic_recorder)
+
 # Include API routes
 app.include_router(api_router, prefix=API_PREFIX)
 
+# Include admin routes, which are disabled unless ADMIN_TOKEN is set
+app.include_router(admin_router)
+
+# Answer work shed by the provider quotas with 429 and Retry-After
+app.add_exception_handler(QuotaExceededError, quota_exceeded_handler)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Marchiver API"}
@@ -69,5 +109,18 @@ async def health_check():
 async def api_health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Report whether the services have finished warming up and none of them failed."""
+    # A worker that is not ready gets no requests, which would otherwise retry them
+    services.retry_failed()
+    status = services.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Expose metrics in the Prometheus text format."""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host=HOST, port=PORT, reload=DEBUG)
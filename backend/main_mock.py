@@ -4,21 +4,69 @@ Uses mock services instead of real ones.
 """
 
 import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
+from app.api.admin import router as admin_router
+from app.api.compression import CompressionMiddleware
+from app.api.errors import quota_exceeded_handler
+from app.api.middleware import (
+    MetricsMiddleware, PriorityMiddleware, ProfilingMiddleware, TracingMiddleware, TrafficCaptureMiddleware
+)
 from app.api.routes_mock import router as api_router
+from app.core import metrics
 from app.core.config import (
     API_TITLE, API_DESCRIPTION, API_VERSION, API_PREFIX,
-    HOST, PORT, DEBUG, CORS_ORIGINS, CORS_METHODS, CORS_HEADERS
+    HOST, PORT, DEBUG, CORS_ORIGINS, CORS_METHODS, CORS_HEADERS, TRAFFIC_CAPTURE_PATH,
+    LOOP_WATCHDOG_ENABLED, LOOP_SLOW_CALLBACK_SECONDS, COMPRESSION_ENABLED, COMPRESSION_MIN_BYTES,
+    COMPRESSION_GZIP_LEVEL, COMPRESSION_BROTLI_QUALITY
 )
+from app.core.profiling import LoopWatchdog
+from app.core.scheduler import QuotaExceededError
+from app.core.traffic import create_recorder
+
+# Log the stack of any callback that blocks the event loop, as in the real application
+loop_watchdog = LoopWatchdog(LOOP_SLOW_CALLBACK_SECONDS) if LOOP_WATCHDOG_ENABLED else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if loop_watchdog:
+        loop_watchdog.start()
+    yield
+    if loop_watchdog:
+        await loop_watchdog.stop()
 
 app = FastAPI(
     title=f"{API_TITLE} (Mock)",
     description=f"{API_DESCRIPTION} (Mock Version for Testing)",
     version=API_VERSION,
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Add request metrics middleware
+app.add_middleware(MetricsMiddleware)
+
+# Add Server-Timing and trace middleware
+app.add_middleware(TracingMiddleware)
+
+# Add request priority middleware, as in the real application
+app.add_middleware(PriorityMiddleware)
+
+# Profile single admin requests that carry the profile header
+app.add_middleware(ProfilingMiddleware)
+
+# Compress responses with gzip or brotli, as the client prefers
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MIN_BYTES,
+        gzip_level=COMPRESSION_GZIP_LEVEL,
+        brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    )
+
 # Set up CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -28,9 +76,21 @@ app.add_middleware(
     allow_headers=CORS_HEADERS,
 )
 
+# Capture requests for replay when TRAFFIC_CAPTURE_PATH is set; added last, so the
+# captured durations cover all other middleware
+traffic_recorder = create_recorder(TRAFFIC_CAPTURE_PATH)
+if traffic_recorder:
+    app.add_middleware(TrafficCaptureMiddleware, recorder=traffic_recorder)
+
 # Include API routes
 app.include_router(api_router, prefix=API_PREFIX)
 
+# Include admin routes, which are disabled unless ADMIN_TOKEN is set
+app.include_router(admin_router)
+
+# Injected quota rejections are answered like real ones
+app.add_exception_handler(QuotaExceededError, quota_exceeded_handler)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to Marchiver API (Mock Version)"}
@@ -45,6 +105,11 @@ async def root_health_check():
 async def api_health_check():
     return {"status": "healthy", "mode": "mock"}
 
+# Metrics endpoint in the Prometheus text format
+@app.get("/metrics")
+async def get_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
 if __name__ == "__main__":
     print(f"Starting Marchiver API Mock Server at http://{HOST}:{PORT}")
     print(f"API documentation available at http://{HOST}:{PORT}/docs")
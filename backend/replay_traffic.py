@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Script to replay captured traffic against a deployment.
+
+The input is a capture file written with TRAFFIC_CAPTURE_PATH set, see
+app.core.traffic. Requests are sent with their original method, path, query, recorded
+headers and body, and latency percentiles per route are compared with the durations
+measured when the traffic was captured, or with an earlier replay.
+
+By default requests are sent on the original schedule, so the original bursts and
+concurrency are reproduced; --speed 2 sends them twice as fast. With --max-speed,
+requests are sent back to back by as many clients as were ever in flight at once in
+the capture, or by --concurrency clients.
+
+Requests whose body or content query parameters were captured by hash only cannot be
+replayed and are skipped, see TRAFFIC_CAPTURE_BODIES. Redacted query parameters are
+sent as redacted.
+
+Without --base-url, the traffic is replayed against the in-process mock app.
+
+Examples:
+    python replay_traffic.py traffic.jsonl --base-url http://staging:8000 --output replay.json
+    python replay_traffic.py traffic.jsonl --base-url http://staging:8000 --speed 4
+    python replay_traffic.py traffic.jsonl --base-url http://staging:8000 --max-speed --baseline replay.json
+"""
+
+import argparse
+import asyncio
+import base64
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Add the backend directory to the path so we can import from app
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_mock import compare_to_baseline, percentile, summarize_latencies
+
+def read_capture(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Read captured requests, in the order they started."""
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                entries.append(json.loads(line))
+    entries.sort(key=lambda entry: entry["ts"])
+    return entries[:limit] if limit else entries
+
+def is_replayable(entry: Dict[str, Any]) -> bool:
+    """Whether the request can be sent again, that is its body and query were captured in full."""
+    return (entry.get("bl", 0) == 0 or "b" in entry) and "qh" not in entry
+
+def peak_concurrency(entries: List[Dict[str, Any]]) -> int:
+    """Get the largest number of captured requests that were in flight at the same time."""
+    events = sorted(
+        [(entry["ts"], 1) for entry in entries] + [(entry["ts"] + entry["d"], -1) for entry in entries],
+        # Requests ending at the same time as others start are not counted as overlapping
+        key=lambda event: (event[0], event[1]),
+    )
+    peak = in_flight = 0
+    for _, change in events:
+        in_flight += change
+        peak = max(peak, in_flight)
+    return peak
+
+def operation_name(entry: Dict[str, Any]) -> str:
+    return f"{entry['m']} {entry['r']}"
+
+def build_request(client: httpx.AsyncClient, entry: Dict[str, Any], headers: Dict[str, str]) -> httpx.Request:
+    """Build the request to replay a captured one."""
+    content = None
+    if entry.get("b") is not None:
+        content = base64.b64decode(entry["b"]) if entry.get("be") == "base64" else entry["b"].encode("utf-8")
+    return client.build_request(
+        entry["m"],
+        entry["p"],
+        params=[tuple(pair) for pair in entry.get("q", [])],
+        headers={**entry.get("h", {}), **headers},
+        content=content,
+    )
+
+class Replay:
+    """Sends captured requests and collects the latencies of each route."""
+
+    def __init__(self, client: httpx.AsyncClient, headers: Dict[str, str]):
+        self.client = client
+        self.headers = headers
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.mismatches: Dict[str, int] = {}
+        self.lags: List[float] = []
+
+    async def send(self, entry: Dict[str, Any]) -> None:
+        name = operation_name(entry)
+        self.latencies.setdefault(name, [])
+        self.errors.setdefault(name, 0)
+        self.statuses.setdefault(name, {})
+        self.mismatches.setdefault(name, 0)
+
+        request_start = time.perf_counter()
+        try:
+            response = await self.client.send(build_request(self.client, entry, self.headers))
+            await response.aclose()
+            status = str(response.status_code)
+            # Client errors were answered and are measured, like the captured durations
+            failed = response.status_code >= 500
+            if response.status_code != entry["s"]:
+                self.mismatches[name] += 1
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+            failed = True
+        latency = time.perf_counter() - request_start
+
+        self.statuses[name][status] = self.statuses[name].get(status, 0) + 1
+        if failed:
+            self.errors[name] += 1
+        else:
+            self.latencies[name].append(latency)
+
+    async def on_schedule(self, entries: List[Dict[str, Any]], speed: float) -> None:
+        """Send each request at its original offset from the first one, divided by the speed."""
+        first = entries[0]["ts"]
+        start = time.perf_counter()
+        tasks = []
+        for entry in entries:
+            due = start + (entry["ts"] - first) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # How late the request is sent shows whether the client keeps up with the schedule
+            self.lags.append(max(time.perf_counter() - due, 0.0))
+            tasks.append(asyncio.create_task(self.send(entry)))
+        await asyncio.gather(*tasks)
+
+    async def back_to_back(self, entries: List[Dict[str, Any]], concurrency: int) -> None:
+        """Send the requests in order, as fast as the given number of clients can."""
+        pending = iter(entries)
+
+        async def worker():
+            for entry in pending:
+                await self.send(entry)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    def results(self, duration: float) -> Dict[str, Any]:
+        operations = {}
+        for name in sorted(self.latencies):
+            operations[name] = summarize_latencies(self.latencies[name], self.errors[name], duration)
+            operations[name]["statuses"] = self.statuses[name]
+            operations[name]["status_mismatches"] = self.mismatches[name]
+        total = summarize_latencies(
+            [value for values in self.latencies.values() for value in values], sum(self.errors.values()), duration
+        )
+        return {"operations": operations, "total": total, "duration": duration}
+
+def summarize_capture(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Get the latency percentiles measured when the traffic was captured.
+
+    Throughput is left at zero, so that it is not compared with a replay at another speed.
+    """
+    durations: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    for entry in entries:
+        name = operation_name(entry)
+        durations.setdefault(name, [])
+        errors.setdefault(name, 0)
+        if entry["s"] >= 500:
+            errors[name] += 1
+        else:
+            durations[name].append(entry["d"])
+    operations = {name: summarize_latencies(durations[name], errors[name], 0) for name in sorted(durations)}
+    total = summarize_latencies([value for values in durations.values() for value in values], sum(errors.values()), 0)
+    return {"operations": operations, "total": total}
+
+def print_report(
+    results: Dict[str, Any], captured: Dict[str, Any], comparison: List[Dict[str, Any]], against: str
+) -> None:
+    """Print the replayed and captured latencies per route, and the regressions."""
+    rows = dict(results["operations"], total=results["total"])
+    width = max(len(name) for name in rows)
+    print(f"{'route':<{width}} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'captured p50/p99 ms':>20}", file=sys.stderr)
+    for name, stats in rows.items():
+        original = captured["total"] if name == "total" else captured["operations"].get(name)
+        original_text = f"{original['p50_ms']:.2f}/{original['p99_ms']:.2f}" if original else "-"
+        print(
+            f"{name:<{width}} {stats['count']:>7} {stats['errors']:>7} {stats['p50_ms']:>9.2f} "
+            f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {original_text:>20}",
+            file=sys.stderr,
+        )
+
+    regressions = [entry for entry in comparison if entry["regression"]]
+    print(f"\n{len(regressions)} regressions against {against}", file=sys.stderr)
+    for entry in regressions:
+        print(
+            f"  {entry['operation']} {entry['metric']}: {entry['baseline']:.2f} -> {entry['current']:.2f} "
+            f"({entry['change']:+.1%})",
+            file=sys.stderr,
+        )
+
+def parse_header(value: str) -> tuple:
+    name, separator, header_value = value.partition(":")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"Expected Name: value, got {value}")
+    return name.strip(), header_value.strip()
+
+async def replay(args: argparse.Namespace, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    else:
+        from main_mock import app
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://replay", timeout=args.timeout
+        )
+
+    runner = Replay(client, dict(args.header))
+    concurrency = args.concurrency or max(peak_concurrency(entries), 1)
+
+    async with client:
+        start = time.perf_counter()
+        if args.max_speed:
+            await runner.back_to_back(entries, concurrency)
+        else:
+            await runner.on_schedule(entries, args.speed)
+        duration = time.perf_counter() - start
+
+    results = runner.results(duration)
+    lags = sorted(runner.lags)
+    results["replay"] = {
+        "target": args.base_url or "in-process",
+        "capture": args.capture,
+        "mode": "max-speed" if args.max_speed else "schedule",
+        "speed": None if args.max_speed else args.speed,
+        "concurrency": concurrency if args.max_speed else None,
+        "captured_peak_concurrency": peak_concurrency(entries),
+        "captured_seconds": entries[-1]["ts"] - entries[0]["ts"],
+        "schedule_lag_p99_ms": percentile(lags, 99) * 1000,
+        "python": platform.python_version(),
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured traffic and compare latencies")
+    parser.add_argument("capture", help="Capture file written with TRAFFIC_CAPTURE_PATH set")
+    parser.add_argument("--base-url", help="Replay against a running server instead of the in-process mock app")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Replay the original schedule this many times faster (default: 1)")
+    parser.add_argument("--max-speed", action="store_true",
+                        help="Send requests back to back instead of on the original schedule")
+    parser.add_argument("--concurrency", type=int,
+                        help="Number of clients with --max-speed (default: the peak concurrency of the capture)")
+    parser.add_argument("--limit", type=int, help="Only replay the first this many requests")
+    parser.add_argument("--header", type=parse_header, action="append", default=[],
+                        help="Header to add to every request, e.g. 'Authorization: Bearer ...'; repeatable")
+    parser.add_argument("--timeout", type=float, default=30, help="Request timeout, in seconds")
+    parser.add_argument("--output", help="Write the results as JSON to this file (default: standard output)")
+    parser.add_argument("--baseline", help="Compare with the JSON results of an earlier replay "
+                                           "instead of the captured durations")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change that counts as a regression (default: 0.1)")
+    args = parser.parse_args()
+
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+
+    captured_entries = read_capture(args.capture, args.limit)
+    entries = [entry for entry in captured_entries if is_replayable(entry)]
+    skipped = len(captured_entries) - len(entries)
+    if skipped:
+        print(f"Skipping {skipped} requests whose body or query was not captured", file=sys.stderr)
+    if not entries:
+        raise SystemExit("The capture has no replayable requests")
+
+    print(f"Replaying {len(entries)} requests", file=sys.stderr)
+    results = asyncio.run(replay(args, entries))
+    results["replay"]["skipped"] = skipped
+
+    captured = summarize_capture(entries)
+    results["captured"] = captured
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        against = args.baseline
+    else:
+        # Captured durations were measured inside the server, so replays over the
+        # network are expected to be somewhat slower
+        baseline = captured
+        against = "the captured durations"
+    comparison = compare_to_baseline(results, baseline, args.tolerance)
+    results["comparison"] = {"baseline": against, "tolerance": args.tolerance, "metrics": comparison}
+
+    print_report(results, captured, comparison, against)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    # Only regressions against an earlier replay fail, so replays can gate changes
+    if args.baseline and any(entry["regression"] for entry in comparison):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
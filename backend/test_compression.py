@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+"""
+Test script for response compression.
+This script checks how the content coding of a response is chosen from the
+Accept-Encoding header of the request, and that compressed copies of a document get
+ETags that If-None-Match can match.
+"""
+
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.api.compression import CompressionMiddleware, choose_encoding, coded_etag, strip_coding, supported_encodings
+from app.api.responses import document_etag, document_response, etag_matches, not_modified_response
+from app.models.document import Document
+
+BROTLI = "br" in supported_encodings()
+
+def test_choose_encoding():
+    """Test that the accepted coding with the highest quality value is chosen."""
+    assert choose_encoding("gzip") == "gzip"
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("GZIP") == "gzip"
+    assert choose_encoding(" deflate ;q=1.0 , gzip ; q=0.5") == "gzip"
+    assert choose_encoding("*") == ("br" if BROTLI else "gzip")
+    assert choose_encoding("*;q=0.3, gzip;q=0.2") == ("br" if BROTLI else "gzip")
+    if BROTLI:
+        # Brotli wins ties but not lower quality values
+        assert choose_encoding("gzip, br") == "br"
+        assert choose_encoding("br;q=0.5, gzip") == "gzip"
+        assert choose_encoding("br;q=0.9, gzip;q=0.1") == "br"
+    else:
+        assert choose_encoding("br") is None
+        assert choose_encoding("br, gzip;q=0.1") == "gzip"
+    print("✅ The preferred accepted coding is chosen")
+
+def test_refused_encodings():
+    """Test that responses stay uncompressed when no supported coding is acceptable."""
+    assert choose_encoding("") is None
+    assert choose_encoding(",,") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("deflate, compress") is None
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding("gzip;q=0.0, br;q=0") is None
+    assert choose_encoding("*;q=0") is None
+    # An explicit refusal is not overridden by the wildcard
+    assert choose_encoding("gzip;q=0, *") == ("br" if BROTLI else None)
+    # An unreadable quality value refuses the coding
+    assert choose_encoding("gzip;q=high") is None
+    print("✅ Unacceptable codings are refused")
+
+def test_coded_etags():
+    """Test that compressed copies get strong ETags of their own that map back to the document."""
+    etag = document_etag("abc", 3)
+    assert etag == '"abc.v3"'
+    assert coded_etag(etag, "gzip") == '"abc.v3-gzip"'
+    assert coded_etag(etag, "br") == '"abc.v3-br"'
+    # Weak ETags already cover other byte sequences of the same content
+    assert coded_etag('W/"abc.v3"', "gzip") == 'W/"abc.v3"'
+
+    assert strip_coding('"abc.v3-gzip"') == etag
+    assert strip_coding('"abc.v3-br"') == etag
+    assert strip_coding(etag) == etag
+    assert strip_coding('"abc.v3-deflate"') == '"abc.v3-deflate"'
+    print("✅ Compressed copies get their own strong ETags")
+
+def test_etag_matches():
+    """Test If-None-Match parsing with lists, weak ETags, codings and the wildcard."""
+    etag = document_etag("abc", 3)
+    assert etag_matches('"abc.v3"', etag)
+    assert etag_matches(' "x.v1" , "abc.v3" ', etag)
+    assert etag_matches('W/"abc.v3"', etag)
+    assert etag_matches('"abc.v3-gzip"', etag)
+    assert etag_matches('W/"abc.v3-br"', etag)
+    assert etag_matches("*", etag)
+    assert etag_matches(" * ", etag)
+
+    assert not etag_matches("", etag)
+    assert not etag_matches('"abc.v2"', etag)
+    assert not etag_matches('"abc.v2-gzip"', etag)
+    assert not etag_matches("abc.v3", etag)
+    assert not etag_matches('"abc.v3.msgpack"', etag)
+    assert not etag_matches('"abc.v3.msgpack-gzip"', etag)
+    print("✅ If-None-Match matches the document ETag")
+
+def make_client():
+    """Get a client for an app that serves one large document behind CompressionMiddleware."""
+    document = Document(id="abc", version=3, title="Words", content="word " * 1000, embedding=[0.5] * 8)
+    etag = document_etag(document.id, document.version)
+
+    async def get_document(request: Request):
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            return not_modified_response(etag)
+        return document_response(document)
+
+    app = Starlette(routes=[Route("/document", get_document)])
+    app.add_middleware(CompressionMiddleware)
+    return TestClient(app)
+
+def test_revalidation():
+    """Test that 200 and 304 responses carry the same ETag and Vary for each coding."""
+    client = make_client()
+
+    response = client.get("/document", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == '"abc.v3-gzip"'
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+    response = client.get("/document", headers={"Accept-Encoding": "gzip", "If-None-Match": '"abc.v3-gzip"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc.v3-gzip"'
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+    response = client.get("/document", headers={"Accept-Encoding": "identity"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc.v3"'
+    assert response.headers["vary"] == "Accept"
+
+    response = client.get("/document", headers={"Accept-Encoding": "identity", "If-None-Match": '"abc.v3"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc.v3"'
+
+    # A client that switches codings still revalidates, and is told which copy it holds
+    response = client.get("/document", headers={"Accept-Encoding": "gzip", "If-None-Match": '"abc.v3"'})
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc.v3"'
+    print("✅ Revalidation keeps the ETag of each coding")
+
+def run_tests():
+    """Run all tests."""
+    print("🔍 Testing response compression...")
+    print(f"🗜️ Supported encodings: {', '.join(supported_encodings())}")
+    print("=" * 50)
+
+    tests = [
+        ("Encoding Choice", test_choose_encoding),
+        ("Refused Encodings", test_refused_encodings),
+        ("Coded ETags", test_coded_etags),
+        ("If-None-Match", test_etag_matches),
+        ("Revalidation", test_revalidation),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        print(f"\n🧪 Testing {name}...")
+        try:
+            test_func()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ {name} failed: {e}")
+            results.append((name, False))
+
+    print("\n" + "=" * 50)
+    print("📊 Test Results:")
+
+    passed = 0
+    for name, result in results:
+        status = "✅ PASSED" if result else "❌ FAILED"
+        print(f"{status} - {name}")
+        if result:
+            passed += 1
+
+    print(f"\n🏁 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if run_tests() else 1)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Test script for the HTTP cache of fetched web pages.
+This script checks how long responses stay fresh under Cache-Control, Expires and
+Last-Modified, and which responses are stored and revalidated.
+"""
+
+import sys
+import tempfile
+import time
+from email.utils import formatdate
+from pathlib import Path
+
+import httpx
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.services.http_cache import MAX_HEURISTIC_LIFETIME, HttpCache
+
+NOW = time.time()
+
+def http_date(offset: float) -> str:
+    """Format a time relative to NOW as an HTTP date."""
+    return formatdate(NOW + offset, usegmt=True)
+
+def lifetime(cache, **headers):
+    """Get the freshness lifetime of a response with the given headers."""
+    return cache._freshness_lifetime(httpx.Headers({name.replace("_", "-"): value for name, value in headers.items()}))
+
+def test_freshness_lifetime():
+    """Test max-age, Expires and the Last-Modified heuristic, in that order."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 1024 * 1024)
+
+        assert lifetime(cache, cache_control="max-age=600") == 600
+        assert lifetime(cache, cache_control="public, max-age=600", age="100") == 500
+        assert lifetime(cache, cache_control='max-age="60"') == 60
+        # max-age takes precedence over Expires
+        assert lifetime(cache, cache_control="max-age=60", expires=http_date(3600), date=http_date(0)) == 60
+        # no-cache forces revalidation whatever else is set
+        assert lifetime(cache, cache_control="no-cache, max-age=600") == 0
+
+        assert lifetime(cache, expires=http_date(3600), date=http_date(0)) == 3600
+        assert lifetime(cache, expires=http_date(3600), date=http_date(0), age="600") == 3000
+        assert lifetime(cache, expires=http_date(-60), date=http_date(0)) == -60
+        assert lifetime(cache, expires="0", date=http_date(0)) == 0
+
+        # A tenth of the time since the last change, capped at a day
+        assert lifetime(cache, last_modified=http_date(-10000), date=http_date(0)) == 1000
+        assert lifetime(cache, last_modified=http_date(-10**8), date=http_date(0)) == MAX_HEURISTIC_LIFETIME
+        assert lifetime(cache, last_modified=http_date(60), date=http_date(0)) == 0
+
+        assert lifetime(cache) == 0
+        assert lifetime(cache, cache_control="max-age=soon") == 0
+    print("✅ Freshness lifetimes follow the response headers")
+
+def test_storage_and_revalidation():
+    """Test which responses are stored, and that a 304 makes a stale response fresh again."""
+    with tempfile.TemporaryDirectory() as directory:
+        cache = HttpCache(directory, 1024 * 1024)
+
+        def put(url, headers):
+            return cache.put(url, httpx.Headers(headers), "page", "text/html", "utf-8", 4, False)
+
+        assert not put("http://example.com/private", {"cache-control": "no-store, max-age=600"})
+        assert not put("http://example.com/vary", {"cache-control": "max-age=600", "vary": "*"})
+        # Never fresh and without validators, so it could never be used
+        assert not put("http://example.com/useless", {})
+        assert cache.get("http://example.com/useless") is None
+
+        assert put("http://example.com/fresh", {"cache-control": "max-age=600"})
+        cached = cache.get("http://example.com/fresh")
+        assert cached.is_fresh() and cached.text == "page"
+
+        assert put("http://example.com/stale", {"cache-control": "no-cache", "etag": '"v1"'})
+        cached = cache.get("http://example.com/stale")
+        assert not cached.is_fresh()
+        assert cached.validators() == {"If-None-Match": '"v1"'}
+
+        cache.revalidated(cached, httpx.Headers({"cache-control": "max-age=600"}))
+        cached = cache.get("http://example.com/stale")
+        assert cached.is_fresh() and cached.meta["etag"] == '"v1"'
+    print("✅ Responses are stored and revalidated as their headers allow")
+
+def run_tests():
+    """Run all tests."""
+    print("🔍 Testing HTTP cache...")
+    print("=" * 50)
+
+    tests = [
+        ("Freshness Lifetime", test_freshness_lifetime),
+        ("Storage and Revalidation", test_storage_and_revalidation),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        print(f"\n🧪 Testing {name}...")
+        try:
+            test_func()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ {name} failed: {e}")
+            results.append((name, False))
+
+    print("\n" + "=" * 50)
+    print("📊 Test Results:")
+
+    passed = 0
+    for name, result in results:
+        status = "✅ PASSED" if result else "❌ FAILED"
+        print(f"{status} - {name}")
+        if result:
+            passed += 1
+
+    print(f"\n🏁 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if run_tests() else 1)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""
+Test script for the provider quota scheduler.
+This script checks the token bucket arithmetic and that background work yields to
+interactive requests and is shed before them.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.core.scheduler import (
+    BACKGROUND, INTERACTIVE, QuotaExceededError, QuotaScheduler, TokenBucket, current_priority, priority
+)
+
+def elapse(bucket, seconds):
+    """Make a bucket refill as if the given time had passed."""
+    bucket.updated_at -= seconds
+
+def test_token_bucket():
+    """Test taking, keeping and refilling tokens."""
+    bucket = TokenBucket(rate=2, capacity=4)
+    assert bucket.tokens == 4
+    assert bucket.try_take(3)
+    assert not bucket.try_take(2)
+    assert abs(bucket.time_until(2) - 0.5) < 0.01
+
+    elapse(bucket, 0.5)
+    assert bucket.try_take(2)
+    assert bucket.tokens < 0.01
+
+    # Refilling stops at the capacity
+    elapse(bucket, 60)
+    bucket.refill()
+    assert bucket.tokens == 4
+
+    # Tokens that must be kept are not handed out
+    assert not bucket.try_take(2, keep=3)
+    assert bucket.try_take(1, keep=3)
+    assert abs(bucket.time_until(1, keep=3) - 0.5) < 0.01
+    assert bucket.time_until(1) == 0
+
+    assert TokenBucket(rate=0, capacity=1).time_until(2) == float("inf")
+    print("✅ Token buckets take, keep and refill tokens")
+
+def test_priority_context():
+    """Test that the priority of the current context can be set for a block."""
+    assert current_priority() == INTERACTIVE
+    with priority(BACKGROUND):
+        assert current_priority() == BACKGROUND
+    assert current_priority() == INTERACTIVE
+    print("✅ The priority applies to its block only")
+
+def test_background_reserve():
+    """Test that background work leaves the reserve to interactive requests and is shed first."""
+    async def run():
+        scheduler = QuotaScheduler(
+            "test", requests_per_minute=0, burst=10, background_reserve=0.2, background_max_wait=0
+        )
+        for _ in range(8):
+            await scheduler.acquire(BACKGROUND)
+        try:
+            await scheduler.acquire(BACKGROUND)
+            raise AssertionError("background work took the reserve")
+        except QuotaExceededError as e:
+            assert e.retry_after == float("inf")
+
+        await scheduler.acquire(INTERACTIVE)
+        await scheduler.acquire(INTERACTIVE)
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["admitted"] == {INTERACTIVE: 2, BACKGROUND: 8}
+    assert stats["shed"] == {INTERACTIVE: 0, BACKGROUND: 1}
+    print("✅ Background work leaves the reserve")
+
+def test_interactive_first():
+    """Test that waiting background work lets a later interactive request go first."""
+    async def run():
+        scheduler = QuotaScheduler("test", requests_per_minute=600, burst=1, background_reserve=0)
+        await scheduler.acquire(INTERACTIVE)
+        order = []
+
+        async def call(name, priority):
+            await scheduler.acquire(priority)
+            order.append(name)
+
+        background = asyncio.ensure_future(call("background", BACKGROUND))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.ensure_future(call("interactive", INTERACTIVE))
+        await asyncio.gather(background, interactive)
+        return order
+
+    assert asyncio.run(run()) == ["interactive", "background"]
+    print("✅ Interactive requests are served before waiting background work")
+
+def test_background_queue_limit():
+    """Test that background work is shed at once when too much of it is waiting."""
+    async def run():
+        scheduler = QuotaScheduler("test", requests_per_minute=60, burst=1, background_max_queue=1)
+        await scheduler.acquire(INTERACTIVE)
+        waiting = asyncio.ensure_future(scheduler.acquire(BACKGROUND))
+        await asyncio.sleep(0.01)
+        try:
+            await scheduler.acquire(BACKGROUND)
+            raise AssertionError("background queue was not limited")
+        except QuotaExceededError as e:
+            assert "already waiting" in str(e)
+        waiting.cancel()
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["shed"][BACKGROUND] == 1
+    print("✅ The background queue is limited")
+
+def run_tests():
+    """Run all tests."""
+    print("🔍 Testing quota scheduler...")
+    print("=" * 50)
+
+    tests = [
+        ("Token Bucket", test_token_bucket),
+        ("Priority Context", test_priority_context),
+        ("Background Reserve", test_background_reserve),
+        ("Interactive First", test_interactive_first),
+        ("Background Queue Limit", test_background_queue_limit),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        print(f"\n🧪 Testing {name}...")
+        try:
+            test_func()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ {name} failed: {e}")
+            results.append((name, False))
+
+    print("\n" + "=" * 50)
+    print("📊 Test Results:")
+
+    passed = 0
+    for name, result in results:
+        status = "✅ PASSED" if result else "❌ FAILED"
+        print(f"{status} - {name}")
+        if result:
+            passed += 1
+
+    print(f"\n🏁 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if run_tests() else 1)
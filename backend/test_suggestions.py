@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+Test script for the typeahead suggestion index.
+This script checks the radix trie against a brute-force search over random writes,
+and that splitting and merging its nodes keeps it well-formed.
+"""
+
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+# Add the parent directory to the path so we can import from app
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from app.core.suggestions import PrefixIndex, SuggestionIndex, Term, normalize, word_suffixes
+
+WORDS = "py python pytorch machine machinery learning learn lean data database dat rust go golang a ab abc".split()
+PREFIXES = ["p", "py", "pyt", "da", "ma", "machine ", "l", "le", "r", "go", "x", "a", "ab", "abc d", "python p"]
+TOP_K = 5
+
+def check_structure(node):
+    """Assert that every node below a node is reachable by its label and not redundant."""
+    for first, child in node.children.items():
+        assert child.label and child.label[0] == first, f"child {child.label!r} filed under {first!r}"
+        assert child.terms or child.children, f"leaf {child.label!r} leads to no term"
+        if not child.terms:
+            assert len(child.children) != 1, f"node {child.label!r} should have been merged"
+        check_structure(child)
+
+def brute_force(index, prefix):
+    """Get the best terms for a prefix by scanning every indexed term."""
+    key = normalize(prefix) + (" " if prefix.endswith(" ") else "")
+    terms = set()
+    for document_terms in index._documents.values():
+        terms.update(document_terms)
+    matches = [term for term in terms if any(suffix.startswith(key) for suffix in word_suffixes(term.text))]
+    return sorted([(term.score, term.text) for term in matches], reverse=True)[:TOP_K], key
+
+def random_write(index, rng):
+    document_id = f"d{rng.randrange(60)}"
+    if rng.random() < 0.6:
+        title = " ".join(rng.choices(WORDS, k=rng.randint(1, 4)))
+        date = f"2026-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T00:00:00"
+        index.add(document_id, title, rng.sample(WORDS, rng.randint(0, 3)), rng.choice(WORDS + [None]), date)
+    else:
+        index.remove(document_id)
+
+def test_matches_brute_force():
+    """Test that lookups match a brute-force search after every random write."""
+    rng = random.Random(2)
+    index = SuggestionIndex(top_k=TOP_K, recency_seconds=86400)
+    for step in range(1000):
+        random_write(index, rng)
+        for prefix in PREFIXES:
+            expected, key = brute_force(index, prefix)
+            got = [(term.score, term.text) for term in index.trie.lookup(key, TOP_K)]
+            assert got == expected, f"step {step}, prefix {prefix!r}: {got} != {expected}"
+        check_structure(index.trie.root)
+    assert all(term.count > 0 for term in index._shared.values())
+
+    for document_id in list(index._documents):
+        index.remove(document_id)
+    assert not index.trie.root.children and not index._shared
+    print("✅ Lookups match a brute-force search over 1000 random writes")
+
+def test_split_and_merge():
+    """Test that inserting a key inside an edge splits it and removing it merges it back."""
+    trie = PrefixIndex(top_k=TOP_K)
+    database, data, date = Term("database", "tag"), Term("data", "tag"), Term("date", "tag")
+    for term in (database, data, date):
+        term.count, term.score = 1, 1.0
+
+    trie.add("database", database)
+    assert list(trie.root.children["d"].children) == []
+    assert trie.root.children["d"].label == "database"
+
+    # "data" ends inside the edge, so it splits it
+    trie.add("data", data)
+    node = trie.root.children["d"]
+    assert node.label == "data" and node.terms == {data}
+    assert node.children["b"].label == "base"
+
+    # "date" branches off inside the new edge, so it splits it again
+    trie.add("date", date)
+    node = trie.root.children["d"]
+    assert node.label == "dat" and not node.terms
+    assert sorted(node.children) == ["a", "e"]
+    check_structure(trie.root)
+
+    # Removing "date" leaves "dat" with one child, so the two merge
+    trie.remove("date", date)
+    node = trie.root.children["d"]
+    assert node.label == "data" and node.terms == {data}
+    check_structure(trie.root)
+
+    # Removing "data" leaves a node without terms above "base", so they merge too
+    trie.remove("data", data)
+    assert trie.root.children["d"].label == "database"
+    assert [term.text for term in trie.lookup("dat", TOP_K)] == ["database"]
+
+    trie.remove("database", database)
+    assert not trie.root.children
+    print("✅ Edges split on insert and merge on removal")
+
+def test_load_reconciles():
+    """Test that loading the index again picks up writes made elsewhere, but keeps local ones."""
+    store = {f"d{i}": {"title": f"title {i}", "tags": [f"t{i % 3}"], "category": "notes"} for i in range(50)}
+    index = SuggestionIndex(top_k=TOP_K)
+    asyncio.run(index.load(lambda: list(store.items())))
+    assert len(index) == 50 and index.loaded
+
+    # Another worker deletes, renames and creates documents
+    del store["d0"]
+    store["d1"]["title"] = "renamed zebra"
+    store["new"] = {"title": "quokka"}
+
+    async def reload():
+        task = asyncio.ensure_future(index.load(lambda: list(store.items())))
+        await asyncio.sleep(0)
+        # Written while the store is read, so the stored copy is older
+        index.add("d2", "written during load")
+        await task
+
+    asyncio.run(reload())
+    assert "d0" not in index
+    assert index.lookup("zebra")[0]["document_id"] == "d1"
+    assert index.lookup("quokka")[0]["document_id"] == "new"
+    assert index.lookup("written")[0]["document_id"] == "d2"
+    assert not index.lookup("title 2 ")
+    check_structure(index.trie.root)
+    print("✅ Loading again reconciles the index with the store")
+
+def run_tests():
+    """Run all tests."""
+    print("🔍 Testing suggestion index...")
+    print("=" * 50)
+
+    tests = [
+        ("Brute Force", test_matches_brute_force),
+        ("Split and Merge", test_split_and_merge),
+        ("Reconciling Load", test_load_reconciles),
+    ]
+
+    results = []
+    for name, test_func in tests:
+        print(f"\n🧪 Testing {name}...")
+        try:
+            test_func()
+            results.append((name, True))
+        except AssertionError as e:
+            print(f"❌ {name} failed: {e}")
+            results.append((name, False))
+
+    print("\n" + "=" * 50)
+    print("📊 Test Results:")
+
+    passed = 0
+    for name, result in results:
+        status = "✅ PASSED" if result else "❌ FAILED"
+        print(f"{status} - {name}")
+        if result:
+            passed += 1
+
+    print(f"\n🏁 {passed}/{len(results)} tests passed")
+    return passed == len(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if run_tests() else 1)
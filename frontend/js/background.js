@@ -1,6 +1,87 @@
 // Constants
 const API_BASE_URL = 'http://localhost:8000/api';
 
+// Read the Server-Sent Events of a response, passing each event name and payload to onEvent
+async function readEvents(response, onEvent) {
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) {
+      return;
+    }
+    buffer += value;
+
+    // Events end with a blank line; keep any partial event for the next read
+    let end;
+    while ((end = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = 'message';
+      const data = [];
+      for (const line of block.split('\n')) {
+        if (line.startsWith('event:')) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+          data.push(line.slice(5).trimStart());
+        }
+      }
+
+      // Blocks without data are keep-alive comments
+      if (data.length > 0) {
+        onEvent(event, JSON.parse(data.join('\n')));
+      }
+    }
+  }
+}
+
+// Summarize a page as it is generated, then save it with its summary.
+// onEvent gets the page, chunk, error and done events of the stream, then a saved event
+// with the stored document. Saving does not summarize the page again, because the server
+// caches both the fetched page and its summary.
+async function summarizeAndSave(url, onEvent) {
+  try {
+    const streamUrl = new URL(`${API_BASE_URL}/summarize/stream`);
+    streamUrl.searchParams.append('url', url);
+
+    const response = await fetch(streamUrl, {
+      method: 'POST',
+      headers: { 'Accept': 'text/event-stream' }
+    });
+    if (!response.ok) {
+      throw new Error(`API returned status ${response.status}`);
+    }
+
+    let failed = false;
+    await readEvents(response, (event, data) => {
+      if (event === 'error') {
+        failed = true;
+      }
+      onEvent(event, data);
+    });
+    if (failed) {
+      return;
+    }
+
+    const fetchUrl = new URL(`${API_BASE_URL}/web/fetch`);
+    fetchUrl.searchParams.append('url', url);
+    fetchUrl.searchParams.append('save', 'true');
+    fetchUrl.searchParams.append('summarize', 'true');
+
+    const saved = await fetch(fetchUrl, {
+      method: 'POST'
+    });
+    if (!saved.ok) {
+      throw new Error(`API returned status ${saved.status}`);
+    }
+    onEvent('saved', await saved.json());
+  } catch (error) {
+    onEvent('error', { detail: error.message });
+  }
+}
+
 // Initialize extension
 chrome.runtime.onInstalled.addListener(() => {
   // Create context menu items
@@ -117,6 +198,8 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     }
     searchUrl.searchParams.append('limit', limit);
     searchUrl.searchParams.append('offset', offset);
+    // The extension never reads embeddings, so ask for the most compact encoding
+    searchUrl.searchParams.append('embedding_encoding', 'base64-float16');
     
     // Make API call to search documents
     fetch(searchUrl)
@@ -142,11 +225,62 @@ chrome.runtime.onMessage.addListener((message, sender, sendResponse) => {
     return true; // Async response needed
   }
   
+  // Handle suggest action
+  if (message.action === 'suggest') {
+    const suggestUrl = new URL(`${API_BASE_URL}/suggest`);
+    suggestUrl.searchParams.append('prefix', message.prefix);
+    suggestUrl.searchParams.append('limit', message.limit || 8);
+    
+    // Suggestions come from an in-memory index on the server, so they are cheap to ask for
+    fetch(suggestUrl)
+      .then(response => {
+        if (!response.ok) {
+          throw new Error(`API returned status ${response.status}`);
+        }
+        return response.json();
+      })
+      .then(data => {
+        sendResponse({
+          success: true,
+          suggestions: data.suggestions
+        });
+      })
+      .catch(error => {
+        sendResponse({
+          success: false,
+          error: error.message
+        });
+      });
+    
+    return true; // Async response needed
+  }
+  
   // If we get here, we didn't handle the message
   sendResponse({ success: false, error: 'Unhandled message action: ' + message.action });
   return false;
 });
 
+// Stream summaries to the popup, which connects a port and sends the page URL
+chrome.runtime.onConnect.addListener(port => {
+  if (port.name !== 'summarizeStream') {
+    return;
+  }
+
+  // Keep going if the popup closes, so the page is still saved, but stop posting to it
+  let connected = true;
+  port.onDisconnect.addListener(() => {
+    connected = false;
+  });
+
+  port.onMessage.addListener(message => {
+    summarizeAndSave(message.url, (event, data) => {
+      if (connected) {
+        port.postMessage({ event: event, data: data });
+      }
+    });
+  });
+});
+
 // Handle context menu clicks
 chrome.contextMenus.onClicked.addListener((info, tab) => {
   const url = info.pageUrl;
@@ -203,47 +337,36 @@ chrome.contextMenus.onClicked.addListener((info, tab) => {
       break;
       
     case 'summarizePage':
-      // Show initial notification
-      chrome.notifications.create({
+      // Show initial notification, and update it as the summary arrives
+      const notificationId = `summarize-${Date.now()}`;
+      chrome.notifications.create(notificationId, {
         type: 'basic',
         iconUrl: '/images/icon128.png',
         title: 'Marchiver',
         message: 'Summarizing page...'
       });
-      
-      // Build the URL with query parameters
-      const summarizeUrl = new URL(`${API_BASE_URL}/web/fetch`);
-      summarizeUrl.searchParams.append('url', url);
-      summarizeUrl.searchParams.append('save', 'true');
-      summarizeUrl.searchParams.append('summarize', 'true');
-      
-      // Make API call to summarize the page
-      fetch(summarizeUrl, {
-        method: 'POST'
-      })
-      .then(response => {
-        if (!response.ok) {
-          throw new Error(`API returned status ${response.status}`);
+
+      let summary = '';
+      summarizeAndSave(url, (event, data) => {
+        if (event === 'chunk') {
+          summary += data.text;
+          chrome.notifications.update(notificationId, {
+            title: 'Marchiver - Summarizing...',
+            message: summary
+          });
+        } else if (event === 'saved') {
+          // Show success notification
+          chrome.notifications.update(notificationId, {
+            title: 'Marchiver - Page summarized and saved',
+            message: data.summary || summary
+          });
+        } else if (event === 'error') {
+          // Show error notification
+          chrome.notifications.update(notificationId, {
+            title: 'Marchiver',
+            message: `Error summarizing page: ${data.detail}`
+          });
         }
-        return response.json();
-      })
-      .then(data => {
-        // Show success notification
-        chrome.notifications.create({
-          type: 'basic',
-          iconUrl: '/images/icon128.png',
-          title: 'Marchiver',
-          message: 'Page summarized and saved successfully!'
-        });
-      })
-      .catch(error => {
-        // Show error notification
-        chrome.notifications.create({
-          type: 'basic',
-          iconUrl: '/images/icon128.png',
-          title: 'Marchiver',
-          message: `Error summarizing page: ${error.message}`
-        });
       });
       break;
   }
@@ -63,7 +63,7 @@ async function loadDocument(id, settings) {
   
   try {
     // Get document
-    const apiUrl = `${settings.apiEndpoint || API_BASE_URL}/documents/${id}`;
+    const apiUrl = `${settings.apiEndpoint || API_BASE_URL}/documents/${id}?embedding_encoding=base64-float16`;
     const response = await fetch(apiUrl);
     
     if (!response.ok) {
@@ -139,7 +139,7 @@ function displayDocument(document) {
 async function loadRelatedDocuments(id, settings) {
   try {
     // Get related documents
-    const apiUrl = `${settings.apiEndpoint || API_BASE_URL}/documents/${id}/similar`;
+    const apiUrl = `${settings.apiEndpoint || API_BASE_URL}/documents/${id}/similar?embedding_encoding=base64-float16`;
     const response = await fetch(apiUrl);
     
     if (!response.ok) {
@@ -256,40 +256,68 @@ document.getElementById('summarizeBtn').addEventListener('click', function() {
     summarizeBtn.textContent = 'Summarizing...';
     summarizeBtn.disabled = true;
     
-    // Set a timeout to update the message if it's taking a while
+    // Set a timeout to update the message if it's taking a while to start
     const slowOperationTimeout = setTimeout(() => {
       document.getElementById('summaryResult').textContent = 'Still summarizing... This may take a moment as we process the page content and generate a summary using AI.';
     }, 3000);
-    
-    // Send a message to the background script
-    chrome.runtime.sendMessage(
-      { action: 'summarizePage', url: activeTab.url },
-      function(response) {
-        // Clear the timeout
-        clearTimeout(slowOperationTimeout);
-        
-        // Reset button
-        summarizeBtn.textContent = originalText;
-        summarizeBtn.disabled = false;
-        
-        if (chrome.runtime.lastError) {
-          document.getElementById('summaryResult').textContent = 'Error: ' + chrome.runtime.lastError.message;
-          document.getElementById('summaryResult').className = 'result collapsible-content error';
-          updateStatusIndicator('summarizeIndicator', false);
-          return;
-        }
-        
-        if (response && response.success) {
-          // Display the summary in a user-friendly way
-          displaySummary(response);
-          updateStatusIndicator('summarizeIndicator', true);
-        } else {
-          document.getElementById('summaryResult').textContent = 'Error summarizing page.';
-          document.getElementById('summaryResult').className = 'result collapsible-content error';
-          updateStatusIndicator('summarizeIndicator', false);
+
+    const resultElement = document.getElementById('summaryResult');
+    let finished = false;
+    let streamedText = null;
+
+    function finish(isSuccess) {
+      finished = true;
+      clearTimeout(slowOperationTimeout);
+
+      // Reset button
+      summarizeBtn.textContent = originalText;
+      summarizeBtn.disabled = false;
+      updateStatusIndicator('summarizeIndicator', isSuccess);
+    }
+
+    function showError(message) {
+      resultElement.textContent = 'Error: ' + message;
+      resultElement.className = 'result collapsible-content error';
+      finish(false);
+    }
+
+    // The background script streams the summary over a port as it is generated
+    const port = chrome.runtime.connect({ name: 'summarizeStream' });
+
+    port.onMessage.addListener(function(message) {
+      if (message.event === 'chunk') {
+        // Replace the progress message with the summary on the first chunk
+        if (streamedText === null) {
+          clearTimeout(slowOperationTimeout);
+          resultElement.innerHTML = '';
+          resultElement.className = 'result collapsible-content success';
+          streamedText = document.createElement('div');
+          streamedText.className = 'summary-content';
+          resultElement.appendChild(streamedText);
+
+          const summaryHeader = document.getElementById('summaryHeader');
+          summaryHeader.style.display = 'flex';
+          summaryHeader.classList.remove('collapsed');
         }
+        streamedText.textContent += message.data.text;
+      } else if (message.event === 'saved') {
+        // Display the saved summary with its title, source and document ID
+        displaySummary({ document: message.data });
+        finish(true);
+        port.disconnect();
+      } else if (message.event === 'error') {
+        showError(message.data.detail || 'Error summarizing page.');
+        port.disconnect();
       }
-    );
+    });
+
+    port.onDisconnect.addListener(function() {
+      if (!finished) {
+        showError(chrome.runtime.lastError ? chrome.runtime.lastError.message : 'The connection to the extension was lost.');
+      }
+    });
+
+    port.postMessage({ url: activeTab.url });
   });
 });
 
@@ -400,6 +428,43 @@ document.getElementById('searchInput').addEventListener('keypress', function(eve
   }
 });
 
+// Suggest titles, tags and categories while typing in the search input. Requests
+// wait until typing pauses, and answers to outdated input are ignored.
+const SUGGEST_DEBOUNCE_MS = 150;
+let suggestTimer = null;
+let suggestSequence = 0;
+
+function updateSuggestions(prefix) {
+  const sequence = ++suggestSequence;
+  chrome.runtime.sendMessage({ action: 'suggest', prefix: prefix, limit: 8 }, function(response) {
+    if (chrome.runtime.lastError || sequence !== suggestSequence) {
+      return;
+    }
+    
+    const datalist = document.getElementById('searchSuggestions');
+    datalist.innerHTML = '';
+    if (response && response.success) {
+      response.suggestions.forEach(suggestion => {
+        const option = document.createElement('option');
+        option.value = suggestion.text;
+        option.label = suggestion.type === 'title' ? 'Document' : `${suggestion.type} (${suggestion.count})`;
+        datalist.appendChild(option);
+      });
+    }
+  });
+}
+
+document.getElementById('searchInput').addEventListener('input', function(event) {
+  clearTimeout(suggestTimer);
+  const prefix = event.target.value;
+  if (!prefix.trim()) {
+    suggestSequence++;
+    document.getElementById('searchSuggestions').innerHTML = '';
+    return;
+  }
+  suggestTimer = setTimeout(() => updateSuggestions(prefix), SUGGEST_DEBOUNCE_MS);
+});
+
 // Set up collapsible headers
 function setupCollapsibleHeaders() {
   // Summary header
@@ -57,6 +57,9 @@ else
     export $(grep -v '^#' .env | xargs)
 fi
 
+# The mock server is for development, so allow ?trace=true unless .env says otherwise
+export TRACE_DEBUG_ENABLED=${TRACE_DEBUG_ENABLED:-true}
+
 # Start the server
 echo "Starting mock server..."
 cd backend && uv run python3 main_mock.py